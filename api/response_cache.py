@@ -0,0 +1,108 @@
+##############################################################################
+#
+#    OSIS stands for Open Student Information System. It's an application
+#    designed to manage the core business of higher education institutions,
+#    such as universities, faculties, institutes and professional schools.
+#    The core business involves the administration of students, teachers,
+#    courses, programs and so on.
+#
+#    Copyright (C) 2015-2025 Université catholique de Louvain (http://www.uclouvain.be)
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    A copy of this license - GNU General Public License - is available
+#    at the root of the source code of this program.  If not,
+#    see http://www.gnu.org/licenses/.
+#
+##############################################################################
+import hashlib
+from datetime import date
+
+from django.core.cache import cache
+from django.utils.http import parse_etags, quote_etag, urlencode
+from rest_framework import status
+from rest_framework.response import Response
+
+from internship.models.cohort import Cohort
+from internship.utils.cache_versions import CacheVersions
+
+RESPONSE_TIMEOUT = 60 * 60
+
+# responses depending on the cohort's offers, specialties, organizations and periods
+CATALOGUE = 'catalogue'
+# responses depending on the choices of the cohort's students
+CHOICES = 'choices'
+
+# version of the responses of every cohort, next to the versions by scope and cohort
+ALL_COHORTS = 'all'
+
+_versions = CacheVersions('internship_api_version')
+
+
+class CohortCachedResponseMixin:
+    """
+    Serve the GET responses of a read-only view from a cache versioned by cohort, and answer 304 to the clients
+    sending the ETag of the current version in If-None-Match. The versions are changed by the save signals of the
+    models the responses depend on. Requests not bound to a cohort are not cached.
+    """
+    cache_scope = CATALOGUE
+    cohort_name_kwarg = 'cohort_name'
+
+    def get_cohort_name(self):
+        return self.kwargs.get(self.cohort_name_kwarg) or self.request.query_params.get('cohort_name')
+
+    def get(self, request, *args, **kwargs):
+        cohort_name = self.get_cohort_name()
+        if not cohort_name:
+            return super().get(request, *args, **kwargs)
+
+        key = _response_key(self.cache_scope, cohort_name, request)
+        etag = quote_etag(key)
+        if etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+
+        data = cache.get(key)
+        if data is None:
+            response = super().get(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            cache.set(key, response.data, RESPONSE_TIMEOUT)
+        else:
+            response = Response(data)
+        response['ETag'] = etag
+        return response
+
+
+def invalidate_cohorts(cohort_ids, scopes=(CATALOGUE,)):
+    cohort_names = Cohort.objects.filter(pk__in=cohort_ids).values_list('name', flat=True)
+    _versions.invalidate([_cohort_scope(scope, cohort_name) for cohort_name in cohort_names for scope in scopes])
+
+
+def invalidate_all():
+    """ Discard the responses of every cohort, when a cohort is created, renamed or deleted. """
+    _versions.invalidate([ALL_COHORTS])
+
+
+def _response_key(scope, cohort_name, request):
+    version_scopes = [ALL_COHORTS, _cohort_scope(scope, cohort_name)]
+    versions = _versions.get(version_scopes)
+    response_key = '{}_{}_{}?{}'.format(
+        '-'.join(versions[version_scope] for version_scope in version_scopes),
+        # the active periods depend on the day
+        date.today().isoformat(),
+        request.path,
+        urlencode(sorted(request.query_params.lists()), doseq=True),
+    )
+    return 'internship_api_{}'.format(hashlib.md5(response_key.encode()).hexdigest())
+
+
+def _cohort_scope(scope, cohort_name):
+    return '{}_{}'.format(scope, hashlib.md5(cohort_name.encode()).hexdigest())
@@ -23,8 +23,11 @@
 #    see http://www.gnu.org/licenses/.
 #
 ##############################################################################
-from django.http import HttpResponse, JsonResponse
+from django.http import HttpResponse
 from rest_framework import generics
+from rest_framework.response import Response
+
+from internship.api.response_cache import CohortCachedResponseMixin
 
 from internship.api.serializers.cohort import CohortSerializer
 from internship.models.cohort import Cohort
@@ -59,9 +62,10 @@ class CohortDetail(generics.RetrieveAPIView):
     lookup_field = 'name'
 
 
-class CohortOpenForSelection(generics.GenericAPIView):
+class CohortOpenForSelection(CohortCachedResponseMixin, generics.RetrieveAPIView):
     name = 'cohort-open-for-selection'
+    cohort_name_kwarg = 'name'
 
-    def get(self, *args, **kwargs):
+    def retrieve(self, request, *args, **kwargs):
         offer_count = InternshipOffer.objects.filter(selectable=True, cohort__name=kwargs['name']).count()
-        return JsonResponse({'is_open_for_selection': offer_count > 0})
+        return Response({'is_open_for_selection': offer_count > 0})
@@ -30,6 +30,7 @@ from rest_framework import generics, status
 from rest_framework.response import Response
 
 from base.models.student import Student
+from internship.api.response_cache import CHOICES, CohortCachedResponseMixin
 from internship.api.serializers.internship_choice import InternshipChoiceSerializer, FirstChoiceCountSerializer
 from internship.api.serializers.internship_student_affectation_stat import InternshipStudentAffectationSerializer, \
     InternshipPersonAffectationSerializer
@@ -79,8 +80,9 @@ class InternshipChoiceList(generics.ListAPIView):
         return queryset if has_criteria else []
 
 
-class FirstChoiceOrganizationCount(generics.ListAPIView):
+class FirstChoiceOrganizationCount(CohortCachedResponseMixin, generics.ListAPIView):
     name = 'first-choice-organization-count'
+    cache_scope = CHOICES
     serializer_class = FirstChoiceCountSerializer
 
     def get_queryset(self):
@@ -26,6 +26,7 @@
 from django_filters import rest_framework as filters
 from rest_framework import generics
 
+from internship.api.response_cache import CohortCachedResponseMixin
 from internship.api.serializers.internship_offer import InternshipOfferSerializer
 from internship.models.internship_offer import InternshipOffer
 
@@ -41,7 +42,7 @@ class OfferFilter(filters.FilterSet):
         fields = ['cohort_name', 'selectable', 'specialty_uuid', 'organization_uuid']
 
 
-class InternshipOfferList(generics.ListAPIView):
+class InternshipOfferList(CohortCachedResponseMixin, generics.ListAPIView):
     """
        Return a list of internship offers with optional filtering.
     """
@@ -25,6 +25,7 @@
 ##############################################################################
 from rest_framework import generics
 
+from internship.api.response_cache import CohortCachedResponseMixin
 from internship.api.serializers.internship_specialty import InternshipSpecialtySerializer
 from internship.models.internship_speciality import InternshipSpeciality
 
@@ -40,7 +41,7 @@ class SpecialtyFilter(filters.FilterSet):
         fields = ['cohort_name', 'selectable']
 
 
-class InternshipSpecialtyList(generics.ListAPIView):
+class InternshipSpecialtyList(CohortCachedResponseMixin, generics.ListAPIView):
     """
        Return a list of specialties with optional filtering.
     """
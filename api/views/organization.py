@@ -25,6 +25,7 @@
 ##############################################################################
 from rest_framework import generics
 
+from internship.api.response_cache import CohortCachedResponseMixin
 from internship.api.serializers.organization import OrganizationSerializer
 from internship.models.organization import Organization
 from django_filters import rest_framework as filters
@@ -38,7 +39,7 @@ class OrganizationFilter(filters.FilterSet):
         fields = ['cohort_name']
 
 
-class OrganizationList(generics.ListAPIView):
+class OrganizationList(CohortCachedResponseMixin, generics.ListAPIView):
     """
        Return a list of internship organizations with optional filtering.
     """
@@ -25,6 +25,7 @@
 ##############################################################################
 from rest_framework import generics
 
+from internship.api.response_cache import CohortCachedResponseMixin
 from internship.api.serializers.period import PeriodSerializer
 from internship.models.period import Period
 from django_filters import rest_framework as filters
@@ -38,7 +39,7 @@ class PeriodFilter(filters.FilterSet):
         fields = ['cohort_name']
 
 
-class PeriodList(generics.ListAPIView):
+class PeriodList(CohortCachedResponseMixin, generics.ListAPIView):
     """
        Return a list of periods with optional filtering.
     """
@@ -28,3 +28,6 @@ from django.apps import AppConfig
 
 class InternshipConfig(AppConfig):
     name = 'internship'
+
+    def ready(self):
+        from internship import signals  # noqa: F401
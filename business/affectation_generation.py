@@ -0,0 +1,189 @@
+##############################################################################
+#
+#    OSIS stands for Open Student Information System. It's an application
+#    designed to manage the core business of higher education institutions,
+#    such as universities, faculties, institutes and professional schools.
+#    The core business involves the administration of students, teachers,
+#    courses, programs and so on.
+#
+#    Copyright (C) 2015-2025 Université catholique de Louvain (http://www.uclouvain.be)
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    A copy of this license - GNU General Public License - is available
+#    at the root of the source code of this program.  If not,
+#    see http://www.gnu.org/licenses/.
+#
+##############################################################################
+import logging
+import os
+import timeit
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.translation import gettext as _
+
+from internship.business import assignment, assignment_multistart, assignment_optimizer, choice_status, score_table
+from internship.models.affectation_generation_time import AffectationGenerationTime
+from internship.models.cohort import Cohort
+
+logger = logging.getLogger(settings.DEFAULT_LOGGER)
+
+PENDING = 'pending'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+PROGRESS_TIMEOUT = 24 * 60 * 60
+PROGRESS_INTERVAL = 1
+
+
+def get_progress(cohort):
+    """ Progress of the latest affectation generation of the cohort, None if no generation was launched recently. """
+    return cache.get(_progress_key(cohort.id))
+
+
+def is_running(cohort):
+    progress = get_progress(cohort)
+    return bool(progress) and progress['status'] in (PENDING, RUNNING)
+
+
+def start_generation(cohort):
+    """
+    Take the lock of the generation of the cohort and mark it as pending, return False if another generation holds
+    the lock. The lock is released by `generate_affectations` or `release_generation`.
+    """
+    if not cache.add(_lock_key(cohort.id), True, PROGRESS_TIMEOUT):
+        return False
+    set_progress(cohort, PENDING)
+    return True
+
+
+def release_generation(cohort):
+    cache.delete(_lock_key(cohort.id))
+
+
+def set_progress(cohort, status, **kwargs):
+    progress = {'status': status, 'count': 0, 'total_count': 0, 'internship_count': 0, 'messages': []}
+    progress.update(kwargs)
+    cache.set(_progress_key(cohort.id), progress, PROGRESS_TIMEOUT)
+
+
+def generate_affectations(cohort, username, solver='greedy', runs=1, processes=None):
+    """
+    Compute and persist a new solution for the cohort, reporting the progress of the solver, and record the
+    generation in AffectationGenerationTime once done. Meant to be run in a background task. `processes` is the size
+    of the pool of the multi-start runs, 1 to run them in the calling process.
+    """
+    try:
+        return _generate_affectations(cohort, username, solver, runs, processes)
+    finally:
+        release_generation(cohort)
+
+
+def _generate_affectations(cohort, username, solver, runs, processes):
+    start_date_time = timezone.now()  # To register the beginning of the algorithm.
+    set_progress(cohort, RUNNING)
+    try:
+        solver_class = assignment_optimizer.OptimalAssignment if solver == 'optimal' else assignment.Assignment
+        if runs > 1:
+            slvr = assignment_multistart.MultiStartAssignment(
+                cohort, runs=runs, processes=processes, solver_class=solver_class
+            )
+        else:
+            slvr = solver_class(cohort)
+        slvr.progress_callback = ProgressReporter(cohort)
+        profile_path = _get_profile_path(cohort)
+        if profile_path:
+            slvr.instrumentation.profile_path = profile_path
+        slvr.solve()
+        slvr.persist_solution()
+    except Exception:
+        logger.exception("Affectation generation failed for cohort {}".format(cohort))
+        set_progress(cohort, FAILED)
+        raise
+    finally:
+        # the previous solution is deleted and the new one created in bulk, without signals
+        score_table.invalidate_cohorts([cohort.pk, *cohort.subcohorts.values_list('pk', flat=True)])
+        # the choice status counts the affectations of the cohorts sharing the same parent
+        choice_status.invalidate_cohorts(Cohort.objects.filter(
+            Q(pk=cohort.pk) | Q(parent_cohort=cohort) | Q(parent_cohort=cohort.parent_cohort)
+        ).values_list('pk', flat=True))
+    end_date_time = timezone.now()  # To register the end of the algorithm.
+
+    AffectationGenerationTime.objects.create(
+        cohort=cohort,
+        start_date_time=start_date_time,
+        end_date_time=end_date_time,
+        generated_by=username,
+        summary=slvr.summary(),
+    )
+    set_progress(
+        cohort, DONE,
+        count=slvr.count, total_count=slvr.total_count, internship_count=slvr.internship_count,
+        messages=get_result_messages(slvr),
+    )
+    return slvr
+
+
+def get_result_messages(slvr):
+    messages = []
+    if isinstance(slvr, assignment_multistart.MultiStartAssignment):
+        messages.append(_("Best solution of {runs} runs kept (seed {seed}): total cost {cost}").format(
+            runs=slvr.runs, seed=slvr.seed, cost=slvr.best.sol_cost
+        ))
+    if getattr(slvr, 'objective', None):
+        message = _("Total cost of the solution: {optimal} (greedy algorithm: {greedy})").format(**slvr.objective)
+        if 'lower_bound' in slvr.objective:
+            message = "{} - {}".format(
+                message, _("lower bound: {lower_bound}, gap: {gap}%").format(**slvr.objective)
+            )
+        messages.append(message)
+    return messages
+
+
+class ProgressReporter:
+    """ Store the counters of the solver for the polling endpoint, at most once per PROGRESS_INTERVAL seconds. """
+
+    def __init__(self, cohort):
+        self.cohort = cohort
+        self.last_report = 0
+
+    def __call__(self, slvr):
+        now = timeit.default_timer()
+        if now - self.last_report < PROGRESS_INTERVAL:
+            return
+        self.last_report = now
+        set_progress(
+            self.cohort, RUNNING,
+            count=slvr.count, total_count=slvr.total_count, internship_count=slvr.internship_count,
+            internships=len(slvr.internships),
+        )
+
+
+def _get_profile_path(cohort):
+    """ Profiling is enabled by setting INTERNSHIP_ASSIGNMENT_PROFILE_DIR, where the cProfile stats are dumped. """
+    profile_directory = getattr(settings, 'INTERNSHIP_ASSIGNMENT_PROFILE_DIR', None)
+    if not profile_directory:
+        return None
+    return os.path.join(
+        profile_directory, 'assignment_{}_{}.prof'.format(cohort.id, timezone.now().strftime('%Y%m%d%H%M%S'))
+    )
+
+
+def _progress_key(cohort_id):
+    return 'internship_affectation_generation_{}'.format(cohort_id)
+
+
+def _lock_key(cohort_id):
+    return 'internship_affectation_generation_lock_{}'.format(cohort_id)
@@ -0,0 +1,111 @@
+##############################################################################
+#
+#    OSIS stands for Open Student Information System. It's an application
+#    designed to manage the core business of higher education institutions,
+#    such as universities, faculties, institutes and professional schools.
+#    The core business involves the administration of students, teachers,
+#    courses, programs and so on.
+#
+#    Copyright (C) 2015-2025 Université catholique de Louvain (http://www.uclouvain.be)
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    A copy of this license - GNU General Public License - is available
+#    at the root of the source code of this program.  If not,
+#    see http://www.gnu.org/licenses/.
+#
+##############################################################################
+from django.contrib.postgres.aggregates import StringAgg
+from django.db.models import OuterRef, Subquery, F, Value, CharField
+from django.db.models.functions import Coalesce, Concat, Upper
+
+from base.models.person_address import PersonAddress
+from internship.models.enums.role import Role
+from internship.models.internship_student_affectation_stat import InternshipStudentAffectationStat
+from internship.models.internship_student_information import InternshipStudentInformation
+from internship.models.master_allocation import MasterAllocation
+
+
+def load_roster(organizations):
+    """
+    Affectations of the organizations, which can belong to several subcohorts, ordered by student and period. Each
+    affectation gets the `email`, `adress` and `phone_mobile` of the student in the cohort of the organizations and the
+    display names of the `master` of its organization and specialty, in a fixed number of queries.
+    """
+    affectations = list(
+        InternshipStudentAffectationStat.objects.filter(
+            organization__in=organizations
+        ).select_related(
+            'student__person', 'organization', 'speciality', 'period'
+        ).annotate(
+            master=Coalesce(Subquery(master_names_subquery()[:1]), Value(''), output_field=CharField())
+        ).order_by(
+            'student__person__last_name', 'student__person__first_name', 'period__date_start'
+        )
+    )
+    person_ids = {affectation.student.person_id for affectation in affectations}
+    cohort_ids = {affectation.organization.cohort_id for affectation in affectations}
+    students_information = get_students_information(person_ids, cohort_ids)
+    addresses = get_addresses(person_ids)
+    for affectation in affectations:
+        information = students_information.get(affectation.student.person_id)
+        address = addresses.get(affectation.student.person_id)
+        affectation.email = information.email if information else ""
+        affectation.phone_mobile = information.phone_mobile if information else ""
+        affectation.adress = format_address(address) if information and address else ""
+    return affectations
+
+
+def master_names_subquery():
+    """ Display names of the masters allocated to the organization and specialty of the outer affectation. """
+    return MasterAllocation.objects.filter(
+        organization_id=OuterRef('organization_id'),
+        specialty_id=OuterRef('speciality_id'),
+        role=Role.MASTER.name,
+    ).annotate(
+        full_name=Concat(
+            Upper(F('master__person__last_name')),
+            Value(' '),
+            F('master__person__first_name')
+        )
+    ).values('organization_id').annotate(
+        all_names=StringAgg(
+            'full_name', delimiter=', ', ordering=('master__person__last_name', 'master__person__first_name')
+        )
+    ).values('all_names')
+
+
+def get_students_information(person_ids, cohort_ids):
+    """ First information of each person in the cohorts, by person id. """
+    students_information = {}
+    for information in InternshipStudentInformation.objects.filter(
+            person_id__in=person_ids, cohort_id__in=cohort_ids
+    ).order_by('pk'):
+        students_information.setdefault(information.person_id, information)
+    return students_information
+
+
+def get_addresses(person_ids):
+    """ First address of each person, by person id. """
+    queryset = PersonAddress.objects.filter(person_id__in=person_ids)
+    addresses = {}
+    for address in queryset if queryset.ordered else queryset.order_by('pk'):
+        addresses.setdefault(address.person_id, address)
+    return addresses
+
+
+def format_address(person_address):
+    return "{} - {} {} ({})".format(
+        person_address.location,
+        person_address.postal_code,
+        person_address.city,
+        person_address.country
+    )
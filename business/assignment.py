@@ -24,29 +24,24 @@
 #
 ##############################################################################
 import logging
+import heapq
 import random
-import time
 import timeit
 from collections import defaultdict
 from typing import Iterable
 
 from django.conf import settings
-from django.core.exceptions import ObjectDoesNotExist
 from django.db import transaction
-from django.db.models.functions import Length
 
-from base.models.student import Student
-from internship import models as mdl
+from internship.business.assignment_snapshot import CohortSnapshot
 from internship.models.enums import costs
 from internship.models.enums.affectation_type import AffectationType
 from internship.models.enums.choice_type import ChoiceType
 from internship.models.enums.costs import Costs
-from internship.models.internship_choice import InternshipChoice, find_students_with_priority_choices
-from internship.models.internship_enrollment import InternshipEnrollment
 from internship.models.internship_student_affectation_stat import InternshipStudentAffectationStat
-from internship.models.organization import Organization
-from internship.models.period import Period, get_assignable_periods
-from internship.models.period_internship_places import PeriodInternshipPlaces
+from internship.models.period import Period
+from internship.utils.assignment.assignment_state import AssignmentState
+from internship.utils.assignment.instrumentation import AssignmentInstrumentation
 from internship.utils.assignment.period_place_utils import *
 from internship.utils.assignment.period_utils import group_periods_by_consecutives, map_period_ids
 
@@ -54,59 +49,62 @@ logger = logging.getLogger(settings.DEFAULT_LOGGER)
 
 
 class Assignment:
-    TIMEOUT = 60
     MAX_ALLOWED_IMPOSED = 2
 
-    def __init__(self, cohort):
+    def __init__(self, cohort, snapshot=None, seed=None):
+        """
+        All the data of the cohort is loaded up front in a CohortSnapshot (or reused from the given one), the
+        algorithm itself (compute_solution) then runs in memory without any database query.
+        All the random draws of the algorithm come from its own generator: two runs with the same seed on the same
+        snapshot give the same solution.
+        """
         self.cohort = cohort
+        self.instrumentation = AssignmentInstrumentation()
+        if snapshot is None:
+            with self.instrumentation.phase('load_snapshot'):
+                snapshot = CohortSnapshot(cohort)
+        self.snapshot = snapshot
+        self.seed = seed
+        self.random = random.Random(seed)
 
-        self.parent_cohort = cohort.parent_cohort if cohort.parent_cohort else None
+        self.parent_cohort = self.snapshot.parent_cohort
 
         self.count = 0
         self.total_count = 0
         self.start = 0
         self.stop = 0
-        self.last_switch = []
         self.internship_count = 0
+        # called with the assignment each time a student is processed, to report the progress of the resolution
+        self.progress_callback = None
 
-        self.students_information = self.cohort.internshipstudentinformation_set.all().select_related('person')
-        self.person_ids = self.students_information.values_list("person_id", flat=True)
-        self.students = Student.objects.filter(person_id__in=self.person_ids)
-
-        self.internships = self.cohort.internship_set.all().order_by('position', 'name')
-        self.prioritary_students_person_ids = find_students_with_priority_choices(
-            self.internships
-        ).values_list('person__id', flat=True)
-
-        self.mandatory_internships = self.internships.exclude(speciality__isnull=True)
-        self.non_mandatory_internships = self.internships.filter(speciality__isnull=True)
-
-        self.specialities = self.cohort.internshipspeciality_set.all()
-        self.default_speciality = self.cohort.internshipspeciality_set.filter(
-            acronym='MO'
-        ).first()
-
-        self.organization_error = mdl.organization.get_hospital_error(self.cohort)
-        self.pending_organization = cohort.organization_set.filter(reference='604').first()
-        self.forbidden_organizations = cohort.organization_set.annotate(
-            reference_length=Length('reference')
-        ).exclude(reference="00").filter(reference_length=3)
-
-        self.offers = self.cohort.internshipoffer_set.all()
-        self.offer_ids = self.offers.values_list("id", flat=True)
-        self.available_places = PeriodInternshipPlaces.objects.filter(internship_offer_id__in=self.offer_ids).values()
-        self.periods = get_assignable_periods(self.cohort.pk).filter(is_preconcours=False).extra(
-            select={"period_number": "CAST(substr(name, 2) AS INTEGER)"}
-        ).order_by("period_number")
-
-        self.choices = InternshipChoice.objects.filter(internship__cohort=self.cohort).select_related(
-            'student', 'internship'
+        self.students_information = list(self.snapshot.students_information)
+        self.students = self.snapshot.students
+
+        self.internships = self.snapshot.internships
+        self.prioritary_students_person_ids = self.snapshot.prioritary_students_person_ids
+
+        self.mandatory_internships = self.snapshot.mandatory_internships
+        self.non_mandatory_internships = self.snapshot.non_mandatory_internships
+
+        self.speciality_ids = self.snapshot.speciality_ids
+
+        self.organization_error = self.snapshot.organization_error
+        self.forbidden_organization_ids = self.snapshot.forbidden_organization_ids
+
+        self.offers = self.snapshot.offers
+        # remaining places are decremented during the resolution, the snapshot itself is left untouched
+        self.available_places = PeriodPlacesIndex(
+            dict(period_place) for period_place in self.snapshot.available_places
         )
+        self.periods = self.snapshot.periods
+
+        self.choices = self.snapshot.choices
 
         # As the algorithm progresses, these variables are updated with partial results.
-        self.affectations = []
+        self.affectations = AssignmentState()
 
         self.errors_count = 0
+        self.balancing = {}
 
     def is_not_published(function):
         def wrapper(self):
@@ -120,90 +118,107 @@ class Assignment:
     @transaction.atomic
     def persist_solution(self):
         """ All the generated affectations are stored in the database. """
-        InternshipStudentAffectationStat.objects.bulk_create(self.affectations)
+        InternshipStudentAffectationStat.objects.bulk_create(list(self.affectations))
 
     def solve(self):
         self.start = timeit.default_timer()
         logger.info("Started assignment algorithm.")
-        _clean_previous_solution(self.cohort)
+        with self.instrumentation.phase('clean_previous_solution'):
+            _clean_previous_solution(self.cohort)
         logger.info("Cleaned previous solution.")
-        _assign_priority_students(self)
+        with self.instrumentation.profile():
+            self.compute_solution()
+        self.stop = timeit.default_timer()
+        total_time = self.stop - self.start
+        logger.info('Time: {} seconds'.format(total_time))
+        logger.info('Assignment summary: {}'.format(self.summary()))
+
+    def compute_solution(self):
+        """ Run the whole algorithm against the preloaded snapshot, without touching the database. """
+        with self.instrumentation.phase('priority_students'):
+            _assign_priority_students(self)
         logger.info("Assigned priority students.")
 
         if self.parent_cohort:
-            self._prepare_subcohorts()
+            with self.instrumentation.phase('prepare_subcohorts'):
+                self._prepare_subcohorts()
             self._assign_students_in_subcohorts()
         else:
             self._assign_students_in_standalone_cohort()
 
-        _balance_assignments(self)
-        self.stop = timeit.default_timer()
-        total_time = self.stop - self.start
-        logger.info('Time: {} seconds'.format(total_time))
+        with self.instrumentation.phase('balancing'):
+            _balance_assignments(self)
+
+    def summary(self):
+        """ Phases timings and query counts, fallback counters and balancing results of the run. """
+        summary = self.instrumentation.summary()
+        summary.update({'seed': self.seed, 'balancing': self.balancing})
+        return summary
 
     def _prepare_subcohorts(self):
         # fill with existing affectations from siblings cohorts
-        self.existing_affectations = []
-        if self.parent_cohort:
-            for cohort in [cohort for cohort in self.parent_cohort.subcohorts.all() if cohort != self.cohort]:
-                self.existing_affectations += list(
-                    InternshipStudentAffectationStat.objects.filter(internship__cohort=cohort, organization__fake=False)
-                )
+        self.existing_affectations = self.snapshot.existing_affectations
+        self.affectations.add_existing(self.existing_affectations)
 
         # keep internship availability occurences in all cohorts
         self.internships_availability_occurence = defaultdict(int)
-        if self.parent_cohort:
-            for internship in self.internships.filter(speciality__isnull=False):
-                for cohort in [cohort for cohort in self.parent_cohort.subcohorts.all() if cohort != self.cohort]:
-                    cohort_specialties = list(cohort.internshipspeciality_set.all().values_list('name', flat=True))
-                    if internship.speciality.name in cohort_specialties:
-                        self.internships_availability_occurence[internship] += 1
-                        break
+        for internship in self.mandatory_internships:
+            for cohort_specialties in self.snapshot.sibling_specialities_names.values():
+                if internship.speciality.name in cohort_specialties:
+                    self.internships_availability_occurence[internship] += 1
+                    break
 
         # distribute randomly one non mandatory internship by subcohort taking into account existing affectation
         self.non_mandatory_internship_cohort_by_student = {}
-        if self.parent_cohort:
-            existing_non_mandatory_affectations = InternshipStudentAffectationStat.objects.filter(
-                period__cohort__parent_cohort=self.parent_cohort, internship__speciality__isnull=True
-            )
-            students_without_non_mandatory_internship = self.students.exclude(
-                pk__in=existing_non_mandatory_affectations.values_list('student__pk')
-            )
-            unavailable_subcohorts = existing_non_mandatory_affectations.values('period__cohort__name').distinct()
-            subcohorts = self.parent_cohort.subcohorts.all().exclude(name__in=unavailable_subcohorts)
-            for student in students_without_non_mandatory_internship:
-                self.non_mandatory_internship_cohort_by_student[student] = random.choice(subcohorts)
+        students_without_non_mandatory_internship = [
+            student for student in self.students
+            if student.pk not in self.snapshot.students_with_non_mandatory_affectation_ids
+        ]
+        subcohorts = [
+            cohort for cohort in self.snapshot.subcohorts
+            if cohort.name not in self.snapshot.unavailable_subcohorts_names
+        ]
+        for student in students_without_non_mandatory_internship:
+            self.non_mandatory_internship_cohort_by_student[student] = self.random.choice(subcohorts)
 
     def _assign_students_in_subcohorts(self):
 
         # assign non mandatory internship
-        self._assign_non_mandatory_internship_subcohort()
+        with self.instrumentation.phase('non_mandatory_internships'):
+            self._assign_non_mandatory_internship_subcohort()
 
-        self._assign_priority_internships()
+        with self.instrumentation.phase('priority_internships'):
+            self._assign_priority_internships()
 
+        with self.instrumentation.phase('regular_students'):
+            self._assign_regular_students_in_subcohort()
+
+    def _assign_regular_students_in_subcohort(self):
         self.count = 0
         """ Assign the best possible choice to other non-priority students."""
-        students = mdl.internship_choice.find_students_with_regular_choices(self.internships)
+        students = self.snapshot.students_with_choices(self.internships, priority=False)
         students = _sort_by_cost_after_random_shuffle(self, students)
         self.total_count = len(students)
 
         for student in students:
-            stud_existing_mandatory_affectations = [
-                aff for aff in self.existing_affectations if aff.student == student and aff.internship.speciality
+            existing_specialities_names = {
+                aff.internship.speciality.name for aff in self.affectations.existing_for_student(student)
+                if aff.internship.speciality
+            }
+            available_internships = [
+                internship for internship in self.internships
+                if not (internship.speciality and internship.speciality.name in existing_specialities_names)
             ]
-            available_internships = self.internships.exclude(
-                speciality__name__in=[aff.internship.speciality.name for aff in stud_existing_mandatory_affectations]
-            )
 
             # shuffle interships, keeps on top specialties that are not available in all cohorts to prioritize on these
             internships = sorted(
                 available_internships,
-                key=lambda i: (self.internships_availability_occurence[i], i.position, random.random())
+                key=lambda i: (self.internships_availability_occurence[i], i.position, self.random.random())
             )
             for internship in internships:
                 _assign_student(self, student, internship)
-                logger.info("Assigned regular students to {}.".format(internship.name))
                 self.internship_count += 1
+        logger.info("Assigned regular students.")
 
     def _assign_non_mandatory_internship_subcohort(self):
         self.total_count = len(self.students_information)
@@ -211,19 +226,22 @@ class Assignment:
         logger.info("Assigned students with priority choices to stages au choix.")
         self.count = 0
         """ Assign the best possible choice to other non-priority students."""
-        students = mdl.internship_choice.find_students_with_regular_choices(self.non_mandatory_internships)
+        students = self.snapshot.students_with_choices(self.non_mandatory_internships, priority=False)
         students = _sort_by_cost_after_random_shuffle(self, students)
         self.total_count = len(students)
         for student in students:
             if self.non_mandatory_internship_cohort_by_student.get(student) == self.cohort:
                 _assign_student(self, student, self.non_mandatory_internships)
-                logger.info("Assigned regular students to stages au choix")
+        logger.info("Assigned regular students to stages au choix")
 
     def _assign_students_in_standalone_cohort(self):
-        self._assign_priority_internships()
-        _assign_non_mandatory_internships(self)
+        with self.instrumentation.phase('priority_internships'):
+            self._assign_priority_internships()
+        with self.instrumentation.phase('non_mandatory_internships'):
+            _assign_non_mandatory_internships(self)
         for internship in self.mandatory_internships:
-            _assign_regular_students(self, internship)
+            with self.instrumentation.phase('regular_students:{}'.format(internship.name)):
+                _assign_regular_students(self, internship)
             logger.info("Assigned regular students to {}.".format(internship.name))
             self.internship_count += 1
 
@@ -239,11 +257,11 @@ class Assignment:
 def _sort_by_cost_after_random_shuffle(assignment, students_list):
     """ Students are shuffled to make sure equity of luck is respected and sorted asc by score afterwards"""
     students_list = list(students_list)
-    random.shuffle(students_list)
+    assignment.random.shuffle(students_list)
     for student in students_list:
         student.cost = get_student_cost(assignment, student)
     list_sorted = sorted(students_list, key=lambda x: x.cost, reverse=True)
-    logger.info("Shuffled students list and sorted by cost")
+    logger.debug("Shuffled students list and sorted by cost")
     return list_sorted
 
 
@@ -254,121 +272,112 @@ def _assign_non_mandatory_internships(self):
 
 
 def _balance_assignments(self):
+    """
+    Local search lowering the cost of the disadvantaged students, those having at least MAX_ALLOWED_IMPOSED imposed
+    internships. One of their imposed affectations is swapped with the affectation of a favored student (cost below
+    one imposed internship) in an organization they chose for the same speciality and period. A swap always lowers
+    the highest cost of the two students and never creates a new favored student, so the search converges.
+    """
     logger.info("Balancing assignments...")
-    favored_students, disadvantaged_students = _update_distinction_between_students(self)
-    self.timeout_start = time.time()
-    while len(disadvantaged_students) > 0 and time.time() < self.timeout_start + self.TIMEOUT:
-        _process_affectations_comparisons(self, favored_students, disadvantaged_students)
-
-
-def _update_distinction_between_students(self):
-    self.students_information = _sort_by_cost_after_random_shuffle(self, self.students_information)
-    disadvantaged_students = []
-    favored_students = []
-    for student in self.students_information:
-        if student.cost >= Costs.PRIORITY.value and student.cost < Costs.IMPOSED.value and student.person_id not in \
-                self.prioritary_students_person_ids:
-            favored_students.append(student)
-        if student.cost >= self.MAX_ALLOWED_IMPOSED * Costs.IMPOSED.value:
-            if student.cost >= Costs.ERROR.value + self.MAX_ALLOWED_IMPOSED * Costs.IMPOSED.value:
-                student.cost = student.cost - Costs.ERROR.value
-            disadvantaged_students.append(student)
-    return favored_students, disadvantaged_students
-
-
-def _process_affectations_comparisons(self, favored_students, disadvantaged_students):
-    for d_student in disadvantaged_students:
-        for f_student in favored_students:
-            self.switch = False
-            disadvantaged_student_affectations = []
-            favored_student_affectations = []
-            disadvantaged_student_id = _append_affectations(
-                self,
-                disadvantaged_student_affectations,
-                favored_student_affectations,
-                d_student,
-                f_student
-            )
-            disadvantaged_student_choices = self.choices.filter(student_id=disadvantaged_student_id)
-            _permute_affectations(
-                self,
-                disadvantaged_student_affectations,
-                favored_student_affectations,
-                disadvantaged_student_choices,
-            )
-            if self.switch:
-                break
-        favored_students, disadvantaged_students = _update_distinction_between_students(self)
-
-
-def _append_affectations(self, d_student_affectations, f_student_affectations, d_student, f_student):
-    disadvantaged_student_id = None
-    for affectation in self.affectations:
-        if affectation.student.person_id == d_student.person_id and is_mandatory_internship(affectation.internship):
-            d_student_affectations.append(affectation)
-            disadvantaged_student_id = affectation.student.id
-        if affectation.student.person_id == f_student.person_id and is_mandatory_internship(affectation.internship):
-            f_student_affectations.append(affectation)
-    return disadvantaged_student_id
-
-
-def _permute_affectations(self, d_student_affectations, f_student_affectations, d_student_choices):
-    for d_affectation in d_student_affectations:
-        temp_d = _copy_affectation(d_affectation)
-        if _disadvantaged_affectation_is_switchable(d_affectation):
-            d_organization_choices = _get_hospital_choices_by_speciality(d_student_choices, d_affectation)
-            for f_affectation in f_student_affectations:
-                temp_f = _copy_affectation(f_affectation)
-                if _favored_affectation_is_switchable(f_affectation, d_affectation, d_organization_choices):
-                    _store_exchanged_affectation_information(self, d_organization_choices, d_affectation, f_affectation,
-                                                             temp_f, temp_d)
-                    break
-            break
-
-
-def _copy_affectation(affectation):
-    return {
-        'organization_id': affectation.organization_id,
+    start = timeit.default_timer()
+    swaps_count = 0
+    queue = _disadvantaged_students_queue(self)
+    while queue:
+        _, position, student = heapq.heappop(queue)
+        swap = _find_improving_swap(self, student)
+        if swap is None:
+            # favored students only get fewer, a student without improving swap will never have one
+            continue
+        _swap_affectations(self, *swap)
+        swaps_count += 1
+        if _is_disadvantaged(self, student):
+            heapq.heappush(queue, (-_balancing_priority(self, student), position, student))
+    duration = timeit.default_timer() - start
+    self.balancing = {
+        'swaps': swaps_count,
+        'duration': duration,
+        'swaps_per_second': swaps_count / duration if duration else 0,
     }
+    logger.info("Balanced assignments: {swaps} improving swaps in {duration:.3f} seconds "
+                "({swaps_per_second:.1f} swaps/s).".format(**self.balancing))
+
+
+def _disadvantaged_students_queue(self):
+    """ Priority queue of the disadvantaged students, the highest cost first, ties broken randomly. """
+    students = list(self.students_information)
+    self.random.shuffle(students)
+    queue = [
+        (-_balancing_priority(self, student), position, student) for position, student in enumerate(students)
+        if _is_disadvantaged(self, student)
+    ]
+    heapq.heapify(queue)
+    return queue
+
+
+def _balancing_priority(self, student):
+    cost = self.affectations.student_cost(student)
+    if cost >= Costs.ERROR.value + self.MAX_ALLOWED_IMPOSED * Costs.IMPOSED.value:
+        cost -= Costs.ERROR.value
+    return cost
+
+
+def _is_disadvantaged(self, student):
+    return self.affectations.student_cost(student) >= self.MAX_ALLOWED_IMPOSED * Costs.IMPOSED.value
+
+
+def _is_favored(self, student):
+    return Costs.PRIORITY.value <= self.affectations.student_cost(student) < Costs.IMPOSED.value \
+           and student.person_id not in self.prioritary_students_person_ids
+
+
+def _find_improving_swap(self, student):
+    """
+    First swap found for one of the imposed affectations of the student, trying the organizations in the order of
+    the student's choices. Candidates are looked up by (organization, speciality, period) in the partial solution.
+    """
+    for d_affectation in self.affectations.for_student(student):
+        if not is_mandatory_internship(d_affectation.internship) \
+                or not _disadvantaged_affectation_is_switchable(d_affectation):
+            continue
+        for choice in _get_hospital_choices_by_speciality(
+                self.snapshot.choices_by_student.get(d_affectation.student.id, []), d_affectation
+        ):
+            for f_affectation in self.affectations.for_offer_and_period(
+                    choice.organization_id, d_affectation.speciality_id, d_affectation.period_id
+            ):
+                if _favored_affectation_is_switchable(self, f_affectation, d_affectation):
+                    return d_affectation, f_affectation, str(choice.choice)
+    return None
 
 
 def _disadvantaged_affectation_is_switchable(d_affectation):
-    return d_affectation.cost == 10 and d_affectation.choice == "I" and d_affectation.type != AffectationType.PRIORITY
+    return d_affectation.cost == Costs.IMPOSED.value and d_affectation.choice == ChoiceType.IMPOSED.value \
+           and d_affectation.type != AffectationType.PRIORITY.value
 
 
-def _favored_affectation_is_switchable(f_affectation, d_affectation, d_organization_choices):
-    return f_affectation.organization.id in d_organization_choices and f_affectation.period == d_affectation.period \
-           and f_affectation.speciality == d_affectation.speciality and f_affectation.type != AffectationType.PRIORITY
+def _favored_affectation_is_switchable(self, f_affectation, d_affectation):
+    return f_affectation.type != AffectationType.PRIORITY.value \
+           and is_mandatory_internship(f_affectation.internship) \
+           and f_affectation.student.person_id != d_affectation.student.person_id \
+           and _is_favored(self, f_affectation.student)
 
 
 def _get_hospital_choices_by_speciality(d_student_choices, d_affectation):
-    return list(d_student_choices.filter(speciality=d_affectation.speciality).order_by('choice').values_list(
-        'organization_id', flat=True)
+    return sorted(
+        (choice for choice in d_student_choices if choice.speciality_id == d_affectation.speciality_id),
+        key=lambda choice: choice.choice
     )
 
 
-def _store_exchanged_affectation_information(self, d_organization_choices, d_aff, f_aff, temp_f, temp_d):
-    if d_aff.uuid not in self.last_switch:
-        self.timeout_start = time.time()
-        self.switch = True
-
-    logger.info('Switching {} with {}'.format(d_aff, f_aff))
-    for a in self.affectations:
-        if a.uuid == d_aff.uuid:
-            a.organization_id = temp_f['organization_id']
-            a.organization = Organization.objects.get(pk=temp_f['organization_id'])
-            a.choice = _get_hospital_choice_type(d_organization_choices, temp_f['organization_id'])
-            a.cost = a.choice - 1
-        if a.uuid == f_aff.uuid:
-            a.cost = 10
-            a.organization_id = temp_d['organization_id']
-            a.organization = Organization.objects.get(pk=temp_d['organization_id'])
-            a.choice = "I"
-    self.last_switch.append(f_aff.uuid)
-
-
-def _get_hospital_choice_type(d_organization_choices, selected_organization_id):
-    return d_organization_choices.index(selected_organization_id) + 1
+def _swap_affectations(self, d_affectation, f_affectation, d_choice):
+    logger.debug('Switching {} with {}'.format(d_affectation, f_affectation))
+    d_organization = d_affectation.organization
+    self.affectations.reassign(
+        d_affectation, f_affectation.organization, choice=d_choice, cost=costs.COSTS[d_choice]
+    )
+    self.affectations.reassign(
+        f_affectation, d_organization, choice=ChoiceType.IMPOSED.value, cost=Costs.IMPOSED.value
+    )
 
 
 def _clean_previous_solution(cohort):
@@ -380,8 +389,7 @@ def _clean_previous_solution(cohort):
 
 def _assign_priority_students(assignment):
     """ Secretaries submit mandatory enrollments for some students, we start by saving all those in the solution."""
-    enrollments = InternshipEnrollment.objects.filter(internship__in=assignment.internships)
-    for enrollment in enrollments:
+    for enrollment in assignment.snapshot.enrollments:
         affectation = _build_prioritary_affectation(enrollment)
         decrement_places_available(assignment, affectation)
         assignment.affectations.append(affectation)
@@ -390,7 +398,7 @@ def _assign_priority_students(assignment):
 def _assign_students_with_priority_choices(assignment, internship):
     assignment.count = 0
     """ Some students are priority students, their choices need to be taken into account before the others."""
-    students = mdl.internship_choice.find_students_with_priority_choices(internship)
+    students = assignment.snapshot.students_with_choices(internship, priority=True)
     students = _sort_by_cost_after_random_shuffle(assignment, students)
     assignment.total_count = len(students)
     for student in students:
@@ -400,7 +408,7 @@ def _assign_students_with_priority_choices(assignment, internship):
 def _assign_regular_students(assignment, internship):
     assignment.count = 0
     """ Assign the best possible choice to other non-priority students."""
-    students = mdl.internship_choice.find_students_with_regular_choices(internship)
+    students = assignment.snapshot.students_with_choices(internship, priority=False)
     students = _sort_by_cost_after_random_shuffle(assignment, students)
     assignment.total_count = len(students)
     for student in students:
@@ -409,15 +417,14 @@ def _assign_regular_students(assignment, internship):
 
 def _assign_student(assignment, student, internship):
     assignment.count += 1
+    if assignment.progress_callback:
+        assignment.progress_callback(assignment)
     """ Assign offer to student for specific internship."""
-    if isinstance(internship, Iterable):
-        choices = assignment.choices.filter(student=student, internship__in=internship).order_by("choice")
-    else:
-        choices = assignment.choices.filter(student=student, internship=internship).order_by("choice")
+    choices = assignment.snapshot.choices_for(student, internship)
 
     affectations = None
 
-    student_affectations = get_student_affectations(student, assignment.affectations)
+    student_affectations = assignment.affectations.student_affectations(student)
 
     if student_not_fully_assigned(assignment, student):
         if is_mandatory_internship(internship):
@@ -433,13 +440,12 @@ def _assign_student(assignment, student, internship):
                     if affectations is None or affectations == []:
                         last = chosen_internship == list(internship)[:-1]
                         setattr(chosen_internship, 'first', chosen_internship == list(internship)[0])
-                        choices = assignment.choices.filter(student=student, internship=chosen_internship).order_by(
-                            "choice"
-                        )
+                        choices = assignment.snapshot.choices_for(student, chosen_internship)
                         affectations = assign_choices_to_student(assignment, student, choices, chosen_internship, last)
         if affectations:
             assignment.affectations.extend(affectations)
-        logger.info("Student {} affected to {} in period {}".format(student, internship, affectations))
+        # lazy formatting, this is called for every student and internship
+        logger.debug("Student %s affected to %s in period %s", student, internship, affectations)
 
 
 def _has_affected_non_mandatory_internship(student_affectations):
@@ -452,21 +458,22 @@ def assign_choices_to_student(assignment, student, choices, internship, last=Fal
     # Try to assign choices, from 1 to 4
     for choice in choices:
         if is_non_mandatory_internship(internship):
-            affecs = assignment.affectations
+            affecs = assignment.affectations.for_student(student)
             affecs = [a for a in affecs if a.organization.reference == choice.organization.reference and
                       a.speciality == choice.speciality and
-                      a.student == student and
                       a.choice == ChoiceType.PRIORITY.value]
             if len(affecs) > 0:
                 continue
 
         periods = find_first_student_available_periods_for_internship_choice(assignment, student, internship, choice)
         if len(periods) > 0:
+            # the choice comes from the snapshot shared between runs, it must not be modified
+            choice_type = choice.choice
             if isinstance(internship, Iterable) and is_non_mandatory_internship(internship) and not internship.first\
                     and not choice.priority and not is_prior_internship(internship, choices):
-                choice.choice = ChoiceType.IMPOSED.value
+                choice_type = ChoiceType.IMPOSED.value
             affectations.extend(build_affectation_for_periods(assignment, student, choice.organization, periods,
-                                                              choice.speciality, choice.choice, choice.priority,
+                                                              choice.speciality, choice_type, choice.priority,
                                                               choice.internship))
             break
 
@@ -486,6 +493,7 @@ def find_best_affectation_outside_of_choices(assignment, student, internship, ch
             offer = find_best_available_offer_for_internship_periods(assignment, internship, choices,
                                                                      grouped_periods, last)
             if offer:
+                assignment.instrumentation.count('imposed')
                 return build_affectation_for_periods(assignment, student, offer.organization, grouped_periods,
                                                      offer.speciality, ChoiceType.IMPOSED.value, False, internship)
         if is_mandatory_internship(internship) and student_periods:
@@ -494,7 +502,7 @@ def find_best_affectation_outside_of_choices(assignment, student, internship, ch
             return []
     else:
         student_periods = get_student_periods(assignment, student, internship, force_hospital_error=True)
-        speciality = choices.first().speciality
+        speciality = choices[0].speciality
         return affect_hospital_error(assignment, student, internship, student_periods, speciality)
 
 
@@ -502,8 +510,9 @@ def affect_hospital_error(assignment, student, internship, periods, speciality=N
     offer = find_offer_in_organization_error(assignment, internship)
     if speciality is None:
         speciality = offer.speciality
-    logger.info("\rError: {}".format(speciality))
-    return build_affectation_for_periods(assignment, student, offer.organization, random.choice(periods),
+    assignment.instrumentation.count('hospital_error')
+    logger.debug("Error: %s", speciality)
+    return build_affectation_for_periods(assignment, student, offer.organization, assignment.random.choice(periods),
                                          speciality, ChoiceType.IMPOSED.value, False, internship)
 
 
@@ -516,7 +525,7 @@ def get_student_periods(assignment, student, internship, force_hospital_error=Fa
         student_periods = all_available_periods(
             assignment, student, 1, assignment.periods, internship, force_hospital_error
         )
-    random.shuffle(student_periods)
+    assignment.random.shuffle(student_periods)
     return student_periods
 
 
@@ -541,20 +550,18 @@ def first_relevant_periods(assignment, student, internship_length, periods, inte
     available_periods = all_available_periods(assignment, student, internship_length, periods, internship)
 
     if len(available_periods) > 0:
-        return random.choice(available_periods)
+        return assignment.random.choice(available_periods)
     else:
         return available_periods
 
 
 def all_available_periods(assignment, student, internship_length, periods, internship, force_in_hospital_error=False):
     """ Difference between the authorized periods and the already affected periods from the student."""
-    existing_affectations = [] + assignment.affectations
-    if assignment.parent_cohort:
-        existing_affectations += assignment.existing_affectations
-    student_affectations = get_student_affectations(student, existing_affectations)
-    unavailable_periods = get_periods_from_affectations(student_affectations)
-    available_periods = difference(periods, unavailable_periods)
-    modality_periods = get_modality_periods_for_internship(internship)
+    unavailable_period_ids = assignment.affectations.student_period_ids(
+        student, include_existing=bool(assignment.parent_cohort)
+    )
+    available_periods = [period for period in periods if period.id not in unavailable_period_ids]
+    modality_periods = get_modality_periods_for_internship(assignment, internship)
     if modality_periods and not force_in_hospital_error:
         available_periods = [period for period in available_periods if period.name in modality_periods]
     return list(group_periods_by_consecutives(available_periods, leng=internship_length))
@@ -565,32 +572,30 @@ def find_best_available_offer_for_internship_periods(assignment, internship, cho
     if is_mandatory_internship(internship):
         speciality = internship.speciality
     else:
-        if hasattr(choices.first(), 'speciality'):
-            speciality = choices.first().speciality
-        else:
-            speciality = None
+        speciality = choices[0].speciality if choices else None
     if speciality is not None or last:
         available_offers = offers_for_available_organizations(assignment, speciality, unavailable_organizations)
         period_places = get_available_period_places_for_periods(assignment, available_offers, periods)
 
         if len(period_places) > 0:
-            return available_offers.get(
-                pk=period_places[random.randint(0, len(period_places) - 1)]["internship_offer_id"]
-            )
+            return assignment.snapshot.offers_by_id[
+                period_places[assignment.random.randint(0, len(period_places) - 1)]["internship_offer_id"]
+            ]
 
 
 def get_available_period_places_for_periods(assignment, offers, periods):
-    available_offer_ids = offers.values_list("id", flat=True)
+    available_offer_ids = [offer.id for offer in offers]
     period_ids = map_period_ids(periods)
-    offers_period_places = get_period_places_for_offer_ids(available_offer_ids, assignment.available_places)
 
     if len(periods) == 1:
-        period_places_for_period = get_period_places_for_period_ids(period_ids, offers_period_places)
+        period_places_for_period = get_period_places_for_offer_ids_and_period_ids(
+            available_offer_ids, period_ids, assignment.available_places
+        )
         return sort_period_places(period_places_for_period)
     else:
         for offer_id in available_offer_ids:
             period_places_for_periods = list(map(lambda period: get_period_places_for_offer_id_and_period_id(
-                offer_id, period.id, offers_period_places), periods))
+                offer_id, period.id, assignment.available_places), periods))
             if all(period_place and period_place[0]["number_places"] > 0 for period_place in period_places_for_periods):
                 return flatten(period_places_for_periods)
             else:
@@ -598,19 +603,20 @@ def get_available_period_places_for_periods(assignment, offers, periods):
 
 
 def find_available_periods_for_offers(assignment, offers):
-    offer_ids = offers.values_list("id", flat=True)
+    offer_ids = [offer.id for offer in offers]
     period_places_for_offers = get_period_places_for_offer_ids(offer_ids, assignment.available_places)
     available_period_places = sort_period_places(period_places_for_offers)
-    period_ids = get_period_ids_from_period_places(available_period_places)
-    return assignment.periods.filter(pk__in=period_ids).order_by("?")
+    period_ids = set(get_period_ids_from_period_places(available_period_places))
+    periods = [period for period in assignment.periods if period.pk in period_ids]
+    assignment.random.shuffle(periods)
+    return periods
 
 
 def student_has_no_affectations_for_internship(assignment, student, internship):
-    existing_affectations = [] + assignment.affectations
-    if assignment.parent_cohort:
-        existing_affectations += assignment.existing_affectations
     # Take all affectations of the student.
-    student_affectations = get_student_affectations(student, existing_affectations)
+    student_affectations = assignment.affectations.student_affectations(
+        student, include_existing=bool(assignment.parent_cohort)
+    )
 
     # Take only the affectations with the same specialty of the internship.
     affectations_with_speciality = list(
@@ -620,7 +626,10 @@ def student_has_no_affectations_for_internship(assignment, student, internship):
     affectations_with_speciality = list(filter(lambda affectation: affectation.internship.speciality is not None,
                                                affectations_with_speciality))
     # Take other internships with the same specialty.
-    internships_with_speciality = assignment.internships.filter(speciality=internship.speciality)
+    internships_with_speciality = [
+        other_internship for other_internship in assignment.internships
+        if other_internship.speciality_id == internship.speciality_id
+    ]
     length = internship.length_in_periods
     total_number_of_periods_with_speciality_expected = sum(internship.length_in_periods for internship in
                                                            internships_with_speciality)
@@ -628,14 +637,12 @@ def student_has_no_affectations_for_internship(assignment, student, internship):
 
 
 def student_not_fully_assigned(assignment, student):
-    student_affectations = get_student_affectations(student, assignment.affectations)
-    return len(student_affectations) < len(assignment.periods)
+    return len(assignment.affectations.student_period_ids(student)) < len(assignment.periods)
 
 
 def student_empty_periods(assignment, student):
-    student_affectations = get_student_affectations(student, assignment.affectations)
-    unavailable_periods = get_periods_from_affectations(student_affectations)
-    return difference(list(assignment.periods), unavailable_periods)
+    unavailable_period_ids = assignment.affectations.student_period_ids(student)
+    return [period for period in assignment.periods if period.id not in unavailable_period_ids]
 
 
 def build_affectation_for_periods(assignment, student, organization, periods, speciality, choice, priority, internship):
@@ -649,14 +656,15 @@ def build_affectation_for_periods(assignment, student, organization, periods, sp
 
 
 def decrement_places_available(assignment, affectation):
-    try:
-        offer = assignment.offers.get(organization=affectation.organization, speciality=affectation.speciality)
-        period_place = get_period_place_for_offer_and_period(offer, affectation.period, assignment.available_places)
-        if period_place:
-            period_place['number_places'] -= 1
-            assignment.available_places = replace_period_place_in_dictionnary(period_place, assignment.available_places)
-    except ObjectDoesNotExist:
+    offer = assignment.snapshot.offers_by_organization_and_speciality.get(
+        (affectation.organization_id, affectation.speciality_id)
+    )
+    if offer is None:
         return
+    period_place = get_period_place_for_offer_and_period(offer, affectation.period, assignment.available_places)
+    if period_place:
+        period_place['number_places'] -= 1
+        assignment.available_places = replace_period_place_in_dictionnary(period_place, assignment.available_places)
 
 
 def _build_prioritary_affectation(enrollment):
@@ -684,25 +692,38 @@ def _build_regular_affectation(assignment, organization, student, period, specia
 def find_offer_in_organization_error(assignment, internship):
     # Mandatory internship
     if internship.speciality:
-        return assignment.offers.get(organization=assignment.organization_error,
-                                     speciality=internship.speciality)
+        return assignment.snapshot.offers_by_organization_and_speciality.get(
+            (assignment.organization_error.id, internship.speciality_id)
+        )
     # Chosen internship
     else:
-        return assignment.offers.filter(organization=assignment.organization_error, cohort=assignment.cohort).first()
+        return next(
+            (offer for offer in assignment.offers if offer.organization_id == assignment.organization_error.id), None
+        )
 
 
 def offers_for_available_organizations(assignment, speciality, unavailable_organizations):
+    unavailable_organization_ids = {organization.id for organization in unavailable_organizations}
     if speciality:
-        return assignment.offers.exclude(organization__in=unavailable_organizations) \
-            .filter(speciality=speciality) \
-            .exclude(organization__in=assignment.forbidden_organizations)
+        return [
+            offer for offer in assignment.offers
+            if offer.speciality_id == speciality.id
+            and offer.organization_id not in unavailable_organization_ids
+            and offer.organization_id not in assignment.forbidden_organization_ids
+        ]
     else:
-        return assignment.offers.filter(speciality__in=assignment.specialities) \
-            .exclude(organization__in=assignment.forbidden_organizations)
+        return [
+            offer for offer in assignment.offers
+            if offer.speciality_id in assignment.speciality_ids
+            and offer.organization_id not in assignment.forbidden_organization_ids
+        ]
 
 
 def find_offers_for_internship_choice(assignment, choice):
-    return assignment.offers.filter(speciality=choice.speciality, organization=choice.organization)
+    offer = assignment.snapshot.offers_by_organization_and_speciality.get(
+        (choice.organization_id, choice.speciality_id)
+    )
+    return [offer] if offer else []
 
 
 def get_student_affectations(student, affectations):
@@ -730,16 +751,12 @@ def get_periods_from_affectations(affectations):
     return list(map(lambda affectation: affectation.period, affectations))
 
 
-def get_modality_periods_for_internship(internship):
-    return internship.internshipmodalityperiod_set.all().values_list('period__name', flat=True)
+def get_modality_periods_for_internship(assignment, internship):
+    return assignment.snapshot.modality_periods.get(internship.id, [])
 
 
 def get_student_cost(assignment, student):
-    affectations = [] + assignment.affectations
-    if assignment.parent_cohort:
-        affectations += assignment.existing_affectations
-    student_affectations_cost = [a.cost for a in affectations if a.student.person_id == student.person_id]
-    return sum(student_affectations_cost)
+    return assignment.affectations.student_cost(student)
 
 
 def is_mandatory_internship(internship):
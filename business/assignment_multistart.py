@@ -0,0 +1,170 @@
+##############################################################################
+#
+#    OSIS stands for Open Student Information System. It's an application
+#    designed to manage the core business of higher education institutions,
+#    such as universities, faculties, institutes and professional schools.
+#    The core business involves the administration of students, teachers,
+#    courses, programs and so on.
+#
+#    Copyright (C) 2015-2025 Université catholique de Louvain (http://www.uclouvain.be)
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    A copy of this license - GNU General Public License - is available
+#    at the root of the source code of this program.  If not,
+#    see http://www.gnu.org/licenses/.
+#
+##############################################################################
+import logging
+import multiprocessing
+import random
+import timeit
+from collections import defaultdict, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from statistics import stdev
+
+from django.conf import settings
+from django.db import connections, transaction
+
+from internship.business.assignment import Assignment, _clean_previous_solution
+from internship.business.assignment_snapshot import CohortSnapshot
+from internship.models.internship_student_affectation_stat import InternshipStudentAffectationStat
+from internship.utils.assignment.instrumentation import AssignmentInstrumentation
+
+logger = logging.getLogger(settings.DEFAULT_LOGGER)
+
+RunResult = namedtuple('RunResult', ['seed', 'sol_cost', 'std_dev_stud', 'affectations', 'objective', 'summary'])
+
+
+class MultiStartAssignment:
+    """
+    Run the assignment algorithm several times with different seeds on the same cohort snapshot and keep the best
+    solution: the lowest total cost, then the lowest standard deviation of the students' costs, as `sol_cost` and
+    `std_dev_stud` in the statistics. The runs are spread over a pool of processes sharing the snapshot loaded once
+    by the parent process, unless the parent is a daemonic process, such as a child of a prefork Celery worker, which
+    cannot have children: the runs are then made one after the other. The seed of the multi-start determines the seeds of all the runs, so that the result can
+    be reproduced.
+    """
+    MAX_RUNS = 16
+
+    def __init__(self, cohort, runs, seed=None, processes=None, solver_class=Assignment):
+        self.cohort = cohort
+        self.runs = max(1, min(runs, self.MAX_RUNS))
+        self.seed = seed if seed is not None else random.SystemRandom().randrange(2 ** 32)
+        self.processes = processes or _default_processes(self.runs)
+        self.solver_class = solver_class
+        self.results = []
+        self.best = None
+        self.affectations = []
+        self.objective = None
+        # progress is reported by number of completed runs
+        self.count = 0
+        self.total_count = self.runs
+        self.internship_count = 0
+        self.internships = []
+        self.progress_callback = None
+        self.instrumentation = AssignmentInstrumentation()
+
+    def solve(self):
+        start = timeit.default_timer()
+        with self.instrumentation.phase('clean_previous_solution'):
+            _clean_previous_solution(self.cohort)
+        with self.instrumentation.phase('load_snapshot'):
+            snapshot = CohortSnapshot(self.cohort)
+        self.internships = snapshot.internships
+        generator = random.Random(self.seed)
+        seeds = [generator.randrange(2 ** 32) for _ in range(self.runs)]
+
+        with self.instrumentation.phase('runs'), self.instrumentation.profile():
+            self._run_all(snapshot, seeds)
+
+        self.best = min(self.results, key=lambda result: (result.sol_cost, result.std_dev_stud))
+        self.affectations = self.best.affectations
+        self.objective = self.best.objective
+        logger.info("Kept run with seed {} out of {} runs (seed {}): cost {}, standard deviation {}, {} seconds".format(
+            self.best.seed, self.runs, self.seed, self.best.sol_cost, self.best.std_dev_stud,
+            timeit.default_timer() - start
+        ))
+
+    def _run_all(self, snapshot, seeds):
+        if self.processes > 1:
+            # the children never query the database, they must not share the connections of the parent
+            connections.close_all()
+            with ProcessPoolExecutor(
+                    max_workers=self.processes,
+                    mp_context=multiprocessing.get_context('fork'),
+                    initializer=_init_worker,
+                    initargs=(self.solver_class, self.cohort, snapshot),
+            ) as executor:
+                for result in executor.map(_run_in_worker, seeds):
+                    self._add_result(result)
+        else:
+            for seed in seeds:
+                self._add_result(_run(self.solver_class, self.cohort, snapshot, seed))
+
+    def _add_result(self, result):
+        self.results.append(result)
+        self.count = len(self.results)
+        if self.progress_callback:
+            self.progress_callback(self)
+
+    def summary(self):
+        """ Phases of the multi-start itself, with the summary of the best run. """
+        summary = self.instrumentation.summary()
+        summary.update({
+            'seed': self.seed,
+            'runs': [(result.seed, result.sol_cost, result.std_dev_stud) for result in self.results],
+            'best_run': self.best.summary if self.best else None,
+        })
+        return summary
+
+    @transaction.atomic
+    def persist_solution(self):
+        """ Only the affectations of the best run are stored in the database. """
+        InternshipStudentAffectationStat.objects.bulk_create(self.affectations)
+
+
+_worker_arguments = None
+
+
+def _default_processes(runs):
+    if multiprocessing.current_process().daemon:
+        return 1
+    return min(runs, multiprocessing.cpu_count())
+
+
+def _init_worker(solver_class, cohort, snapshot):
+    global _worker_arguments
+    _worker_arguments = (solver_class, cohort, snapshot)
+
+
+def _run_in_worker(seed):
+    return _run(*_worker_arguments, seed)
+
+
+def _run(solver_class, cohort, snapshot, seed):
+    slvr = solver_class(cohort, snapshot, seed=seed)
+    slvr.compute_solution()
+    affectations = list(slvr.affectations)
+    sol_cost, std_dev_stud = _score(affectations)
+    return RunResult(
+        seed, sol_cost, std_dev_stud, affectations, getattr(slvr, 'objective', None), slvr.summary()
+    )
+
+
+def _score(affectations):
+    """ Total cost and standard deviation of the students' costs, as computed by statistics.compute_stats. """
+    costs_by_student = defaultdict(int)
+    for affectation in affectations:
+        costs_by_student[affectation.student.person_id] += affectation.cost
+    student_costs = list(costs_by_student.values())
+    std_dev_stud = round(stdev(student_costs), 2) if len(student_costs) > 1 else 0
+    return sum(student_costs), std_dev_stud
@@ -0,0 +1,302 @@
+##############################################################################
+#
+#    OSIS stands for Open Student Information System. It's an application
+#    designed to manage the core business of higher education institutions,
+#    such as universities, faculties, institutes and professional schools.
+#    The core business involves the administration of students, teachers,
+#    courses, programs and so on.
+#
+#    Copyright (C) 2015-2025 Université catholique de Louvain (http://www.uclouvain.be)
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    A copy of this license - GNU General Public License - is available
+#    at the root of the source code of this program.  If not,
+#    see http://www.gnu.org/licenses/.
+#
+##############################################################################
+import logging
+import math
+from collections import defaultdict
+
+from django.conf import settings
+
+from internship.business.assignment import Assignment
+from internship.models.enums import costs
+from internship.models.enums.affectation_type import AffectationType
+from internship.models.enums.choice_type import ChoiceType
+from internship.utils.assignment.min_cost_flow import MinCostFlow
+
+try:
+    from ortools.linear_solver import pywraplp
+except ImportError:
+    pywraplp = None
+
+logger = logging.getLogger(settings.DEFAULT_LOGGER)
+
+
+class OptimalAssignment(Assignment):
+    """
+    Assignment followed by an optimal reassignment of the organizations.
+
+    The greedy algorithm decides which internship each student follows in which period. Keeping this schedule, the
+    organizations of the regular affectations of mandatory internships are then chosen to minimize the total cost:
+    internships of one period are solved exactly with a min-cost flow per (speciality, period), internships spanning
+    several periods are kept as the greedy placed them unless OR-Tools is installed, in which case the whole
+    reassignment is solved as a MIP. Places are never overbooked more than the greedy solution did.
+
+    The objective of both solutions is reported in `objective`, with a lower bound on the cost of any reassignment
+    of the same schedule (relaxation where each period of a long internship may go to a different organization).
+    """
+    MIP_TIME_LIMIT = 60
+
+    def __init__(self, cohort, snapshot=None, seed=None):
+        super().__init__(cohort, snapshot, seed)
+        self.objective = {}
+
+    def compute_solution(self):
+        super().compute_solution()
+        self.objective['greedy'] = _solution_cost(self)
+        with self.instrumentation.phase('optimization'):
+            _optimize_organizations(self)
+        self.objective['optimal'] = _solution_cost(self)
+        logger.info("Optimized assignment: {}".format(self.objective))
+
+    def summary(self):
+        summary = super().summary()
+        summary['objective'] = self.objective
+        return summary
+
+
+class _Group:
+    """ Affectations of a student for one internship, which must share the same organization. """
+
+    def __init__(self, affectations):
+        self.affectations = affectations
+        self.period_ids = [affectation.period_id for affectation in affectations]
+        self.speciality_id = affectations[0].speciality_id
+        # offer -> (choice type, cost of one affectation)
+        self.options = {}
+        self.current_offer = None
+
+    def cost(self):
+        return self.options[self.current_offer][1] * len(self.period_ids)
+
+
+def _solution_cost(assignment):
+    return sum(affectation.cost for affectation in assignment.affectations)
+
+
+def _optimize_organizations(assignment):
+    offers_by_speciality = defaultdict(list)
+    for offer in assignment.offers:
+        offers_by_speciality[offer.speciality_id].append(offer)
+
+    groups = _movable_groups(assignment, offers_by_speciality)
+    movable = {id(affectation) for group in groups for affectation in group.affectations}
+
+    fixed_cost = 0
+    fixed_usage = defaultdict(int)
+    for affectation in assignment.affectations:
+        if id(affectation) not in movable:
+            fixed_cost += affectation.cost
+            offer = assignment.snapshot.offers_by_organization_and_speciality.get(
+                (affectation.organization_id, affectation.speciality_id)
+            )
+            if offer:
+                fixed_usage[(offer.id, affectation.period_id)] += 1
+    places = {
+        (period_place['internship_offer_id'], period_place['period_id']): period_place['number_places']
+        for period_place in assignment.snapshot.available_places
+    }
+
+    lower_bound = _relaxation_lower_bound(groups, places, fixed_usage)
+    mip_bound = _solve_mip(assignment, groups, places, fixed_usage) if pywraplp else None
+    if mip_bound is None:
+        _solve_single_period_groups(groups, places, fixed_usage)
+        assignment.objective['solver'] = 'min-cost-flow'
+    else:
+        assignment.objective['solver'] = 'mip'
+
+    for group in groups:
+        _apply(assignment, group)
+
+    optimal = fixed_cost + sum(group.cost() for group in groups)
+    if lower_bound is not None:
+        lower_bound = min(fixed_cost + max(lower_bound, mip_bound or 0), optimal)
+        assignment.objective['lower_bound'] = lower_bound
+        assignment.objective['gap'] = round((optimal - lower_bound) / optimal * 100, 2) if optimal else 0
+
+
+def _movable_groups(assignment, offers_by_speciality):
+    affectations_by_student_and_internship = defaultdict(list)
+    for affectation in assignment.affectations:
+        if affectation.internship and affectation.internship.speciality_id \
+                and affectation.type != AffectationType.PRIORITY.value \
+                and affectation.choice != ChoiceType.PRIORITY.value:
+            affectations_by_student_and_internship[(affectation.student, affectation.internship)].append(affectation)
+
+    groups = []
+    for (student, internship), affectations in affectations_by_student_and_internship.items():
+        choices = assignment.snapshot.choices_for(student, internship)
+        # priority students and internships split between organizations keep their greedy placement
+        if any(choice.priority for choice in choices) or \
+                len({affectation.organization_id for affectation in affectations}) > 1:
+            continue
+        group = _Group(affectations)
+        ranks = {}
+        for choice in choices:
+            if choice.speciality_id == group.speciality_id:
+                ranks.setdefault(choice.organization_id, str(choice.choice))
+        for offer in offers_by_speciality[group.speciality_id]:
+            choice = _choice_for_organization(assignment, offer.organization, ranks)
+            if choice is not None:
+                group.options[offer] = (choice, costs.COSTS[choice])
+            if offer.organization_id == affectations[0].organization_id:
+                group.current_offer = offer
+        if group.current_offer is None:
+            continue
+        # the greedy placement always stays possible
+        group.options.setdefault(group.current_offer, (str(affectations[0].choice), affectations[0].cost))
+        groups.append(group)
+    return groups
+
+
+def _choice_for_organization(assignment, organization, ranks):
+    if organization.id in ranks:
+        return ranks[organization.id]
+    if assignment.organization_error and organization.id == assignment.organization_error.id:
+        return ChoiceType.ERROR.value
+    if organization.id in assignment.forbidden_organization_ids:
+        return None
+    return ChoiceType.IMPOSED.value
+
+
+def _capacities(groups, places, fixed_usage):
+    """ Places left to the groups, never less than what the greedy solution already uses. """
+    usage = defaultdict(int)
+    for group in groups:
+        for period_id in group.period_ids:
+            usage[(group.current_offer.id, period_id)] += 1
+    capacities = {}
+    for group in groups:
+        for offer in group.options:
+            for period_id in group.period_ids:
+                key = (offer.id, period_id)
+                capacities[key] = max(places.get(key, 0) - fixed_usage.get(key, 0), usage[key])
+    return capacities
+
+
+def _buckets(groups):
+    buckets = defaultdict(list)
+    for group in groups:
+        for period_id in group.period_ids:
+            buckets[(group.speciality_id, period_id)].append(group)
+    return buckets
+
+
+def _solve_flow(bucket, period_id, capacities):
+    """
+    Solve the transportation problem of the groups of one (speciality, period), each period of a group being
+    charged the cost of one affectation.
+    :return: the total cost and the offer chosen for each group, (None, None) if some group cannot be placed
+    """
+    offers = list({offer: None for group in bucket for offer in group.options})
+    offer_nodes = {offer: len(bucket) + index for index, offer in enumerate(offers)}
+    source, sink = len(bucket) + len(offers), len(bucket) + len(offers) + 1
+    flow = MinCostFlow(sink + 1)
+    edges = []
+    for node, group in enumerate(bucket):
+        flow.add_edge(source, node, 1, 0)
+        edges.append([
+            (offer, flow.add_edge(node, offer_nodes[offer], 1, cost)) for offer, (_, cost) in group.options.items()
+        ])
+    for offer, node in offer_nodes.items():
+        flow.add_edge(node, sink, capacities[(offer.id, period_id)], 0)
+    total_flow, total_cost = flow.solve(source, sink, max_flow=len(bucket))
+    if total_flow < len(bucket):
+        return None, None
+    chosen = [next(offer for offer, edge in group_edges if flow.flow(edge)) for group_edges in edges]
+    return total_cost, chosen
+
+
+def _relaxation_lower_bound(groups, places, fixed_usage):
+    """ Optimal cost of the movable groups if each period of a long internship could go to another organization. """
+    capacities = _capacities(groups, places, fixed_usage)
+    total = 0
+    for (_, period_id), bucket in _buckets(groups).items():
+        cost, _ = _solve_flow(bucket, period_id, capacities)
+        if cost is None:
+            return None
+        total += cost
+    return total
+
+
+def _solve_single_period_groups(groups, places, fixed_usage):
+    """ Internships of one period are reassigned optimally, longer internships keep their greedy organization. """
+    fixed_usage = defaultdict(int, fixed_usage)
+    for group in groups:
+        if len(group.period_ids) > 1:
+            for period_id in group.period_ids:
+                fixed_usage[(group.current_offer.id, period_id)] += 1
+
+    single_period_groups = [group for group in groups if len(group.period_ids) == 1]
+    capacities = _capacities(single_period_groups, places, fixed_usage)
+    for (_, period_id), bucket in _buckets(single_period_groups).items():
+        _, chosen = _solve_flow(bucket, period_id, capacities)
+        if chosen is None:
+            logger.warning("No reassignment found for period {}, greedy solution kept.".format(period_id))
+            continue
+        for group, offer in zip(bucket, chosen):
+            group.current_offer = offer
+
+
+def _solve_mip(assignment, groups, places, fixed_usage):
+    """ Reassign all the groups at once with OR-Tools, return the proven lower bound or None if not solved. """
+    solver = pywraplp.Solver.CreateSolver('SCIP') or pywraplp.Solver.CreateSolver('CBC')
+    if not solver:
+        return None
+    solver.SetTimeLimit(assignment.MIP_TIME_LIMIT * 1000)
+    capacities = _capacities(groups, places, fixed_usage)
+
+    variables = {}
+    usage = defaultdict(list)
+    for index, group in enumerate(groups):
+        for offer in group.options:
+            variables[(index, offer)] = solver.BoolVar('x_{}_{}'.format(index, offer.id))
+            for period_id in group.period_ids:
+                usage[(offer.id, period_id)].append(variables[(index, offer)])
+        solver.Add(solver.Sum([variables[(index, offer)] for offer in group.options]) == 1)
+    for key, key_variables in usage.items():
+        solver.Add(solver.Sum(key_variables) <= capacities[key])
+    solver.Minimize(solver.Sum([
+        variable * groups[index].options[offer][1] * len(groups[index].period_ids)
+        for (index, offer), variable in variables.items()
+    ]))
+
+    if solver.Solve() not in (pywraplp.Solver.OPTIMAL, pywraplp.Solver.FEASIBLE):
+        return None
+    for (index, offer), variable in variables.items():
+        if variable.solution_value() > 0.5:
+            groups[index].current_offer = offer
+    return math.ceil(solver.Objective().BestBound() - 1e-6)
+
+
+def _apply(assignment, group):
+    choice, cost = group.options[group.current_offer]
+    for affectation in group.affectations:
+        if affectation.organization_id == group.current_offer.organization_id and affectation.cost == cost:
+            continue
+        assignment.affectations.reassign(affectation, group.current_offer.organization, choice=choice, cost=cost)
+        if choice == ChoiceType.ERROR.value:
+            affectation.type = AffectationType.ERROR.value
+        else:
+            affectation.type = AffectationType.NORMAL.value
@@ -0,0 +1,180 @@
+##############################################################################
+#
+#    OSIS stands for Open Student Information System. It's an application
+#    designed to manage the core business of higher education institutions,
+#    such as universities, faculties, institutes and professional schools.
+#    The core business involves the administration of students, teachers,
+#    courses, programs and so on.
+#
+#    Copyright (C) 2015-2025 Université catholique de Louvain (http://www.uclouvain.be)
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    A copy of this license - GNU General Public License - is available
+#    at the root of the source code of this program.  If not,
+#    see http://www.gnu.org/licenses/.
+#
+##############################################################################
+from collections import defaultdict
+
+from django.db.models.functions import Length
+
+from base.models.student import Student
+from internship.models.internship_choice import InternshipChoice
+from internship.models.internship_enrollment import InternshipEnrollment
+from internship.models.internship_modality_period import InternshipModalityPeriod
+from internship.models.internship_student_affectation_stat import InternshipStudentAffectationStat
+from internship.models.organization import get_hospital_error
+from internship.models.period import get_assignable_periods
+from internship.models.period_internship_places import PeriodInternshipPlaces
+
+
+class CohortSnapshot:
+    """
+    Everything the assignment algorithm reads from the database for a cohort, loaded in a bounded number of bulk
+    queries. Once built, the algorithm runs against these plain structures without touching the database.
+    The snapshot is never modified by the algorithm, so it can be shared by several runs.
+    """
+
+    def __init__(self, cohort):
+        self.cohort = cohort
+        self.parent_cohort = cohort.parent_cohort if cohort.parent_cohort_id else None
+
+        self._load_students()
+        self._load_internships()
+        self._load_organizations()
+        self._load_offers()
+        self._load_periods()
+        self._load_choices()
+        self._load_enrollments()
+        self._load_subcohorts()
+
+    def _load_students(self):
+        self.students_information = list(
+            self.cohort.internshipstudentinformation_set.all().select_related('person').order_by('id')
+        )
+        person_ids = [student_information.person_id for student_information in self.students_information]
+        self.students = list(Student.objects.filter(person_id__in=person_ids).select_related('person').order_by('id'))
+
+    def _load_internships(self):
+        self.internships = list(
+            self.cohort.internship_set.all().select_related('speciality').order_by('position', 'name')
+        )
+        self.mandatory_internships = [internship for internship in self.internships if internship.speciality_id]
+        self.non_mandatory_internships = [internship for internship in self.internships if not internship.speciality_id]
+
+        self.modality_periods = defaultdict(list)
+        modality_periods = InternshipModalityPeriod.objects.filter(
+            internship__cohort=self.cohort
+        ).values_list('internship_id', 'period__name')
+        for internship_id, period_name in modality_periods:
+            self.modality_periods[internship_id].append(period_name)
+
+        self.speciality_ids = set(self.cohort.internshipspeciality_set.all().values_list('id', flat=True))
+
+    def _load_organizations(self):
+        self.organization_error = get_hospital_error(self.cohort)
+        self.forbidden_organization_ids = set(
+            self.cohort.organization_set.annotate(
+                reference_length=Length('reference')
+            ).exclude(reference="00").filter(reference_length=3).values_list('id', flat=True)
+        )
+
+    def _load_offers(self):
+        self.offers = list(
+            self.cohort.internshipoffer_set.all().select_related('organization', 'speciality').order_by('id')
+        )
+        self.offers_by_id = {offer.id: offer for offer in self.offers}
+        self.offers_by_organization_and_speciality = {}
+        for offer in self.offers:
+            self.offers_by_organization_and_speciality.setdefault((offer.organization_id, offer.speciality_id), offer)
+        self.available_places = list(
+            PeriodInternshipPlaces.objects.filter(internship_offer__cohort=self.cohort).order_by('id').values()
+        )
+
+    def _load_periods(self):
+        self.periods = list(
+            get_assignable_periods(self.cohort.pk).filter(is_preconcours=False).prefetch_related(None).extra(
+                select={"period_number": "CAST(substr(name, 2) AS INTEGER)"}
+            ).order_by("period_number")
+        )
+
+    def _load_choices(self):
+        self.choices = list(
+            InternshipChoice.objects.filter(internship__cohort=self.cohort).select_related(
+                'student__person', 'internship__speciality', 'organization', 'speciality'
+            ).order_by('choice', 'id')
+        )
+        self.choices_by_student = defaultdict(list)
+        self.choices_by_student_and_internship = defaultdict(list)
+        students_by_internship = defaultdict(dict)
+        for choice in self.choices:
+            self.choices_by_student[choice.student_id].append(choice)
+            self.choices_by_student_and_internship[(choice.student_id, choice.internship_id)].append(choice)
+            students_by_internship[(choice.internship_id, choice.priority)].setdefault(
+                choice.student_id, choice.student
+            )
+        self._students_by_internship = students_by_internship
+        self.prioritary_students_person_ids = {choice.student.person_id for choice in self.choices if choice.priority}
+
+    def _load_enrollments(self):
+        self.enrollments = list(
+            InternshipEnrollment.objects.filter(internship__cohort=self.cohort).select_related(
+                'student__person', 'place', 'period', 'internship_offer__speciality', 'internship__speciality'
+            ).order_by('id')
+        )
+
+    def _load_subcohorts(self):
+        self.subcohorts = []
+        self.sibling_specialities_names = {}
+        self.existing_affectations = []
+        self.students_with_non_mandatory_affectation_ids = set()
+        self.unavailable_subcohorts_names = set()
+        if not self.parent_cohort:
+            return
+
+        self.subcohorts = list(self.parent_cohort.subcohorts.all().prefetch_related('internshipspeciality_set'))
+        siblings = [cohort for cohort in self.subcohorts if cohort != self.cohort]
+        self.sibling_specialities_names = {
+            cohort: {speciality.name for speciality in cohort.internshipspeciality_set.all()} for cohort in siblings
+        }
+        self.existing_affectations = list(
+            InternshipStudentAffectationStat.objects.filter(
+                internship__cohort__in=siblings, organization__fake=False
+            ).select_related(
+                'student__person', 'organization', 'speciality', 'period', 'internship__speciality'
+            ).order_by('internship__cohort__name', 'id')
+        )
+        # affectations of the cohort itself are going to be replaced by the new solution
+        existing_non_mandatory_affectations = InternshipStudentAffectationStat.objects.filter(
+            period__cohort__parent_cohort=self.parent_cohort, internship__speciality__isnull=True
+        ).exclude(period__cohort=self.cohort).values_list('student_id', 'period__cohort__name')
+        for student_id, cohort_name in existing_non_mandatory_affectations:
+            self.students_with_non_mandatory_affectation_ids.add(student_id)
+            self.unavailable_subcohorts_names.add(cohort_name)
+
+    def students_with_choices(self, internships, priority):
+        """ Students having priority (or regular) choices for the internship(s), ordered by id. """
+        if not isinstance(internships, (list, tuple)):
+            internships = [internships]
+        students = {}
+        for internship in internships:
+            students.update(self._students_by_internship.get((internship.id, priority), {}))
+        return [students[student_id] for student_id in sorted(students)]
+
+    def choices_for(self, student, internships):
+        """ Choices of the student for the internship(s), ordered by choice. """
+        if not isinstance(internships, (list, tuple)):
+            return list(self.choices_by_student_and_internship.get((student.id, internships.id), []))
+        choices = []
+        for internship in internships:
+            choices += self.choices_by_student_and_internship.get((student.id, internship.id), [])
+        return sorted(choices, key=lambda choice: choice.choice)
@@ -0,0 +1,91 @@
+##############################################################################
+#
+#    OSIS stands for Open Student Information System. It's an application
+#    designed to manage the core business of higher education institutions,
+#    such as universities, faculties, institutes and professional schools.
+#    The core business involves the administration of students, teachers,
+#    courses, programs and so on.
+#
+#    Copyright (C) 2015-2025 Université catholique de Louvain (http://www.uclouvain.be)
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    A copy of this license - GNU General Public License - is available
+#    at the root of the source code of this program.  If not,
+#    see http://www.gnu.org/licenses/.
+#
+##############################################################################
+from django.core.cache import cache
+from django.db.models import Case, Count, Q, Value, When, CharField
+
+from internship.models.internship_choice import InternshipChoice
+
+CHOICE_DEMAND_TIMEOUT = 24 * 60 * 60
+
+# kinds of internship a choice is made for
+MANDATORY = 'MANDATORY'
+FIRST_ELECTIVE = 'FIRST_ELECTIVE'
+OTHER_ELECTIVE = 'OTHER_ELECTIVE'
+
+
+def get_choice_demand(cohort):
+    """
+    Number of first, other and all choices of the cohort by (organization id, specialty id, kind of internship), the
+    kind being MANDATORY for the internships of a specialty and FIRST_ELECTIVE or OTHER_ELECTIVE for the non mandatory
+    internships, the first elective being the one whose name holds a 1. Cached until a choice of the cohort changes.
+    """
+    demand = cache.get(_cache_key(cohort.pk))
+    if demand is None:
+        demand = _compute_choice_demand(cohort)
+        cache.set(_cache_key(cohort.pk), demand, CHOICE_DEMAND_TIMEOUT)
+    return demand
+
+
+def get_offer_demand(demand, offer, kinds=(MANDATORY, FIRST_ELECTIVE, OTHER_ELECTIVE)):
+    """ Sum of the choice counts of the offer for the given kinds of internship. """
+    counts = {'first': 0, 'other': 0, 'total': 0}
+    for kind in kinds:
+        for count, value in demand.get((offer.organization_id, offer.speciality_id, kind), {}).items():
+            counts[count] += value
+    return counts
+
+
+def invalidate_cohorts(cohort_ids):
+    cache.delete_many([_cache_key(cohort_id) for cohort_id in cohort_ids])
+
+
+def _compute_choice_demand(cohort):
+    rows = InternshipChoice.objects.filter(
+        organization__cohort=cohort
+    ).annotate(
+        kind=Case(
+            When(internship__speciality__isnull=False, then=Value(MANDATORY)),
+            When(internship__name__contains='1', then=Value(FIRST_ELECTIVE)),
+            default=Value(OTHER_ELECTIVE),
+            output_field=CharField(),
+        )
+    ).values(
+        'organization_id', 'speciality_id', 'kind'
+    ).annotate(
+        first=Count('pk', filter=Q(choice=1)),
+        total=Count('pk'),
+    ).order_by()
+    return {
+        (row['organization_id'], row['speciality_id'], row['kind']): {
+            'first': row['first'],
+            'other': row['total'] - row['first'],
+            'total': row['total'],
+        } for row in rows
+    }
+
+
+def _cache_key(cohort_id):
+    return 'internship_choice_demand_{}'.format(cohort_id)
@@ -0,0 +1,156 @@
+##############################################################################
+#
+#    OSIS stands for Open Student Information System. It's an application
+#    designed to manage the core business of higher education institutions,
+#    such as universities, faculties, institutes and professional schools.
+#    The core business involves the administration of students, teachers,
+#    courses, programs and so on.
+#
+#    Copyright (C) 2015-2025 Université catholique de Louvain (http://www.uclouvain.be)
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    A copy of this license - GNU General Public License - is available
+#    at the root of the source code of this program.  If not,
+#    see http://www.gnu.org/licenses/.
+#
+##############################################################################
+from django.core.cache import cache
+from django.db.models import Count, Q
+
+from internship.models.internship import Internship
+from internship.models.internship_choice import InternshipChoice
+from internship.models.internship_student_affectation_stat import InternshipStudentAffectationStat
+from internship.utils.cache_versions import CacheVersions
+
+CHOICE_STATUS_TIMEOUT = 24 * 60 * 60
+
+_cohort_versions = CacheVersions('internship_choice_status_cohort')
+_person_versions = CacheVersions('internship_choice_status_person')
+
+OK = 'OK'
+NOK = 'NOK'
+UNKNOWN = 'UNKNOWN'
+
+ABROAD_ORGANIZATION_REFERENCES = ['500', '510', '515', '520']
+
+
+def get_choice_statuses(cohort, person_ids):
+    """
+    Choice status of the persons in the cohort, by person id, read from a snapshot of the cohort kept in cache.
+    Only the rows of the persons whose choices or affectations changed since the snapshot was made are computed again,
+    the whole snapshot when the internships of the cohort changed.
+    """
+    person_ids = list(person_ids)
+    cohort_version = _cohort_versions.get([cohort.pk])[cohort.pk]
+    person_versions = _person_versions.get(person_ids)
+    snapshot = cache.get(_snapshot_key(cohort.pk))
+    if snapshot is None or snapshot['version'] != cohort_version:
+        snapshot = {'version': cohort_version, 'totals': _get_internship_totals(cohort), 'rows': {}}
+
+    stale_person_ids = [
+        person_id for person_id in person_ids
+        if snapshot['rows'].get(person_id, (None, None))[0] != person_versions[person_id]
+    ]
+    if stale_person_ids:
+        rows = _compute_rows(cohort, snapshot['totals'], stale_person_ids)
+        snapshot['rows'].update({
+            person_id: (person_versions[person_id], rows[person_id])
+            for person_id in stale_person_ids
+        })
+        cache.set(_snapshot_key(cohort.pk), snapshot, CHOICE_STATUS_TIMEOUT)
+    return {person_id: snapshot['rows'][person_id][1] for person_id in person_ids}
+
+
+def get_status_stats(statuses):
+    status_stats = {OK: 0, NOK: 0, UNKNOWN: 0}
+    for row in statuses.values():
+        status_stats[row['choice_status']] += 1
+    return status_stats
+
+
+def invalidate_persons(person_ids):
+    """ Compute again the choice status of the persons, in every cohort. """
+    _person_versions.invalidate(person_ids)
+
+
+def invalidate_cohorts(cohort_ids):
+    """ Compute again the choice status of every student of the cohorts. """
+    _cohort_versions.invalidate(cohort_ids)
+
+
+def _get_internship_totals(cohort):
+    return Internship.objects.filter(cohort=cohort).aggregate(
+        total_count=Count('pk'),
+        all_non_mandatory_count=Count('pk', filter=Q(speciality__isnull=True)),
+    )
+
+
+def _compute_rows(cohort, totals, person_ids):
+    in_cohort = Q(internship__cohort=cohort)
+    abroad = Q(
+        internship__name__contains='1',
+        internship__speciality__isnull=True,
+        organization__reference__in=ABROAD_ORGANIZATION_REFERENCES,
+    )
+    choices_counts = {
+        row['student__person_id']: row for row in InternshipChoice.objects.filter(
+            in_cohort | abroad,
+            choice=1,
+            student__person_id__in=person_ids,
+        ).values('student__person_id').annotate(
+            chosen_internships_count=Count('internship', filter=in_cohort),
+            all_non_mandatory_chosen=Count('internship', filter=in_cohort & Q(internship__speciality__isnull=True)),
+            internship_abroad_count=Count('internship', filter=abroad),
+        ).order_by()
+    }
+    already_done_counts = dict(
+        InternshipStudentAffectationStat.objects.filter(
+            speciality__cohort__parent_cohort=cohort.parent_cohort,
+            student__person_id__in=person_ids,
+        ).values('student__person_id').annotate(count=Count('internship')).values_list(
+            'student__person_id', 'count'
+        ).order_by()
+    )
+    rows = {}
+    for person_id in person_ids:
+        counts = choices_counts.get(person_id, {})
+        row = {
+            # no first choice in the internships of the cohort leaves the status unknown
+            'chosen_internships_count': counts.get('chosen_internships_count') or None,
+            'already_done_internships_in_parent_cohort_count': already_done_counts.get(person_id, 0),
+            'all_non_mandatory_chosen': counts.get('all_non_mandatory_chosen', 0),
+            'internship_abroad_count': counts.get('internship_abroad_count', 0),
+            **totals,
+        }
+        row['status'] = None if row['chosen_internships_count'] is None else (
+            row['chosen_internships_count'] - row['total_count']
+            + row['already_done_internships_in_parent_cohort_count']
+        )
+        row['choice_status'] = _get_choice_status(row)
+        rows[person_id] = row
+    return rows
+
+
+def _get_choice_status(row):
+    if row['status'] is None:
+        return UNKNOWN
+    if row['status'] >= 0 and row['all_non_mandatory_chosen'] >= row['all_non_mandatory_count']:
+        return OK
+    if row['status'] >= 1 - row['all_non_mandatory_count'] \
+            and row['internship_abroad_count'] > 0 and row['all_non_mandatory_chosen'] >= 1:
+        return OK
+    return NOK
+
+
+def _snapshot_key(cohort_id):
+    return 'internship_choice_status_{}'.format(cohort_id)
+
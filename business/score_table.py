@@ -0,0 +1,100 @@
+##############################################################################
+#
+#    OSIS stands for Open Student Information System. It's an application
+#    designed to manage the core business of higher education institutions,
+#    such as universities, faculties, institutes and professional schools.
+#    The core business involves the administration of students, teachers,
+#    courses, programs and so on.
+#
+#    Copyright (C) 2015-2025 Université catholique de Louvain (http://www.uclouvain.be)
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    A copy of this license - GNU General Public License - is available
+#    at the root of the source code of this program.  If not,
+#    see http://www.gnu.org/licenses/.
+#
+##############################################################################
+import hashlib
+from datetime import date
+
+from django.core.cache import cache
+from django.utils import translation
+
+from internship.utils.cache_versions import CacheVersions
+
+SCORE_TABLE_TIMEOUT = 24 * 60 * 60
+
+_cohort_versions = CacheVersions('internship_score_table_cohort')
+_person_versions = CacheVersions('internship_score_table_person')
+
+# attributes computed on each student of the score table
+STUDENT_ATTRIBUTES = (
+    'scores', 'numeric_scores', 'specialties', 'organizations', 'evaluations', 'comments', 'remedial_periods_count',
+    'preconcours_score', 'fulfill_condition', 'periods_scores', 'registration_id', 'evolution_score',
+)
+
+
+def apply_cached_rows(cohorts, periods, students):
+    """
+    Set on the students the attributes of the score table cached for the cohorts and periods.
+    :return: the students whose row is not cached and has to be computed
+    """
+    keys = _row_keys(cohorts, periods, students)
+    rows = cache.get_many(keys.values())
+    missing_students = []
+    for student in students:
+        row = rows.get(keys[student.person_id])
+        if row is None:
+            missing_students.append(student)
+        else:
+            for attribute, value in row.items():
+                setattr(student, attribute, value)
+    return missing_students
+
+
+def cache_rows(cohorts, periods, students):
+    keys = _row_keys(cohorts, periods, students)
+    cache.set_many({
+        keys[student.person_id]: {attribute: getattr(student, attribute) for attribute in STUDENT_ATTRIBUTES}
+        for student in students
+    }, SCORE_TABLE_TIMEOUT)
+
+
+def invalidate_persons(person_ids):
+    """ Discard the score table rows of the persons, in every cohort. """
+    _person_versions.invalidate(person_ids)
+
+
+def invalidate_cohorts(cohort_ids):
+    """ Discard the score table rows of every student of the cohorts. """
+    _cohort_versions.invalidate(cohort_ids)
+
+
+def _row_keys(cohorts, periods, students):
+    cohort_ids = sorted(cohort.pk for cohort in cohorts)
+    person_ids = [student.person_id for student in students]
+    cohort_versions = _cohort_versions.get(cohort_ids)
+    person_versions = _person_versions.get(person_ids)
+    # rows depend on the completed periods and on the translated comments
+    table_key = '{}_{}_{}_{}'.format(
+        '-'.join(cohort_versions[cohort_id] for cohort_id in cohort_ids),
+        '-'.join(str(period.pk) for period in periods),
+        date.today().isoformat(),
+        translation.get_language(),
+    )
+    table_hash = hashlib.md5(table_key.encode()).hexdigest()
+    return {
+        person_id: 'internship_score_table_{}_{}_{}'.format(
+            table_hash, person_id, person_versions[person_id]
+        ) for person_id in person_ids
+    }
+
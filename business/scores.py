@@ -23,7 +23,9 @@
 #    see http://www.gnu.org/licenses/.
 #
 ##############################################################################
-from internship.models.internship_score import APD_NUMBER
+from django.db.models import Count, Q
+
+from internship.models.internship_score import APD_NUMBER, InternshipScore
 
 
 class InternshipScoreRules:
@@ -66,3 +68,32 @@ class InternshipScoreRules:
     @classmethod
     def _apd_can_be_removed(cls, apd, apd_indices, score):
         return apd in apd_indices and score and cls.is_score_valid(apd, score)
+
+
+def get_apd_validation_matrix(cohort, students):
+    """
+    Compute in one aggregated query which APDs each student has validated in the cohort or its subcohorts.
+    :return: A dict of dict : <person id, <apd, validated>>.
+    """
+    cohorts = cohort.subcohorts.all() if cohort.is_parent else [cohort]
+    valid_counts = {
+        'APD_{}'.format(apd): Count('pk', filter=Q(**{
+            'APD_{}__in'.format(apd): InternshipScoreRules.get_valid_grades(apd - 1)
+        })) for apd in range(1, APD_NUMBER + 1)
+    }
+    rows = InternshipScore.objects.filter(
+        student_affectation__period__cohort__in=cohorts,
+        student_affectation__student__person_id__in=[student.person_id for student in students]
+    ).values('student_affectation__student__person').annotate(**valid_counts).order_by()
+    matrix = {student.person_id: {apd: False for apd in range(1, APD_NUMBER + 1)} for student in students}
+    for row in rows:
+        matrix[row['student_affectation__student__person']] = {
+            apd: row['APD_{}'.format(apd)] > 0 for apd in range(1, APD_NUMBER + 1)
+        }
+    return matrix
+
+
+def attach_apd_validation_matrix(cohort, students):
+    matrix = get_apd_validation_matrix(cohort, students)
+    for student in students:
+        student.apds_validation = matrix[student.person_id]
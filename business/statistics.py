@@ -28,6 +28,8 @@ from collections import OrderedDict
 from collections import defaultdict
 from operator import itemgetter
 
+from django.db.models import Count, Exists, OuterRef, Q, Sum
+
 from base.models.student import Student
 from internship import models
 from internship.models import period_internship_places
@@ -41,6 +43,13 @@ from statistics import mean, stdev
 
 HOSPITAL_ERROR = 999  # Reference of the hospital "erreur"
 
+CHOICE_STATS = (
+    ('first', ChoiceType.FIRST_CHOICE.value),
+    ('second', ChoiceType.SECOND_CHOICE.value),
+    ('third', ChoiceType.THIRD_CHOICE.value),
+    ('fourth', ChoiceType.FORTH_CHOICE.value),
+)
+
 
 def compute_stats(cohort, sol):
     """
@@ -251,6 +260,105 @@ def compute_stats(cohort, sol):
     return stats
 
 
+def compute_aggregated_stats(cohort, affectations):
+    """
+    Compute the statistics of the solution with grouped aggregates on the affectations queryset, in a constant number
+    of queries, instead of walking the whole solution built by load_solution_sol.
+    Every affectation is counted, and others_specialities_students holds the number of students instead of their set.
+    """
+    affectations = affectations.order_by()
+    is_imposed = Q(choice=ChoiceType.IMPOSED.value)
+    aggregates = {
+        'tot_stud': Count('student', distinct=True),
+        'sol_cost': Sum('cost'),
+        'consecutive_month': Count('id', filter=Q(consecutive_month=True)),
+        'hospital_error': Count('id', filter=Q(organization__reference__contains=str(HOSPITAL_ERROR))),
+        'erasmus': Count('id', filter=Q(choice=ChoiceType.PRIORITY.value)),
+        'others': Count('id', filter=is_imposed),
+        'others_students': Count('student', distinct=True, filter=is_imposed),
+    }
+    for key, choice in CHOICE_STATS:
+        aggregates[key] = Count('id', filter=Q(choice=choice))
+        aggregates[key + '_n'] = Count('id', filter=Q(choice=choice, type=AffectationType.NORMAL.value))
+        aggregates[key + '_s'] = Count('id', filter=Q(choice=choice, type=AffectationType.PRIORITY.value))
+    stats = affectations.aggregate(**aggregates)
+
+    scores = list(affectations.values('student').annotate(score=Sum('cost')).values_list('score', flat=True))
+    number_of_students = stats['tot_stud']
+    total_internships = number_of_students * 8
+    stats['total_internships'] = total_internships
+    stats['mean_stud'] = round(mean(scores), 2)
+    stats['std_dev_stud'] = round(stdev(scores), 2) if len(scores) > 1 else 0
+    stats['mean_noncons'] = round(stats.pop('consecutive_month') / number_of_students, 2)
+    stats['distance_mean'] = 0
+
+    stats['others_specialities'], stats['others_specialities_students'] = _get_imposed_choices_by_speciality(
+        cohort, affectations.filter(is_imposed)
+    )
+    stats['non_mandatory_internships'] = _get_non_mandatory_internships_stats(affectations)
+
+    internships = Internship.objects.filter(cohort=cohort)
+    priority_choices = InternshipChoice.objects.filter(internship__in=internships, priority=True)
+    enrollments = models.internship_enrollment.InternshipEnrollment.objects.filter(period__cohort=cohort)
+    erasmus_enrollments = enrollments.filter(
+        student=OuterRef('student'), internship_offer__speciality=OuterRef('speciality')
+    )
+    stats.update(priority_choices.annotate(erasmus=Exists(erasmus_enrollments)).aggregate(
+        socio=Count('student', distinct=True),
+        socio_students=Count('student', distinct=True, filter=Q(erasmus=False)),
+    ))
+    stats['erasmus_students'] = enrollments.aggregate(count=Count('student', distinct=True))['count']
+
+    for key in ['erasmus', 'socio', 'others'] + [key for key, _ in CHOICE_STATS]:
+        stats[key + '_pc'] = _percentage(stats[key], total_internships)
+    for key in ['erasmus_students', 'socio_students']:
+        stats[key + '_pc'] = _percentage(stats[key], number_of_students)
+
+    total_n_internships = sum(stats[key + '_n'] for key, _ in CHOICE_STATS) + stats['others'] or 1
+    total_s_internships = sum(stats[key + '_s'] for key, _ in CHOICE_STATS) or 1
+    for key, _ in CHOICE_STATS:
+        stats[key + '_n_pc'] = _percentage(stats[key + '_n'], total_n_internships)
+        stats[key + '_s_pc'] = _percentage(stats[key + '_s'], total_s_internships)
+    stats['others_n_pc'] = _percentage(stats['others'], total_n_internships)
+    return stats
+
+
+def _percentage(value, total):
+    return round(value / total * 100, 2)
+
+
+def _get_imposed_choices_by_speciality(cohort, imposed_affectations):
+    cohorts = list(cohort.subcohorts.all()) if cohort.is_parent else [cohort]
+    specialities = InternshipSpeciality.objects.filter(cohort__in=cohorts).select_related('cohort')
+    counts = {
+        row['speciality']: row
+        for row in imposed_affectations.values('speciality').annotate(
+            count=Count('id'), students=Count('student', distinct=True)
+        )
+    }
+    others_specialities = {c.name: {} for c in cohorts}
+    others_specialities_students = {c.name: {} for c in cohorts}
+    for speciality in specialities:
+        row = counts.get(speciality.id, {})
+        others_specialities[speciality.cohort.name][speciality] = row.get('count', 0)
+        others_specialities_students[speciality.cohort.name][speciality] = row.get('students', 0)
+    return others_specialities, others_specialities_students
+
+
+def _get_non_mandatory_internships_stats(affectations):
+    counts = affectations.filter(
+        internship__isnull=False, internship__speciality__isnull=True
+    ).values('internship__name').annotate(count=Count('id')).order_by('internship__name')
+    total = sum(row['count'] for row in counts)
+    non_mandatory_internships_stats = {'count': total}
+    for row in counts:
+        non_mandatory_internships_stats[row['internship__name']] = {
+            'count': row['count'],
+            'perc': _percentage(row['count'], total),
+        }
+    return non_mandatory_internships_stats
+
+
 def load_solution_table(data, periods):
     period_ids = [period.id for period in periods]
     prd_internship_places = period_internship_places.PeriodInternshipPlaces.objects.filter(
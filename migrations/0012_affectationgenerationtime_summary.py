@@ -0,0 +1,18 @@
+# Generated by Django 4.2.20 on 2026-10-18 10:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('internship', '0011_alter_internshipscore_behavior_score_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='affectationgenerationtime',
+            name='summary',
+            field=models.JSONField(blank=True, null=True, verbose_name='Summary'),
+        ),
+    ]
@@ -32,7 +32,7 @@ from django.utils.translation import gettext_lazy as _
 
 class AffectationGenerationTimeAdmin(admin.ModelAdmin):
     list_display = ('start_date_time', 'end_date_time', 'generated_by', 'cohort')
-    fieldsets = ((None, {'fields': ('start_date_time', 'end_date_time', 'generated_by', 'cohort')}),)
+    fieldsets = ((None, {'fields': ('start_date_time', 'end_date_time', 'generated_by', 'cohort', 'summary')}),)
 
 
 class AffectationGenerationTime(models.Model):
@@ -40,6 +40,7 @@ class AffectationGenerationTime(models.Model):
     end_date_time = models.DateTimeField(verbose_name=_('End date time'))
     generated_by = models.CharField(max_length=255, default='None', verbose_name=_('Generated by'))
     cohort = models.ForeignKey('internship.cohort', on_delete=models.CASCADE, verbose_name=_('Cohort'))
+    summary = models.JSONField(null=True, blank=True, verbose_name=_('Summary'))
 
     def __str__(self):
         return u"%s - %s" % (self.start_date_time, self.end_date_time)
@@ -0,0 +1,105 @@
+##############################################################################
+#
+#    OSIS stands for Open Student Information System. It's an application
+#    designed to manage the core business of higher education institutions,
+#    such as universities, faculties, institutes and professional schools.
+#    The core business involves the administration of students, teachers,
+#    courses, programs and so on.
+#
+#    Copyright (C) 2015-2025 Université catholique de Louvain (http://www.uclouvain.be)
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    A copy of this license - GNU General Public License - is available
+#    at the root of the source code of this program.  If not,
+#    see http://www.gnu.org/licenses/.
+#
+##############################################################################
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from base.models.student import Student
+from internship.api import response_cache
+from internship.business import choice_demand, choice_status, score_table
+from internship.models.cohort import Cohort
+from internship.models.internship import Internship
+from internship.models.internship_choice import InternshipChoice
+from internship.models.internship_offer import InternshipOffer
+from internship.models.internship_score import InternshipScore
+from internship.models.internship_score_mapping import InternshipScoreMapping
+from internship.models.internship_speciality import InternshipSpeciality
+from internship.models.internship_student_affectation_stat import InternshipStudentAffectationStat
+from internship.models.internship_student_information import InternshipStudentInformation
+from internship.models.organization import Organization
+from internship.models.period import Period
+
+
+@receiver([post_save, post_delete], sender=InternshipScore)
+def invalidate_score_table_of_score(sender, instance, **kwargs):
+    score_table.invalidate_persons(
+        InternshipStudentAffectationStat.objects.filter(
+            pk=instance.student_affectation_id
+        ).values_list('student__person_id', flat=True)
+    )
+
+
+@receiver([post_save, post_delete], sender=InternshipStudentAffectationStat)
+def invalidate_score_table_of_affectation(sender, instance, **kwargs):
+    person_ids = list(Student.objects.filter(pk=instance.student_id).values_list('person_id', flat=True))
+    score_table.invalidate_persons(person_ids)
+    choice_status.invalidate_persons(person_ids)
+
+
+@receiver([post_save, post_delete], sender=InternshipStudentInformation)
+def invalidate_score_table_of_student_information(sender, instance, **kwargs):
+    score_table.invalidate_persons([instance.person_id])
+
+
+@receiver([post_save, post_delete], sender=InternshipScoreMapping)
+@receiver([post_save, post_delete], sender=Period)
+@receiver([post_save, post_delete], sender=Organization)
+@receiver([post_save, post_delete], sender=InternshipSpeciality)
+def invalidate_score_table_of_cohort(sender, instance, **kwargs):
+    score_table.invalidate_cohorts([instance.cohort_id])
+
+
+@receiver([post_save, post_delete], sender=InternshipChoice)
+def invalidate_choice_demand_of_choice(sender, instance, **kwargs):
+    cohort_ids = list(Organization.objects.filter(pk=instance.organization_id).values_list('cohort_id', flat=True))
+    choice_demand.invalidate_cohorts(cohort_ids)
+    response_cache.invalidate_cohorts(cohort_ids, scopes=(response_cache.CHOICES,))
+    choice_status.invalidate_persons(
+        Student.objects.filter(pk=instance.student_id).values_list('person_id', flat=True)
+    )
+
+
+@receiver([post_save, post_delete], sender=Internship)
+def invalidate_choice_demand_of_internship(sender, instance, **kwargs):
+    choice_demand.invalidate_cohorts([instance.cohort_id])
+    choice_status.invalidate_cohorts([instance.cohort_id])
+
+
+@receiver([post_save, post_delete], sender=InternshipOffer)
+@receiver([post_save, post_delete], sender=Period)
+def invalidate_api_responses_of_cohort(sender, instance, **kwargs):
+    response_cache.invalidate_cohorts([instance.cohort_id])
+
+
+@receiver([post_save, post_delete], sender=InternshipSpeciality)
+@receiver([post_save, post_delete], sender=Organization)
+def invalidate_api_responses_and_choices_of_cohort(sender, instance, **kwargs):
+    # the first choices count holds the names of the organizations and specialties
+    response_cache.invalidate_cohorts([instance.cohort_id], scopes=(response_cache.CATALOGUE, response_cache.CHOICES))
+
+
+@receiver([post_save, post_delete], sender=Cohort)
+def invalidate_api_responses(sender, instance, **kwargs):
+    response_cache.invalidate_all()
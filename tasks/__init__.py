@@ -1,6 +1,7 @@
 from celery.schedules import crontab
 
 from backoffice.celery import app as celery_app
+from . import run_affectation_generation
 from . import send_period_encoding_recap_mail
 from . import send_period_encoding_reminder_mail
 
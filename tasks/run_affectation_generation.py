@@ -0,0 +1,10 @@
+from backoffice.celery import app as celery_app
+from internship.business import affectation_generation
+from internship.models.cohort import Cohort
+
+
+@celery_app.task
+def run(cohort_id: int, username: str, solver: str = 'greedy', runs: int = 1) -> dict:
+    cohort = Cohort.objects.get(pk=cohort_id)
+    affectation_generation.generate_affectations(cohort, username, solver=solver, runs=runs)
+    return {}
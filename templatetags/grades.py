@@ -25,8 +25,7 @@
 ##############################################################################
 from django.template.defaulttags import register
 
-from internship.business.scores import InternshipScoreRules
-from internship.models.internship_score import InternshipScore
+from internship.business.scores import InternshipScoreRules, get_apd_validation_matrix
 
 
 @register.filter()
@@ -38,12 +37,11 @@ def is_valid(grade, index):
 
 @register.simple_tag
 def is_apd_validated(cohort, student, apd):
-    cohorts = cohort.subcohorts.all() if cohort.is_parent else [cohort]
-    apd_grades = InternshipScore.objects.filter(
-        student_affectation__period__cohort__in=cohorts, student_affectation__student__person=student.person
-    ).values_list('APD_{}'.format(apd), flat=True)
-    valid_grades = InternshipScoreRules.get_valid_grades(apd-1)
-    return bool(set(apd_grades).intersection(valid_grades))
+    # students listed in scores encoding come with their matrix attached by attach_apd_validation_matrix
+    apds_validation = getattr(student, 'apds_validation', None)
+    if apds_validation is None:
+        apds_validation = get_apd_validation_matrix(cohort, [student])[student.person_id]
+    return apds_validation[apd]
 
 
 @register.filter()
@@ -0,0 +1,130 @@
+##############################################################################
+#
+#    OSIS stands for Open Student Information System. It's an application
+#    designed to manage the core business of higher education institutions,
+#    such as universities, faculties, institutes and professional schools.
+#    The core business involves the administration of students, teachers,
+#    courses, programs and so on.
+#
+#    Copyright (C) 2015-2025 Université catholique de Louvain (http://www.uclouvain.be)
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    A copy of this license - GNU General Public License - is available
+#    at the root of the source code of this program.  If not,
+#    see http://www.gnu.org/licenses/.
+#
+##############################################################################
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework import status
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from base.tests.factories.student import StudentFactory
+from base.tests.factories.user import UserFactory
+from internship.api.views.cohort import CohortOpenForSelection
+from internship.api.views.internship_choice import FirstChoiceOrganizationCount
+from internship.api.views.internship_offer import InternshipOfferList
+from internship.models.internship_offer import InternshipOffer
+from internship.tests.factories.cohort import CohortFactory
+from internship.tests.factories.internship import InternshipFactory
+from internship.tests.factories.internship_choice import create_internship_choice
+from internship.tests.factories.offer import OfferFactory
+from internship.tests.factories.organization import OrganizationFactory
+from internship.tests.factories.speciality import SpecialtyFactory
+
+
+class ResponseCacheTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = UserFactory()
+        cls.cohort = CohortFactory()
+        cls.organization = OrganizationFactory(cohort=cls.cohort)
+        cls.specialty = SpecialtyFactory(cohort=cls.cohort)
+        cls.offer = OfferFactory(
+            cohort=cls.cohort, organization=cls.organization, speciality=cls.specialty, selectable=True
+        )
+        cls.internship = InternshipFactory(cohort=cls.cohort, speciality=cls.specialty)
+        cls.factory = APIRequestFactory()
+
+    def tearDown(self):
+        cache.clear()
+
+    def _get(self, view, path, etag=None, **kwargs):
+        headers = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+        request = self.factory.get(path, **headers)
+        force_authenticate(request, user=self.user)
+        return view.as_view()(request, **kwargs)
+
+    def _is_open_for_selection(self, etag=None):
+        return self._get(
+            CohortOpenForSelection, '/cohorts/{}/is_open_for_selection'.format(self.cohort.name),
+            etag=etag, name=self.cohort.name
+        )
+
+    def test_not_modified_with_current_etag(self):
+        response = self._is_open_for_selection()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {'is_open_for_selection': True})
+
+        response = self._is_open_for_selection(etag=response['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_cached_response_until_offer_saved(self):
+        etag = self._is_open_for_selection()['ETag']
+        # queryset updates do not send the save signals
+        InternshipOffer.objects.filter(pk=self.offer.pk).update(selectable=False)
+        response = self._is_open_for_selection()
+        self.assertEqual(response.data, {'is_open_for_selection': True})
+        self.assertEqual(response['ETag'], etag)
+
+        self.offer.refresh_from_db()
+        self.offer.save()
+        response = self._is_open_for_selection(etag=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {'is_open_for_selection': False})
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_first_choices_count_invalidated_by_choice(self):
+        path = '/first_choices_count/{}/'.format(self.cohort.name)
+        response = self._get(FirstChoiceOrganizationCount, path, cohort_name=self.cohort.name)
+        self.assertEqual(len(response.data), 0)
+
+        create_internship_choice(
+            organization=self.organization, student=StudentFactory(), speciality=self.specialty,
+            internship=self.internship,
+        )
+        response = self._get(FirstChoiceOrganizationCount, path, etag=response['ETag'], cohort_name=self.cohort.name)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data[0]['count'], 1)
+
+    def test_first_choices_count_invalidated_by_organization(self):
+        path = '/first_choices_count/{}/'.format(self.cohort.name)
+        etag = self._get(FirstChoiceOrganizationCount, path, cohort_name=self.cohort.name)['ETag']
+        self.organization.name = 'Renamed hospital'
+        self.organization.save()
+        response = self._get(FirstChoiceOrganizationCount, path, etag=etag, cohort_name=self.cohort.name)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_catalogue_not_invalidated_by_choice(self):
+        path = '/offers/?cohort_name={}'.format(self.cohort.name)
+        etag = self._get(InternshipOfferList, path)['ETag']
+        create_internship_choice(
+            organization=self.organization, student=StudentFactory(), speciality=self.specialty,
+            internship=self.internship,
+        )
+        response = self._get(InternshipOfferList, path, etag=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_not_cached_without_cohort(self):
+        response = self._get(InternshipOfferList, '/offers/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(response.has_header('ETag'))
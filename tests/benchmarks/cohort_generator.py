@@ -0,0 +1,169 @@
+##############################################################################
+#
+#    OSIS stands for Open Student Information System. It's an application
+#    designed to manage the core business of higher education institutions,
+#    such as universities, faculties, institutes and professional schools.
+#    The core business involves the administration of students, teachers,
+#    courses, programs and so on.
+#
+#    Copyright (C) 2015-2025 Université catholique de Louvain (http://www.uclouvain.be)
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    A copy of this license - GNU General Public License - is available
+#    at the root of the source code of this program.  If not,
+#    see http://www.gnu.org/licenses/.
+#
+##############################################################################
+import random
+
+import pendulum
+
+from base.tests.factories.person import PersonFactory
+from base.tests.factories.student import StudentFactory
+from internship.models.internship_choice import InternshipChoice
+from internship.models.period_internship_places import PeriodInternshipPlaces
+from internship.tests.factories.cohort import CohortFactory
+from internship.tests.factories.internship import InternshipFactory
+from internship.tests.factories.internship_enrollment import InternshipEnrollmentFactory
+from internship.tests.factories.internship_student_information import InternshipStudentInformationFactory
+from internship.tests.factories.offer import OfferFactory
+from internship.tests.factories.organization import OrganizationFactory
+from internship.tests.factories.period import PeriodFactory
+from internship.tests.factories.speciality import SpecialtyFactory
+from reference.tests.factories.country import CountryFactory
+
+HOSPITAL_ERROR_REFERENCE = '999'
+
+DEFAULT_CONFIGURATION = {
+    'students': 50,
+    'hospitals': 10,
+    'specialties': 6,
+    'non_mandatory_specialties': 4,
+    'periods': 8,
+    'subcohorts': 0,
+    'priority_ratio': 0.05,
+    'erasmus_ratio': 0.02,
+    'places_ratio': 1.2,
+    'seed': 0,
+}
+
+
+def generate_cohort(**configuration):
+    """
+    Create a synthetic cohort ready for the assignment algorithm, with the existing factories.
+
+    Every student makes 4 choices for each internship. The places of each (speciality, period) are spread over the
+    hospitals so that there are `places_ratio` places per student. With `subcohorts`, a parent cohort is created
+    with that many subcohorts sharing the students, the periods and the mandatory specialties being split between
+    them and the non mandatory internship belonging to the last one. A ratio of the students have priority choices,
+    another one (erasmus) has all their mandatory internships already enrolled.
+
+    :return: the cohorts to assign (the subcohorts, or the cohort itself)
+    """
+    configuration = dict(DEFAULT_CONFIGURATION, **configuration)
+    generator = random.Random(configuration['seed'])
+    country = CountryFactory()
+    persons = [PersonFactory() for _ in range(configuration['students'])]
+    students = [StudentFactory(person=person) for person in persons]
+
+    if configuration['subcohorts']:
+        parent_cohort = CohortFactory(is_parent=True)
+        cohorts = [CohortFactory(parent_cohort=parent_cohort) for _ in range(configuration['subcohorts'])]
+    else:
+        cohorts = [CohortFactory()]
+
+    period_names = ["P{}".format(number) for number in range(1, configuration['periods'] + 1)]
+    specialty_names = ["specialty-{}".format(number) for number in range(1, configuration['specialties'] + 1)]
+    for index, cohort in enumerate(cohorts):
+        is_last = index == len(cohorts) - 1
+        _generate_cohort_content(
+            cohort,
+            configuration,
+            generator,
+            students,
+            country,
+            period_names=_chunk(period_names, len(cohorts), index),
+            specialty_names=_chunk(specialty_names, len(cohorts), index),
+            with_non_mandatory_internship=is_last,
+        )
+    return cohorts
+
+
+def _generate_cohort_content(cohort, configuration, generator, students, country, period_names, specialty_names,
+                             with_non_mandatory_internship):
+    start = pendulum.today().start_of('month')
+    periods = []
+    for index, name in enumerate(period_names):
+        date_start = start.add(months=index)
+        periods.append(
+            PeriodFactory(cohort=cohort, name=name, date_start=date_start, date_end=date_start.end_of('month'))
+        )
+    for student in students:
+        InternshipStudentInformationFactory(cohort=cohort, person=student.person, country=country)
+
+    hospital_error = OrganizationFactory(cohort=cohort, name='Hospital Error', reference=HOSPITAL_ERROR_REFERENCE)
+    hospitals = [
+        OrganizationFactory(cohort=cohort, reference="{:02d}".format(number))
+        for number in range(1, configuration['hospitals'] + 1)
+    ]
+
+    mandatory_specialties = [SpecialtyFactory(cohort=cohort, name=name, mandatory=True) for name in specialty_names]
+    internships = [
+        InternshipFactory(cohort=cohort, name=specialty.name, speciality=specialty, position=position)
+        for position, specialty in enumerate(mandatory_specialties)
+    ]
+    non_mandatory_specialties = []
+    if with_non_mandatory_internship:
+        non_mandatory_specialties = [
+            SpecialtyFactory(cohort=cohort, mandatory=False) for _ in range(configuration['non_mandatory_specialties'])
+        ]
+        internships.append(InternshipFactory(cohort=cohort, name="Stage au choix", position=len(internships)))
+
+    offers = {}
+    for specialty in mandatory_specialties + non_mandatory_specialties:
+        for hospital in hospitals + [hospital_error]:
+            offers[(hospital, specialty)] = OfferFactory(cohort=cohort, organization=hospital, speciality=specialty)
+
+    places_by_offer = max(1, round(len(students) * configuration['places_ratio'] / len(hospitals)))
+    PeriodInternshipPlaces.objects.bulk_create([
+        PeriodInternshipPlaces(
+            period=period,
+            internship_offer=offer,
+            number_places=len(students) if offer.organization == hospital_error else places_by_offer,
+        ) for offer in offers.values() for period in periods
+    ])
+
+    priority_count = round(len(students) * configuration['priority_ratio'])
+    erasmus_count = round(len(students) * configuration['erasmus_ratio'])
+    choices = []
+    for index, student in enumerate(students):
+        for internship in internships:
+            specialty = internship.speciality or generator.choice(non_mandatory_specialties)
+            for choice, hospital in enumerate(generator.sample(hospitals, min(4, len(hospitals))), start=1):
+                choices.append(InternshipChoice(
+                    student=student, internship=internship, speciality=specialty, organization=hospital,
+                    choice=choice, priority=index < priority_count,
+                ))
+        if priority_count <= index < priority_count + erasmus_count:
+            for internship, period in zip(internships, periods):
+                if internship.speciality:
+                    hospital = generator.choice(hospitals)
+                    InternshipEnrollmentFactory(
+                        student=student, internship=internship, period=period, place=hospital,
+                        internship_offer=offers[(hospital, internship.speciality)],
+                    )
+    InternshipChoice.objects.bulk_create(choices)
+
+
+def _chunk(items, count, index):
+    size = len(items) // count
+    return items[index * size:] if index == count - 1 else items[index * size:(index + 1) * size]
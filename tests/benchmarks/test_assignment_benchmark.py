@@ -0,0 +1,145 @@
+##############################################################################
+#
+#    OSIS stands for Open Student Information System. It's an application
+#    designed to manage the core business of higher education institutions,
+#    such as universities, faculties, institutes and professional schools.
+#    The core business involves the administration of students, teachers,
+#    courses, programs and so on.
+#
+#    Copyright (C) 2015-2025 Université catholique de Louvain (http://www.uclouvain.be)
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    A copy of this license - GNU General Public License - is available
+#    at the root of the source code of this program.  If not,
+#    see http://www.gnu.org/licenses/.
+#
+##############################################################################
+"""
+Benchmark of the assignment algorithm on synthetic cohorts.
+
+Skipped unless INTERNSHIP_BENCHMARK lists the scenarios to run, e.g.:
+
+    INTERNSHIP_BENCHMARK=small,medium python manage.py test internship.tests.benchmarks
+
+Each phase of a run is timed, its SQL queries are counted and its peak memory is recorded. Results are written as
+JSON to INTERNSHIP_BENCHMARK_OUTPUT (assignment_benchmark.json by default) to compare them between commits.
+"""
+import json
+import os
+import subprocess
+import timeit
+import tracemalloc
+from contextlib import contextmanager
+from unittest import skipUnless
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from internship.business.assignment import Assignment, _clean_previous_solution
+from internship.business.assignment_snapshot import CohortSnapshot
+from internship.tests.benchmarks.cohort_generator import generate_cohort
+
+SCENARIOS = {
+    'small': {'students': 50, 'hospitals': 10, 'specialties': 6, 'periods': 8},
+    'medium': {'students': 200, 'hospitals': 30, 'specialties': 8, 'periods': 10},
+    'large': {'students': 500, 'hospitals': 60, 'specialties': 10, 'periods': 12},
+    'subcohorts': {'students': 200, 'hospitals': 30, 'specialties': 9, 'periods': 12, 'subcohorts': 3},
+}
+
+BENCHMARK_SCENARIOS = [name for name in os.environ.get('INTERNSHIP_BENCHMARK', '').split(',') if name]
+BENCHMARK_OUTPUT = os.environ.get('INTERNSHIP_BENCHMARK_OUTPUT', 'assignment_benchmark.json')
+
+
+@skipUnless(BENCHMARK_SCENARIOS, 'set INTERNSHIP_BENCHMARK to run the assignment benchmark')
+class AssignmentBenchmark(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.results = []
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        with open(BENCHMARK_OUTPUT, 'w') as output:
+            json.dump({'commit': _get_commit(), 'scenarios': cls.results}, output, indent=2)
+
+    def test_benchmark(self):
+        for name in BENCHMARK_SCENARIOS:
+            with self.subTest(scenario=name):
+                self.results.append(self._run_scenario(name, SCENARIOS[name]))
+
+    def _run_scenario(self, name, configuration):
+        cohorts = generate_cohort(**configuration)
+        phases = {}
+        solver_phases = {}
+        counters = {}
+        affectations_count = 0
+        total_cost = 0
+        for cohort in cohorts:
+            with _measure(phases, 'clean_previous_solution'):
+                _clean_previous_solution(cohort)
+            with _measure(phases, 'load_snapshot'):
+                snapshot = CohortSnapshot(cohort)
+            assignment = Assignment(cohort, snapshot, seed=configuration.get('seed', 0))
+            with _measure(phases, 'compute_solution'):
+                assignment.compute_solution()
+            with _measure(phases, 'persist_solution'):
+                assignment.persist_solution()
+            summary = assignment.summary()
+            for phase_name, phase in summary['phases'].items():
+                solver_phase = solver_phases.setdefault(phase_name, {'duration': 0, 'queries': 0})
+                solver_phase['duration'] += phase['duration']
+                solver_phase['queries'] += phase['queries']
+            for counter, value in summary['counters'].items():
+                counters[counter] = counters.get(counter, 0) + value
+            affectations_count += len(assignment.affectations)
+            total_cost += sum(affectation.cost for affectation in assignment.affectations)
+
+        self.assertTrue(affectations_count)
+        return {
+            'scenario': name,
+            'configuration': configuration,
+            'phases': phases,
+            'solver_phases': solver_phases,
+            'counters': counters,
+            'total': {
+                'duration': sum(phase['duration'] for phase in phases.values()),
+                'queries': sum(phase['queries'] for phase in phases.values()),
+                'peak_memory': max(phase['peak_memory'] for phase in phases.values()),
+            },
+            'affectations': affectations_count,
+            'sol_cost': total_cost,
+        }
+
+
+@contextmanager
+def _measure(phases, name):
+    """ Add the duration, the SQL queries and the peak memory (bytes) of the block to the phase. """
+    phase = phases.setdefault(name, {'duration': 0, 'queries': 0, 'peak_memory': 0})
+    tracemalloc.start()
+    start = timeit.default_timer()
+    with CaptureQueriesContext(connection) as queries:
+        yield
+    phase['duration'] += timeit.default_timer() - start
+    phase['queries'] += len(queries)
+    phase['peak_memory'] = max(phase['peak_memory'], tracemalloc.get_traced_memory()[1])
+    tracemalloc.stop()
+
+
+def _get_commit():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', 'HEAD'], cwd=os.path.dirname(__file__), stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
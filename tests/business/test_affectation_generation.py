@@ -0,0 +1,83 @@
+##############################################################################
+#
+#    OSIS stands for Open Student Information System. It's an application
+#    designed to manage the core business of higher education institutions,
+#    such as universities, faculties, institutes and professional schools.
+#    The core business involves the administration of students, teachers,
+#    courses, programs and so on.
+#
+#    Copyright (C) 2015-2025 Université catholique de Louvain (http://www.uclouvain.be)
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    A copy of this license - GNU General Public License - is available
+#    at the root of the source code of this program.  If not,
+#    see http://www.gnu.org/licenses/.
+#
+##############################################################################
+import mock
+from django.core.cache import cache
+from django.test import TestCase
+
+from internship.business import affectation_generation
+from internship.models.affectation_generation_time import AffectationGenerationTime
+from internship.tests.factories.cohort import CohortFactory
+
+
+class AffectationGenerationTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.cohort = CohortFactory()
+
+    def tearDown(self):
+        cache.clear()
+
+    @mock.patch('internship.business.affectation_generation.assignment.Assignment')
+    def test_generate_affectations_records_generation_time(self, mock_assignment):
+        mock_assignment.return_value = mock.Mock(count=3, total_count=3, internship_count=2, objective=None)
+        mock_assignment.return_value.summary.return_value = {'phases': {'balancing': {'duration': 1, 'queries': 0}}}
+        affectation_generation.generate_affectations(self.cohort, 'demo')
+        self.assertTrue(mock_assignment.return_value.solve.called)
+        self.assertTrue(mock_assignment.return_value.persist_solution.called)
+        generation = AffectationGenerationTime.objects.get(cohort=self.cohort)
+        self.assertEqual(generation.generated_by, 'demo')
+        self.assertEqual(generation.summary, {'phases': {'balancing': {'duration': 1, 'queries': 0}}})
+        progress = affectation_generation.get_progress(self.cohort)
+        self.assertEqual(progress['status'], affectation_generation.DONE)
+        self.assertEqual(progress['count'], 3)
+        self.assertFalse(affectation_generation.is_running(self.cohort))
+
+    @mock.patch('internship.business.affectation_generation.assignment.Assignment')
+    def test_generate_affectations_failure(self, mock_assignment):
+        mock_assignment.return_value.solve.side_effect = ValueError
+        with self.assertRaises(ValueError):
+            affectation_generation.generate_affectations(self.cohort, 'demo')
+        self.assertEqual(affectation_generation.get_progress(self.cohort)['status'], affectation_generation.FAILED)
+        self.assertFalse(AffectationGenerationTime.objects.filter(cohort=self.cohort).exists())
+
+    def test_progress_reporter_stores_solver_counters(self):
+        reporter = affectation_generation.ProgressReporter(self.cohort)
+        reporter(mock.Mock(count=1, total_count=10, internship_count=4, internships=[]))
+        progress = affectation_generation.get_progress(self.cohort)
+        self.assertEqual(progress['status'], affectation_generation.RUNNING)
+        self.assertEqual((progress['count'], progress['total_count'], progress['internship_count']), (1, 10, 4))
+        self.assertTrue(affectation_generation.is_running(self.cohort))
+
+    @mock.patch('internship.business.affectation_generation.assignment.Assignment')
+    def test_start_generation_takes_lock_until_generation_ends(self, mock_assignment):
+        mock_assignment.return_value = mock.Mock(count=0, total_count=0, internship_count=0, objective=None)
+        mock_assignment.return_value.summary.return_value = {}
+        self.assertTrue(affectation_generation.start_generation(self.cohort))
+        self.assertEqual(affectation_generation.get_progress(self.cohort)['status'], affectation_generation.PENDING)
+        self.assertFalse(affectation_generation.start_generation(self.cohort))
+
+        affectation_generation.generate_affectations(self.cohort, 'demo')
+        self.assertTrue(affectation_generation.start_generation(self.cohort))
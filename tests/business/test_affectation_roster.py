@@ -0,0 +1,86 @@
+##############################################################################
+#
+#    OSIS stands for Open Student Information System. It's an application
+#    designed to manage the core business of higher education institutions,
+#    such as universities, faculties, institutes and professional schools.
+#    The core business involves the administration of students, teachers,
+#    courses, programs and so on.
+#
+#    Copyright (C) 2015-2025 Université catholique de Louvain (http://www.uclouvain.be)
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    A copy of this license - GNU General Public License - is available
+#    at the root of the source code of this program.  If not,
+#    see http://www.gnu.org/licenses/.
+#
+##############################################################################
+from django.test import TestCase
+
+from base.tests.factories.person import PersonFactory
+from base.tests.factories.person_address import PersonAddressFactory
+from base.tests.factories.student import StudentFactory
+from internship.business import affectation_roster
+from internship.tests.factories.cohort import CohortFactory
+from internship.tests.factories.internship_student_information import InternshipStudentInformationFactory
+from internship.tests.factories.master_allocation import MasterAllocationFactory
+from internship.tests.factories.organization import OrganizationFactory
+from internship.tests.factories.period import PeriodFactory
+from internship.tests.factories.speciality import SpecialtyFactory
+from internship.tests.factories.student_affectation_stat import StudentAffectationStatFactory
+
+
+class AffectationRosterTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.cohort = CohortFactory()
+        cls.organization = OrganizationFactory(cohort=cls.cohort)
+        cls.specialty = SpecialtyFactory(cohort=cls.cohort)
+        cls.students = [StudentFactory() for _ in range(0, 3)]
+        for student in cls.students:
+            InternshipStudentInformationFactory(person=student.person, cohort=cls.cohort)
+            PersonAddressFactory(person=student.person)
+            for period in [PeriodFactory(cohort=cls.cohort) for _ in range(0, 2)]:
+                StudentAffectationStatFactory(
+                    student=student, organization=cls.organization, speciality=cls.specialty, period=period
+                )
+        for last_name in ['Zorro', 'Adams']:
+            MasterAllocationFactory(
+                organization=cls.organization, specialty=cls.specialty, master__person=PersonFactory(
+                    last_name=last_name, first_name='Jo'
+                )
+            )
+
+    def test_load_roster_in_fixed_number_of_queries(self):
+        with self.assertNumQueries(3):
+            affectations = affectation_roster.load_roster([self.organization])
+            rows = [
+                (affectation.student.person.last_name, affectation.period.name, affectation.speciality.name)
+                for affectation in affectations
+            ]
+        self.assertEqual(len(rows), 6)
+        for affectation in affectations:
+            self.assertEqual(affectation.master, 'ADAMS Jo, ZORRO Jo')
+            self.assertNotEqual(affectation.email, '')
+            self.assertNotEqual(affectation.adress, '')
+
+    def test_load_roster_without_student_information(self):
+        student = StudentFactory()
+        StudentAffectationStatFactory(
+            student=student, organization=self.organization, speciality=self.specialty,
+            period=PeriodFactory(cohort=self.cohort)
+        )
+        affectation = next(
+            affectation for affectation in affectation_roster.load_roster([self.organization])
+            if affectation.student == student
+        )
+        self.assertEqual((affectation.email, affectation.adress, affectation.phone_mobile), ('', '', ''))
+        self.assertEqual(affectation.master, 'ADAMS Jo, ZORRO Jo')
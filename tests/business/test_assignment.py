@@ -25,6 +25,7 @@
 ##############################################################################
 import random
 from datetime import timedelta
+from types import SimpleNamespace
 from unittest import skip
 
 from django.contrib.auth.models import User, Permission
@@ -34,8 +35,11 @@ from django.utils import timezone
 from base.models.student import Student
 from base.tests.factories.person import PersonFactory
 from base.tests.factories.student import StudentFactory
-from internship.business.assignment import difference, Assignment, _permute_affectations
-from internship.business.statistics import load_solution_sol, compute_stats
+from internship.business.assignment import difference, Assignment, _balance_assignments
+from internship.business.assignment_multistart import MultiStartAssignment
+from internship.business.assignment_optimizer import OptimalAssignment
+from internship.business.assignment_snapshot import CohortSnapshot
+from internship.business.statistics import load_solution_sol, compute_stats, compute_aggregated_stats
 from internship.models.internship_choice import InternshipChoice
 from internship.models.internship_enrollment import InternshipEnrollment
 from internship.models.internship_modality_period import InternshipModalityPeriod
@@ -53,6 +57,7 @@ from internship.tests.factories.period import PeriodFactory
 from internship.tests.factories.period_internship_places import PeriodInternshipPlacesFactory
 from internship.tests.factories.speciality import SpecialtyFactory
 from internship.tests.factories.student_affectation_stat import StudentAffectationStatFactory
+from internship.utils.assignment.assignment_state import AssignmentState
 
 N_STUDENTS = 30
 N_MANDATORY_INTERNSHIPS = 6
@@ -145,6 +150,13 @@ class AssignmentTest(TestCase):
         self.assertEqual(stats['tot_stud'], N_STUDENTS)
         self.assertEqual(stats['erasmus_students'], 2)
 
+    def test_aggregated_affectation_statistics_match_solution_statistics(self):
+        stats = compute_stats(self.cohort, load_solution_sol(self.cohort, self.affectations))
+        with self.assertNumQueries(7):
+            aggregated_stats = compute_aggregated_stats(self.cohort, self.affectations)
+        del stats['others_specialities_students'], aggregated_stats['others_specialities_students']
+        self.assertDictEqual(aggregated_stats, stats)
+
     def test_should_constraint_mandatory_internship_to_defined_periods_if_any(self):
         for student in [student for student in self.students if student != self.prior_student]:
             student_affectations = self.affectations.filter(student=student)
@@ -162,6 +174,61 @@ class AssignmentTest(TestCase):
                 len([aff for aff in affectations.filter(student=student) if aff.internship.speciality is None]) == 1
             )
 
+    def test_compute_solution_does_not_query_database(self):
+        assignment = Assignment(self.cohort)
+        with self.assertNumQueries(0):
+            assignment.compute_solution()
+        self.assertTrue(assignment.affectations)
+
+    def test_summary_reports_phases_and_fallbacks(self):
+        assignment = Assignment(self.cohort)
+        assignment.compute_solution()
+        summary = assignment.summary()
+        self.assertIn('load_snapshot', summary['phases'])
+        self.assertIn('priority_internships', summary['phases'])
+        self.assertIn('balancing', summary['phases'])
+        for internship in self.mandatory_internships:
+            self.assertEqual(summary['phases']['regular_students:{}'.format(internship.name)]['queries'], 0)
+        self.assertGreater(summary['phases']['load_snapshot']['queries'], 0)
+        # an imposed or hospital error fallback gives at least one imposed affectation
+        self.assertLessEqual(
+            sum(summary['counters'].values()),
+            len([aff for aff in assignment.affectations if aff.choice == 'I'])
+        )
+
+    def test_optimal_assignment_not_worse_than_greedy(self):
+        assignment = OptimalAssignment(self.cohort)
+        assignment.compute_solution()
+        objective = assignment.objective
+        self.assertLessEqual(objective['optimal'], objective['greedy'])
+        self.assertEqual(objective['optimal'], sum(affectation.cost for affectation in assignment.affectations))
+        self.assertLessEqual(objective.get('lower_bound', 0), objective['optimal'])
+        for student in [student for student in self.students if student != self.prior_student]:
+            self.assertEqual(len(assignment.affectations.student_period_ids(student)), len(self.periods))
+
+    def test_same_seed_gives_same_solution(self):
+        snapshot = CohortSnapshot(self.cohort)
+        solutions = []
+        for _ in range(2):
+            assignment = Assignment(self.cohort, snapshot, seed=42)
+            assignment.compute_solution()
+            solutions.append([
+                (aff.student.id, aff.period_id, aff.organization_id, aff.internship_id, aff.cost)
+                for aff in assignment.affectations
+            ])
+        self.assertEqual(solutions[0], solutions[1])
+
+    def test_multistart_keeps_lowest_cost_run(self):
+        assignment = MultiStartAssignment(self.cohort, runs=3, seed=42, processes=1)
+        assignment.solve()
+        assignment.persist_solution()
+        self.assertEqual(len(assignment.results), 3)
+        self.assertEqual(assignment.best.sol_cost, min(result.sol_cost for result in assignment.results))
+        self.assertEqual(
+            InternshipStudentAffectationStat.objects.filter(period__cohort=self.cohort).count(),
+            len(assignment.best.affectations)
+        )
+
 
 def _make_student_choices(cls):
     for student in cls.students:
@@ -312,54 +379,71 @@ def _make_shortage_scenario(cls):
 
 def _execute_assignment_algorithm(cohort):
     assignment = Assignment(cohort)
-    assignment.TIMEOUT = 1
     assignment.solve()
     assignment.persist_solution()
 
 
 class BalancingTest(TestCase):
+    MAX_ALLOWED_IMPOSED = Assignment.MAX_ALLOWED_IMPOSED
+
     @classmethod
     def setUpTestData(cls):
         cls.cohort = CohortFactory()
         cls.organizations = [OrganizationFactory(cohort=cls.cohort) for _ in range(0, N_ORGANIZATIONS)]
-        cls.last_switch = []
+        cls.prioritary_students_person_ids = set()
 
-    def test_permute_exchanged_affectation_information(self):
+    def test_swap_imposed_affectation_of_disadvantaged_student(self):
         specialty = SpecialtyFactory()
-        period = PeriodFactory()
+        periods = [PeriodFactory(), PeriodFactory()]
         internship = InternshipFactory(speciality=specialty)
-        defavored_affectation = StudentAffectationStatFactory(
-            speciality=specialty,
-            organization=self.organizations[-1],
-            period=period,
-            internship=internship,
-            cost=10,
-            choice="I"
-        )
+        disadvantaged_student = StudentFactory()
+        defavored_affectations = [
+            StudentAffectationStatFactory(
+                student=disadvantaged_student,
+                speciality=specialty,
+                organization=self.organizations[-1],
+                period=period,
+                internship=internship,
+                cost=10,
+                choice="I"
+            ) for period in periods
+        ]
         favored_affectation = StudentAffectationStatFactory(
             speciality=specialty,
             organization=self.organizations[1],
-            period=period,
+            period=periods[0],
             internship=internship,
             cost=0
         )
-        self.affectations = InternshipStudentAffectationStat.objects.all()
+        self.affectations = AssignmentState(defavored_affectations + [favored_affectation])
+        self.students_information = [disadvantaged_student, favored_affectation.student]
         for choice, organization in enumerate(self.organizations[:4], start=1):
             create_internship_choice(
                 organization=organization,
-                student=defavored_affectation.student,
+                student=disadvantaged_student,
                 internship=internship,
                 choice=choice,
                 speciality=specialty,
             )
-        _permute_affectations(self, [defavored_affectation], [favored_affectation], InternshipChoice.objects.all())
-        InternshipStudentAffectationStat.objects.bulk_update(self.affectations, fields=['organization'])
+        self.snapshot = SimpleNamespace(
+            choices_by_student={disadvantaged_student.id: list(InternshipChoice.objects.all())}
+        )
+        self.random = random.Random(0)
+
+        _balance_assignments(self)
+
+        InternshipStudentAffectationStat.objects.bulk_update(list(self.affectations), fields=['organization'])
         self.assertEqual(
-            self.affectations.get(student=defavored_affectation.student).organization, self.organizations[1]
+            InternshipStudentAffectationStat.objects.get(pk=defavored_affectations[0].pk).organization,
+            self.organizations[1]
         )
         self.assertEqual(
-            self.affectations.get(student=favored_affectation.student).organization, self.organizations[-1]
+            InternshipStudentAffectationStat.objects.get(pk=favored_affectation.pk).organization,
+            self.organizations[-1]
         )
+        self.assertEqual(self.affectations.student_cost(disadvantaged_student), 11)
+        self.assertEqual(self.affectations.student_cost(favored_affectation.student), 10)
+        self.assertEqual(self.balancing['swaps'], 1)
 
 
 class ListUtilsTestCase(TestCase):
@@ -571,6 +655,12 @@ class AlgorithmExecutionOnCohortSiblingsTest(TestCase):
                 len([aff for aff in affectations.filter(student=student) if aff.internship.speciality is None]) == 1
             )
 
+    def test_compute_solution_in_subcohort_does_not_query_database(self):
+        assignment = Assignment(self.cohorts[2])
+        with self.assertNumQueries(0):
+            assignment.compute_solution()
+        self.assertTrue(assignment.affectations)
+
 
 class AssignmentWithPeriodModalityTest(TestCase):
     def setUp(self):
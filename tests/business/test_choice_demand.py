@@ -0,0 +1,86 @@
+##############################################################################
+#
+#    OSIS stands for Open Student Information System. It's an application
+#    designed to manage the core business of higher education institutions,
+#    such as universities, faculties, institutes and professional schools.
+#    The core business involves the administration of students, teachers,
+#    courses, programs and so on.
+#
+#    Copyright (C) 2015-2025 Université catholique de Louvain (http://www.uclouvain.be)
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    A copy of this license - GNU General Public License - is available
+#    at the root of the source code of this program.  If not,
+#    see http://www.gnu.org/licenses/.
+#
+##############################################################################
+from django.core.cache import cache
+from django.test import TestCase
+
+from base.tests.factories.student import StudentFactory
+from internship.business import choice_demand
+from internship.tests.factories.cohort import CohortFactory
+from internship.tests.factories.internship import InternshipFactory
+from internship.tests.factories.internship_choice import create_internship_choice
+from internship.tests.factories.offer import OfferFactory
+from internship.tests.factories.organization import OrganizationFactory
+from internship.tests.factories.speciality import SpecialtyFactory
+
+
+class ChoiceDemandTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.cohort = CohortFactory()
+        cls.organization = OrganizationFactory(cohort=cls.cohort)
+        cls.specialty = SpecialtyFactory(cohort=cls.cohort, mandatory=False)
+        cls.offer = OfferFactory(cohort=cls.cohort, organization=cls.organization, speciality=cls.specialty)
+        cls.mandatory_internship = InternshipFactory(cohort=cls.cohort, speciality=cls.specialty)
+        cls.first_elective = InternshipFactory(cohort=cls.cohort, speciality=None, name='Stage au choix 1')
+        cls.other_elective = InternshipFactory(cohort=cls.cohort, speciality=None, name='Stage au choix 2')
+        cls.student = StudentFactory()
+        for internship, choice in [
+            (cls.mandatory_internship, 1), (cls.mandatory_internship, 2),
+            (cls.first_elective, 1), (cls.other_elective, 1), (cls.other_elective, 3),
+        ]:
+            create_internship_choice(
+                organization=cls.organization, student=cls.student, speciality=cls.specialty,
+                internship=internship, choice=choice
+            )
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_get_choice_demand(self):
+        with self.assertNumQueries(1):
+            demand = choice_demand.get_choice_demand(self.cohort)
+        key = (self.organization.pk, self.specialty.pk)
+        self.assertEqual(demand[key + (choice_demand.MANDATORY,)], {'first': 1, 'other': 1, 'total': 2})
+        self.assertEqual(demand[key + (choice_demand.FIRST_ELECTIVE,)], {'first': 1, 'other': 0, 'total': 1})
+        self.assertEqual(demand[key + (choice_demand.OTHER_ELECTIVE,)], {'first': 1, 'other': 1, 'total': 2})
+        self.assertEqual(
+            choice_demand.get_offer_demand(demand, self.offer), {'first': 3, 'other': 2, 'total': 5}
+        )
+
+    def test_choice_demand_is_cached_until_a_choice_changes(self):
+        choice_demand.get_choice_demand(self.cohort)
+        with self.assertNumQueries(0):
+            choice_demand.get_choice_demand(self.cohort)
+
+        create_internship_choice(
+            organization=self.organization, student=StudentFactory(), speciality=self.specialty,
+            internship=self.mandatory_internship, choice=1
+        )
+        demand = choice_demand.get_choice_demand(self.cohort)
+        self.assertEqual(
+            demand[(self.organization.pk, self.specialty.pk, choice_demand.MANDATORY)],
+            {'first': 2, 'other': 1, 'total': 3}
+        )
@@ -0,0 +1,84 @@
+##############################################################################
+#
+#    OSIS stands for Open Student Information System. It's an application
+#    designed to manage the core business of higher education institutions,
+#    such as universities, faculties, institutes and professional schools.
+#    The core business involves the administration of students, teachers,
+#    courses, programs and so on.
+#
+#    Copyright (C) 2015-2025 Université catholique de Louvain (http://www.uclouvain.be)
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    A copy of this license - GNU General Public License - is available
+#    at the root of the source code of this program.  If not,
+#    see http://www.gnu.org/licenses/.
+#
+##############################################################################
+from django.core.cache import cache
+from django.test import TestCase
+
+from base.tests.factories.student import StudentFactory
+from internship.business import choice_status
+from internship.tests.factories.cohort import CohortFactory
+from internship.tests.factories.internship import InternshipFactory
+from internship.tests.factories.internship_choice import create_internship_choice
+from internship.tests.factories.organization import OrganizationFactory
+from internship.tests.factories.speciality import SpecialtyFactory
+
+
+class ChoiceStatusTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.cohort = CohortFactory()
+        cls.organization = OrganizationFactory(cohort=cls.cohort)
+        cls.specialty = SpecialtyFactory(cohort=cls.cohort)
+        cls.internships = [InternshipFactory(cohort=cls.cohort) for _ in range(0, 4)]
+        cls.complete_student, cls.incomplete_student, cls.unknown_student = [StudentFactory() for _ in range(0, 3)]
+        for internship in cls.internships:
+            create_internship_choice(cls.organization, cls.complete_student, cls.specialty, internship=internship)
+        for internship in cls.internships[:3]:
+            create_internship_choice(cls.organization, cls.incomplete_student, cls.specialty, internship=internship)
+        cls.person_ids = [
+            student.person_id for student in [cls.complete_student, cls.incomplete_student, cls.unknown_student]
+        ]
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_get_choice_statuses(self):
+        with self.assertNumQueries(3):
+            statuses = choice_status.get_choice_statuses(self.cohort, self.person_ids)
+        self.assertEqual(
+            [statuses[person_id]['choice_status'] for person_id in self.person_ids],
+            [choice_status.OK, choice_status.NOK, choice_status.UNKNOWN]
+        )
+        self.assertEqual(statuses[self.incomplete_student.person_id]['status'], -1)
+        self.assertEqual(choice_status.get_status_stats(statuses), {'OK': 1, 'NOK': 1, 'UNKNOWN': 1})
+
+    def test_only_changed_students_are_computed_again(self):
+        choice_status.get_choice_statuses(self.cohort, self.person_ids)
+        with self.assertNumQueries(0):
+            choice_status.get_choice_statuses(self.cohort, self.person_ids)
+
+        create_internship_choice(
+            self.organization, self.incomplete_student, self.specialty, internship=self.internships[3]
+        )
+        with self.assertNumQueries(2):
+            statuses = choice_status.get_choice_statuses(self.cohort, self.person_ids)
+        self.assertEqual(statuses[self.incomplete_student.person_id]['choice_status'], choice_status.OK)
+
+    def test_new_internship_computes_the_cohort_again(self):
+        choice_status.get_choice_statuses(self.cohort, self.person_ids)
+        InternshipFactory(cohort=self.cohort)
+        with self.assertNumQueries(3):
+            statuses = choice_status.get_choice_statuses(self.cohort, self.person_ids)
+        self.assertEqual(statuses[self.complete_student.person_id]['choice_status'], choice_status.NOK)
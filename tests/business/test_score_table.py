@@ -0,0 +1,105 @@
+##############################################################################
+#
+#    OSIS stands for Open Student Information System. It's an application
+#    designed to manage the core business of higher education institutions,
+#    such as universities, faculties, institutes and professional schools.
+#    The core business involves the administration of students, teachers,
+#    courses, programs and so on.
+#
+#    Copyright (C) 2015-2025 Université catholique de Louvain (http://www.uclouvain.be)
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    A copy of this license - GNU General Public License - is available
+#    at the root of the source code of this program.  If not,
+#    see http://www.gnu.org/licenses/.
+#
+##############################################################################
+from django.core.cache import cache
+from django.test import TestCase
+
+from base.tests.factories.student import StudentFactory
+from internship.business import score_table
+from internship.models.internship_student_information import InternshipStudentInformation
+from internship.tests.factories.cohort import CohortFactory
+from internship.tests.factories.internship_student_information import InternshipStudentInformationFactory
+from internship.tests.factories.organization import OrganizationFactory
+from internship.tests.factories.period import PeriodFactory
+from internship.tests.factories.score import ScoreFactory, ScoreMappingFactory
+from internship.tests.factories.speciality import SpecialtyFactory
+from internship.tests.factories.student_affectation_stat import StudentAffectationStatFactory
+
+
+class ScoreTableTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.cohort = CohortFactory()
+        cls.period = PeriodFactory(cohort=cls.cohort)
+        cls.student_information = InternshipStudentInformationFactory(cohort=cls.cohort)
+        cls.student = StudentFactory(person=cls.student_information.person)
+
+    def setUp(self):
+        self._cache_row(self.student_information)
+
+    def tearDown(self):
+        cache.clear()
+
+    def _cache_row(self, student_information):
+        for attribute in score_table.STUDENT_ATTRIBUTES:
+            setattr(student_information, attribute, {})
+        student_information.evolution_score = 15
+        score_table.cache_rows([self.cohort], [self.period], [student_information])
+
+    def _get_missing_students(self):
+        student_information = InternshipStudentInformation.objects.get(pk=self.student_information.pk)
+        return score_table.apply_cached_rows([self.cohort], [self.period], [student_information])
+
+    def test_cached_row_applied_to_student(self):
+        student_information = InternshipStudentInformation.objects.get(pk=self.student_information.pk)
+        missing_students = score_table.apply_cached_rows([self.cohort], [self.period], [student_information])
+        self.assertEqual(missing_students, [])
+        self.assertEqual(student_information.evolution_score, 15)
+
+    def test_row_missing_for_other_periods(self):
+        student_information = InternshipStudentInformation.objects.get(pk=self.student_information.pk)
+        other_period = PeriodFactory(cohort=self.cohort)
+        missing_students = score_table.apply_cached_rows([self.cohort], [other_period], [student_information])
+        self.assertEqual(missing_students, [student_information])
+
+    def test_score_change_invalidates_student_row(self):
+        ScoreFactory(student_affectation=StudentAffectationStatFactory(student=self.student, period=self.period))
+        self.assertEqual(len(self._get_missing_students()), 1)
+
+    def test_score_change_keeps_other_student_rows(self):
+        other_student_information = InternshipStudentInformationFactory(cohort=self.cohort)
+        self._cache_row(other_student_information)
+        ScoreFactory(student_affectation=StudentAffectationStatFactory(student=self.student, period=self.period))
+        missing_students = score_table.apply_cached_rows(
+            [self.cohort], [self.period], [self.student_information, other_student_information]
+        )
+        self.assertEqual(missing_students, [self.student_information])
+
+    def test_mapping_change_invalidates_cohort_rows(self):
+        ScoreMappingFactory(cohort=self.cohort, period=self.period)
+        self.assertEqual(len(self._get_missing_students()), 1)
+
+    def test_organization_change_invalidates_cohort_rows(self):
+        OrganizationFactory(cohort=self.cohort)
+        self.assertEqual(len(self._get_missing_students()), 1)
+
+    def test_specialty_change_invalidates_cohort_rows(self):
+        SpecialtyFactory(cohort=self.cohort)
+        self.assertEqual(len(self._get_missing_students()), 1)
+
+    def test_evolution_score_update_invalidates_student_row(self):
+        self.student_information.evolution_score = 12
+        self.student_information.save()
+        self.assertEqual(len(self._get_missing_students()), 1)
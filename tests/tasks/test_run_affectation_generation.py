@@ -0,0 +1,63 @@
+# ############################################################################
+#  OSIS stands for Open Student Information System. It's an application
+#  designed to manage the core business of higher education institutions,
+#  such as universities, faculties, institutes and professional schools.
+#  The core business involves the administration of students, teachers,
+#  courses, programs and so on.
+#
+#  Copyright (C) 2015-2025 Université catholique de Louvain (http://www.uclouvain.be)
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  A copy of this license - GNU General Public License - is available
+#  at the root of the source code of this program.  If not,
+#  see http://www.gnu.org/licenses/.
+# ############################################################################
+import multiprocessing
+
+import mock
+from django.test import TestCase
+
+from internship.business.assignment_multistart import MultiStartAssignment
+from internship.tasks import run_affectation_generation
+from internship.tests.factories.cohort import CohortFactory
+
+
+class TestRunAffectationGeneration(TestCase):
+
+    @mock.patch('internship.tasks.run_affectation_generation.affectation_generation.generate_affectations')
+    def test_run_affectation_generation(self, mock_generate_affectations):
+        cohort = CohortFactory()
+        run_affectation_generation.run(cohort.id, 'demo', solver='optimal', runs=2)
+        mock_generate_affectations.assert_called_once_with(cohort, 'demo', solver='optimal', runs=2)
+
+    @mock.patch('internship.business.affectation_generation.get_result_messages', return_value=[])
+    @mock.patch.object(MultiStartAssignment, 'summary', return_value={})
+    @mock.patch.object(MultiStartAssignment, 'persist_solution')
+    @mock.patch.object(MultiStartAssignment, 'solve', autospec=True)
+    def test_run_multistart(self, mock_solve, *mocks):
+        cohort = CohortFactory()
+        with mock.patch('multiprocessing.current_process', return_value=mock.Mock(daemon=False)):
+            run_affectation_generation.run(cohort.id, 'demo', runs=2)
+        slvr = mock_solve.call_args[0][0]
+        self.assertEqual(slvr.runs, 2)
+        self.assertEqual(slvr.processes, min(2, multiprocessing.cpu_count()))
+
+    @mock.patch('internship.business.affectation_generation.get_result_messages', return_value=[])
+    @mock.patch.object(MultiStartAssignment, 'summary', return_value={})
+    @mock.patch.object(MultiStartAssignment, 'persist_solution')
+    @mock.patch.object(MultiStartAssignment, 'solve', autospec=True)
+    def test_run_multistart_in_daemonic_worker_process(self, mock_solve, *mocks):
+        cohort = CohortFactory()
+        # children of a prefork worker cannot start a pool of processes
+        with mock.patch('multiprocessing.current_process', return_value=mock.Mock(daemon=True)):
+            run_affectation_generation.run(cohort.id, 'demo', runs=2)
+        self.assertEqual(mock_solve.call_args[0][0].processes, 1)
@@ -27,6 +27,7 @@
 from django.test import TestCase
 
 from base.tests.factories.student import StudentFactory
+from internship.business.scores import attach_apd_validation_matrix
 from internship.templatetags.grades import is_valid, is_apd_validated
 from internship.tests.factories.cohort import CohortFactory
 from internship.tests.factories.score import ScoreFactory
@@ -75,3 +76,12 @@ class TestGrades(TestCase):
 
     def test_is_apd_not_validated(self):
         self.assertFalse(is_apd_validated(self.cohort, self.bad_student, self.apd_index+1))
+
+    def test_is_apd_validated_uses_attached_matrix(self):
+        students = [self.good_student, self.bad_student]
+        with self.assertNumQueries(1):
+            attach_apd_validation_matrix(self.cohort, students)
+        with self.assertNumQueries(0):
+            self.assertTrue(is_apd_validated(self.cohort, self.good_student, self.apd_index+1))
+            self.assertFalse(is_apd_validated(self.cohort, self.bad_student, self.apd_index+1))
+            self.assertFalse(is_apd_validated(self.cohort, self.good_student, self.apd_index+2))
@@ -0,0 +1,79 @@
+##############################################################################
+#
+#    OSIS stands for Open Student Information System. It's an application
+#    designed to manage the core business of higher education institutions,
+#    such as universities, faculties, institutes and professional schools.
+#    The core business involves the administration of students, teachers,
+#    courses, programs and so on.
+#
+#    Copyright (C) 2015-2025 Université catholique de Louvain (http://www.uclouvain.be)
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    A copy of this license - GNU General Public License - is available
+#    at the root of the source code of this program.  If not,
+#    see http://www.gnu.org/licenses/.
+#
+##############################################################################
+from django.test import TestCase
+
+from base.tests.factories.student import StudentFactory
+from internship.tests.factories.organization import OrganizationFactory
+from internship.tests.factories.period import PeriodFactory
+from internship.tests.factories.student_affectation_stat import StudentAffectationStatFactory
+from internship.utils.assignment.assignment_state import AssignmentState
+
+
+class AssignmentStateTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.student = StudentFactory()
+        cls.other_student = StudentFactory()
+        cls.periods = [PeriodFactory(name="P{}".format(i)) for i in range(1, 4)]
+        cls.affectations = [
+            StudentAffectationStatFactory(student=cls.student, period=cls.periods[0], cost=0),
+            StudentAffectationStatFactory(student=cls.student, period=cls.periods[0], cost=1),
+            StudentAffectationStatFactory(student=cls.student, period=cls.periods[1], cost=10),
+            StudentAffectationStatFactory(student=cls.other_student, period=cls.periods[1], cost=2),
+        ]
+        cls.existing_affectation = StudentAffectationStatFactory(student=cls.student, period=cls.periods[2], cost=3)
+
+    def setUp(self):
+        self.state = AssignmentState(self.affectations, existing_affectations=[self.existing_affectation])
+
+    def test_behaves_like_the_list_of_affectations(self):
+        self.assertEqual(list(self.state), self.affectations)
+        self.assertEqual(len(self.state), 4)
+
+    def test_student_affectations_keep_first_affectation_by_period(self):
+        self.assertEqual(self.state.student_affectations(self.student), [self.affectations[0], self.affectations[2]])
+        self.assertEqual(len(self.state.for_student(self.student)), 3)
+
+    def test_student_affectations_with_existing_affectations(self):
+        self.assertEqual(
+            self.state.student_period_ids(self.student, include_existing=True),
+            {period.id for period in self.periods}
+        )
+
+    def test_student_cost_includes_existing_affectations(self):
+        self.assertEqual(self.state.student_cost(self.student), 14)
+        self.assertEqual(self.state.student_cost(self.other_student), 2)
+
+    def test_reassign_updates_indexes_and_cost(self):
+        affectation = self.affectations[2]
+        organization = OrganizationFactory()
+        self.state.reassign(affectation, organization, choice=1, cost=0)
+        self.assertEqual(self.state.student_cost(self.student), 4)
+        self.assertEqual(
+            self.state.for_offer_and_period(organization.id, affectation.speciality_id, affectation.period_id),
+            [affectation]
+        )
+        self.assertEqual(len(self.state.for_period(self.periods[1].id)), 2)
@@ -0,0 +1,54 @@
+##############################################################################
+#
+#    OSIS stands for Open Student Information System. It's an application
+#    designed to manage the core business of higher education institutions,
+#    such as universities, faculties, institutes and professional schools.
+#    The core business involves the administration of students, teachers,
+#    courses, programs and so on.
+#
+#    Copyright (C) 2015-2025 Université catholique de Louvain (http://www.uclouvain.be)
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    A copy of this license - GNU General Public License - is available
+#    at the root of the source code of this program.  If not,
+#    see http://www.gnu.org/licenses/.
+#
+##############################################################################
+from django.core.cache import cache
+from django.test import SimpleTestCase
+
+from internship.utils.cache_versions import CacheVersions
+
+
+class CacheVersionsTestCase(SimpleTestCase):
+    def setUp(self):
+        self.versions = CacheVersions('test_versions')
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_versions_created_once(self):
+        versions = self.versions.get([1, 2])
+        self.assertNotEqual(versions[1], versions[2])
+        self.assertEqual(self.versions.get([2, 1]), versions)
+
+    def test_invalidate_changes_only_given_scopes(self):
+        versions = self.versions.get([1, 2])
+        self.versions.invalidate([1])
+        new_versions = self.versions.get([1, 2])
+        self.assertNotEqual(new_versions[1], versions[1])
+        self.assertEqual(new_versions[2], versions[2])
+
+    def test_prefixes_are_independent(self):
+        versions = self.versions.get([1])
+        CacheVersions('other_versions').invalidate([1])
+        self.assertEqual(self.versions.get([1]), versions)
@@ -25,16 +25,20 @@
 ##############################################################################
 from datetime import date
 from datetime import timedelta
+from io import BytesIO
 
 from django.test import TestCase
+from openpyxl import load_workbook
 
 from base.tests.factories.person import PersonWithPermissionsFactory
 from base.tests.factories.student import StudentFactory
+from internship.models.period import Period
 from internship.tests.factories.cohort import CohortFactory
 from internship.tests.factories.organization import OrganizationFactory
 from internship.tests.factories.period import PeriodFactory
 from internship.tests.factories.speciality import SpecialtyFactory
-from internship.utils.exporting.score_encoding_xls import _append_row_data, _append_evolution_score
+from internship.utils.exporting.score_encoding_xls import _append_row_data, _append_evolution_score, \
+    save_xls_with_scores
 
 EXCUSED_PERIOD_SCORE = None
 EDITED_PERIOD_SCORE = 15
@@ -105,3 +109,20 @@ class XlsExportScoresTestCase(TestCase):
         self.assertEqual(columns[3], evolution_score)
         self.assertEqual(columns[4], evolution_score)
         self.assertEqual(columns[5], '')
+
+    def test_save_xls_with_scores(self):
+        student = self.student
+        student.scores = []
+        student.evolution_score = 15
+        student.evolution_score_reason = ''
+        student.fulfill_condition = True
+        periods = Period.objects.filter(pk__in=[period.pk for period in self.periods]).order_by('date_start', 'pk')
+        internship = self.student.specialties[self.past_period_edited.name][0]['acronym']
+
+        with save_xls_with_scores(self.cohort, periods, iter([student]), [internship]) as file:
+            workbook = load_workbook(BytesIO(file.read()))
+        self.assertEqual(workbook.sheetnames, ['Sheet', internship])
+        self.assertEqual(workbook['Sheet'].max_row, 2)
+        internship_row = [cell.value for cell in workbook[internship][2]]
+        self.assertEqual(internship_row[2], student.registration_id)
+        self.assertEqual(internship_row[-1], EDITED_PERIOD_SCORE)
@@ -0,0 +1,86 @@
+##############################################################################
+#
+#    OSIS stands for Open Student Information System. It's an application
+#    designed to manage the core business of higher education institutions,
+#    such as universities, faculties, institutes and professional schools.
+#    The core business involves the administration of students, teachers,
+#    courses, programs and so on.
+#
+#    Copyright (C) 2015-2019 Université catholique de Louvain (http://www.uclouvain.be)
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    A copy of this license - GNU General Public License - is available
+#    at the root of the source code of this program.  If not,
+#    see http://www.gnu.org/licenses/.
+#
+from datetime import date
+from unittest import mock
+
+import openpyxl
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase
+
+from base.tests.factories.student import StudentFactory
+from internship.models.internship_score import InternshipScore
+from internship.models.internship_student_affectation_stat import InternshipStudentAffectationStat
+from internship.tests.factories.cohort import CohortFactory
+from internship.tests.factories.internship import InternshipFactory
+from internship.tests.factories.organization import OrganizationFactory
+from internship.tests.factories.period import PeriodFactory
+from internship.tests.factories.speciality import SpecialtyFactory
+from internship.utils.importing.import_affectations import import_xlsx, INTERNSHIP_TYPE_MANDATORY
+
+
+class XlsImportAffectationsTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.cohort = CohortFactory()
+        cls.period = PeriodFactory(cohort=cls.cohort, is_preconcours=True)
+        OrganizationFactory(cohort=cls.cohort, reference='600')
+        cls.organization = OrganizationFactory(cohort=cls.cohort, reference='12')
+        cls.specialty = SpecialtyFactory(cohort=cls.cohort, acronym='CH')
+        cls.internship = InternshipFactory(cohort=cls.cohort, speciality=cls.specialty)
+        cls.students = [StudentFactory() for _ in range(0, 5)]
+        cls.file = SimpleUploadedFile(name='test', content=b'test')
+
+    def setUp(self):
+        self.workbook = openpyxl.Workbook()
+        worksheet = self.workbook.active
+        for row, student in enumerate(self.students, start=2):
+            worksheet.cell(row=row, column=3).value = student.registration_id
+            worksheet.cell(row=row, column=8).value = 'CH12'
+            worksheet.cell(row=row, column=11).value = INTERNSHIP_TYPE_MANDATORY
+            worksheet.cell(row=row, column=12).value = '2025-01-01'
+            worksheet.cell(row=row, column=13).value = '2025-01-31'
+
+    @mock.patch('internship.utils.importing.import_affectations.openpyxl.load_workbook')
+    def test_import_affectations(self, mock_workbook):
+        mock_workbook.return_value = self.workbook
+        errors, row_count = import_xlsx(self.cohort, self.file, self.period)
+        self.assertEqual(errors, [])
+        self.assertEqual(row_count, len(self.students))
+        affectations = InternshipStudentAffectationStat.objects.filter(period=self.period)
+        self.assertEqual(affectations.count(), len(self.students))
+        for affectation in affectations:
+            self.assertEqual(affectation.organization, self.organization)
+            self.assertEqual(affectation.internship, self.internship)
+            self.assertEqual(affectation.date_start, date(2025, 1, 1))
+        self.assertEqual(InternshipScore.objects.filter(student_affectation__in=affectations).count(), 5)
+
+    @mock.patch('internship.utils.importing.import_affectations.openpyxl.load_workbook')
+    def test_import_affectations_abort_with_unknown_organization(self, mock_workbook):
+        self.workbook.active.cell(row=3, column=8).value = 'CH99'
+        mock_workbook.return_value = self.workbook
+        errors, row_count = import_xlsx(self.cohort, self.file, self.period)
+        self.assertEqual(errors, ["Row 3: Organization with reference 99 not found"])
+        self.assertEqual(row_count, 0)
+        self.assertFalse(InternshipStudentAffectationStat.objects.filter(period=self.period).exists())
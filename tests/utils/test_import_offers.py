@@ -0,0 +1,101 @@
+##############################################################################
+#
+#    OSIS stands for Open Student Information System. It's an application
+#    designed to manage the core business of higher education institutions,
+#    such as universities, faculties, institutes and professional schools.
+#    The core business involves the administration of students, teachers,
+#    courses, programs and so on.
+#
+#    Copyright (C) 2015-2019 Université catholique de Louvain (http://www.uclouvain.be)
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    A copy of this license - GNU General Public License - is available
+#    at the root of the source code of this program.  If not,
+#    see http://www.gnu.org/licenses/.
+import datetime
+from unittest import mock
+
+import openpyxl
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase
+
+from internship.models.internship_offer import InternshipOffer
+from internship.models.period_internship_places import PeriodInternshipPlaces
+from internship.tests.factories.cohort import CohortFactory
+from internship.tests.factories.offer import OfferFactory
+from internship.tests.factories.organization import OrganizationFactory
+from internship.tests.factories.period import PeriodFactory
+from internship.tests.factories.period_internship_places import PeriodInternshipPlacesFactory
+from internship.tests.factories.speciality import SpecialtyFactory
+from internship.utils.importing.import_offers import import_xlsx
+
+
+class XlsImportOffersTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.cohort = CohortFactory()
+        cls.periods = [
+            PeriodFactory(cohort=cls.cohort, date_start=datetime.date(2025, month, 1)) for month in (2, 1)
+        ]
+        cls.specialty = SpecialtyFactory(cohort=cls.cohort, acronym='CH')
+        cls.hospital = OrganizationFactory(cohort=cls.cohort, reference='10')
+        cls.new_hospital = OrganizationFactory(cohort=cls.cohort, reference='11')
+        cls.offer = OfferFactory(
+            cohort=cls.cohort, organization=cls.hospital, speciality=cls.specialty, title=cls.specialty.name,
+            master='Dr A', maximum_enrollments=5, selectable=True
+        )
+        PeriodInternshipPlacesFactory(internship_offer=cls.offer, period=cls.periods[1], number_places=2)
+        PeriodInternshipPlacesFactory(internship_offer=cls.offer, period=cls.periods[0], number_places=3)
+        cls.file = SimpleUploadedFile(name='test.xlsx', content=b'test')
+
+    def setUp(self):
+        self.workbook = openpyxl.Workbook()
+        worksheet = self.workbook.active
+        worksheet.append(['Ref', 'Specialty', 'Master', 'P1', 'P2'])
+        worksheet.append([10, 'CH', 'Dr A', 2, 3])
+        worksheet.append([11, 'CH', 'Dr B', 4, None])
+
+    def _import(self):
+        with mock.patch('internship.utils.importing.import_offers.openpyxl.load_workbook') as mock_workbook:
+            mock_workbook.return_value = self.workbook
+            return import_xlsx(self.file, self.cohort)
+
+    def test_import_offers_creates_missing_offers_and_places(self):
+        counts = self._import()
+        self.assertEqual(counts['offers'], {'created': 1, 'updated': 0, 'unchanged': 1})
+        self.assertEqual(counts['places'], {'created': 2, 'updated': 0, 'unchanged': 2})
+        offer = InternshipOffer.objects.get(organization=self.new_hospital, speciality=self.specialty)
+        self.assertEqual(offer.master, 'Dr B')
+        self.assertEqual(offer.maximum_enrollments, 4)
+        self.assertEqual(
+            dict(PeriodInternshipPlaces.objects.filter(internship_offer=offer).values_list('period', 'number_places')),
+            {self.periods[1].pk: 4, self.periods[0].pk: 0}
+        )
+
+    def test_import_offers_updates_changed_offers_and_places(self):
+        self.workbook.active.cell(row=2, column=3).value = 'Dr C'
+        self.workbook.active.cell(row=2, column=5).value = 1
+        counts = self._import()
+        self.assertEqual(counts['offers'], {'created': 1, 'updated': 1, 'unchanged': 0})
+        self.assertEqual(counts['places'], {'created': 2, 'updated': 1, 'unchanged': 1})
+        self.offer.refresh_from_db()
+        self.assertEqual(self.offer.master, 'Dr C')
+        self.assertEqual(self.offer.maximum_enrollments, 3)
+
+    def test_import_offers_twice_does_not_duplicate(self):
+        self._import()
+        with self.assertNumQueries(7):
+            counts = self._import()
+        self.assertEqual(counts['offers'], {'created': 0, 'updated': 0, 'unchanged': 2})
+        self.assertEqual(counts['places'], {'created': 0, 'updated': 0, 'unchanged': 4})
+        self.assertEqual(InternshipOffer.objects.filter(cohort=self.cohort).count(), 2)
+        self.assertEqual(PeriodInternshipPlaces.objects.filter(internship_offer__cohort=self.cohort).count(), 4)
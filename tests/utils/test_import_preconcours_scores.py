@@ -0,0 +1,88 @@
+##############################################################################
+#
+#    OSIS stands for Open Student Information System. It's an application
+#    designed to manage the core business of higher education institutions,
+#    such as universities, faculties, institutes and professional schools.
+#    The core business involves the administration of students, teachers,
+#    courses, programs and so on.
+#
+#    Copyright (C) 2015-2019 Université catholique de Louvain (http://www.uclouvain.be)
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    A copy of this license - GNU General Public License - is available
+#    at the root of the source code of this program.  If not,
+#    see http://www.gnu.org/licenses/.
+#
+from unittest import mock
+
+import openpyxl
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase
+
+from base.tests.factories.student import StudentFactory
+from internship.models.internship_score import InternshipScore
+from internship.tests.factories.cohort import CohortFactory
+from internship.tests.factories.internship_student_information import InternshipStudentInformationFactory
+from internship.tests.factories.period import PeriodFactory
+from internship.tests.factories.score import ScoreFactory
+from internship.tests.factories.speciality import SpecialtyFactory
+from internship.tests.factories.student_affectation_stat import StudentAffectationStatFactory
+from internship.utils.importing.import_preconcours_scores import import_xlsx
+
+
+class XlsImportPreconcoursScoresTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.cohort = CohortFactory()
+        cls.period = PeriodFactory(cohort=cls.cohort, is_preconcours=True)
+        cls.specialty = SpecialtyFactory(cohort=cls.cohort)
+        cls.students = [StudentFactory() for _ in range(0, 10)]
+        for student in cls.students:
+            InternshipStudentInformationFactory(person=student.person, cohort=cls.cohort)
+        cls.affectations = [
+            StudentAffectationStatFactory(student=student, period=cls.period, speciality=cls.specialty)
+            for student in cls.students
+        ]
+        cls.existing_score = ScoreFactory(student_affectation=cls.affectations[0], validated=False)
+        cls.file = SimpleUploadedFile(name='test', content=b'test')
+
+    def setUp(self):
+        self.workbook = openpyxl.Workbook()
+        worksheet = self.workbook.active
+        worksheet.cell(row=1, column=1).value = self.period.name
+        for row, student in enumerate(self.students, start=2):
+            worksheet.cell(row=row, column=1).value = student.registration_id
+            worksheet.cell(row=row, column=5).value = self.specialty.acronym
+            worksheet.cell(row=row, column=7).value = 12
+            worksheet.cell(row=row, column=8).value = 14
+
+    @mock.patch('internship.utils.importing.import_preconcours_scores.load_workbook')
+    def test_import_preconcours_scores(self, mock_workbook):
+        mock_workbook.return_value = self.workbook
+        self.assertIsNone(import_xlsx(self.cohort, self.file, self.period.name))
+        self.assertEqual(InternshipScore.objects.filter(validated=True).count(), 10)
+        existing_score = InternshipScore.objects.get(pk=self.existing_score.pk)
+        self.assertEqual(existing_score.behavior_score, 12)
+        self.assertEqual(existing_score.calculated_global_score, 13)
+
+    @mock.patch('internship.utils.importing.import_preconcours_scores.load_workbook')
+    def test_import_preconcours_scores_abort_with_errors(self, mock_workbook):
+        worksheet = self.workbook.active
+        worksheet.cell(row=2, column=1).value = 'invalid registration_id'
+        worksheet.cell(row=3, column=7).value = None
+        worksheet.cell(row=4, column=5).value = 'invalid acronym'
+        mock_workbook.return_value = self.workbook
+        errors = import_xlsx(self.cohort, self.file, self.period.name)
+        self.assertEqual([row[0].row for row in errors['registration_error']], [2])
+        self.assertEqual([error['row'][0].row for error in errors['score_completeness_errors']], [3])
+        self.assertEqual([error['speciality_acronym'] for error in errors['speciality_errors']], ['invalid acronym'])
+        self.assertEqual(InternshipScore.objects.filter(validated=True).count(), 0)
@@ -69,6 +69,14 @@ class XlsImportScoresTestCase(TestCase):
         for score in InternshipScore.objects.all():
             self.assertTrue(score.validated)
 
+    @mock.patch('internship.utils.importing.import_scores.load_workbook')
+    def test_import_scores_in_constant_number_of_queries(self, mock_workbook):
+        mock_workbook.return_value = self.workbook
+        with self.assertNumQueries(9):
+            import_xlsx(self.cohort, self.file, self.period.name)
+        existing_score = InternshipScore.objects.get(pk=self.existing_score_not_validated.pk)
+        self.assertTrue(existing_score.validated)
+
     @mock.patch('internship.utils.importing.import_scores.load_workbook')
     def test_import_scores_abort_with_wrong_registration_id(self, mock_workbook):
         row_error_number = 6
@@ -0,0 +1,64 @@
+##############################################################################
+#
+#    OSIS stands for Open Student Information System. It's an application
+#    designed to manage the core business of higher education institutions,
+#    such as universities, faculties, institutes and professional schools.
+#    The core business involves the administration of students, teachers,
+#    courses, programs and so on.
+#
+#    Copyright (C) 2015-2025 Université catholique de Louvain (http://www.uclouvain.be)
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    A copy of this license - GNU General Public License - is available
+#    at the root of the source code of this program.  If not,
+#    see http://www.gnu.org/licenses/.
+#
+##############################################################################
+import os
+import pstats
+import tempfile
+
+from django.test import TestCase
+
+from internship.models.cohort import Cohort
+from internship.tests.factories.cohort import CohortFactory
+from internship.utils.assignment.instrumentation import AssignmentInstrumentation
+
+
+class AssignmentInstrumentationTestCase(TestCase):
+    def setUp(self):
+        self.instrumentation = AssignmentInstrumentation()
+
+    def test_phase_counts_queries_and_accumulates(self):
+        CohortFactory()
+        with self.instrumentation.phase('load'):
+            list(Cohort.objects.all())
+        with self.instrumentation.phase('load'):
+            list(Cohort.objects.all())
+        with self.instrumentation.phase('compute'):
+            sum(range(10))
+        summary = self.instrumentation.summary()
+        self.assertEqual(summary['phases']['load']['queries'], 2)
+        self.assertEqual(summary['phases']['compute']['queries'], 0)
+        self.assertEqual(summary['queries'], 2)
+
+    def test_counters(self):
+        self.instrumentation.count('imposed')
+        self.instrumentation.count('imposed', 2)
+        self.assertEqual(self.instrumentation.summary()['counters'], {'imposed': 3})
+
+    def test_profile_dumps_stats(self):
+        with tempfile.TemporaryDirectory() as directory:
+            self.instrumentation.profile_path = os.path.join(directory, 'assignment.prof')
+            with self.instrumentation.profile():
+                sorted(range(100), reverse=True)
+            self.assertTrue(pstats.Stats(self.instrumentation.profile_path).total_calls)
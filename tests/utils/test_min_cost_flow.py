@@ -0,0 +1,53 @@
+##############################################################################
+#
+#    OSIS stands for Open Student Information System. It's an application
+#    designed to manage the core business of higher education institutions,
+#    such as universities, faculties, institutes and professional schools.
+#    The core business involves the administration of students, teachers,
+#    courses, programs and so on.
+#
+#    Copyright (C) 2015-2025 Université catholique de Louvain (http://www.uclouvain.be)
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    A copy of this license - GNU General Public License - is available
+#    at the root of the source code of this program.  If not,
+#    see http://www.gnu.org/licenses/.
+#
+##############################################################################
+from django.test import SimpleTestCase
+
+from internship.utils.assignment.min_cost_flow import MinCostFlow
+
+
+class MinCostFlowTestCase(SimpleTestCase):
+    def setUp(self):
+        # two students, two organizations with one place each: the cheapest total is not the greedy one
+        self.flow = MinCostFlow(6)
+        source, sink = 4, 5
+        self.flow.add_edge(source, 0, 1, 0)
+        self.flow.add_edge(source, 1, 1, 0)
+        self.first_student_first_organization = self.flow.add_edge(0, 2, 1, 0)
+        self.first_student_second_organization = self.flow.add_edge(0, 3, 1, 1)
+        self.second_student_first_organization = self.flow.add_edge(1, 2, 1, 0)
+        self.second_student_second_organization = self.flow.add_edge(1, 3, 1, 10)
+        self.flow.add_edge(2, sink, 1, 0)
+        self.flow.add_edge(3, sink, 1, 0)
+        self.source, self.sink = source, sink
+
+    def test_solve_minimizes_total_cost(self):
+        self.assertEqual(self.flow.solve(self.source, self.sink), (2, 1))
+        self.assertEqual(self.flow.flow(self.first_student_second_organization), 1)
+        self.assertEqual(self.flow.flow(self.second_student_first_organization), 1)
+        self.assertEqual(self.flow.flow(self.first_student_first_organization), 0)
+
+    def test_solve_respects_max_flow(self):
+        self.assertEqual(self.flow.solve(self.source, self.sink, max_flow=1), (1, 0))
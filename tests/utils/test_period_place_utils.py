@@ -42,3 +42,38 @@ class PeriodUtilsTestCase(TestCase):
     def test_filters_negative_places(self):
         expected = []
         self.assertEqual(expected, sort_period_places(self.unavailable_period_places))
+
+
+class PeriodPlacesIndexTestCase(TestCase):
+    def setUp(self):
+        self.period_places = [
+            {"id": 1, "internship_offer_id": 1, "period_id": 1, "number_places": 1},
+            {"id": 2, "internship_offer_id": 1, "period_id": 2, "number_places": 3},
+            {"id": 3, "internship_offer_id": 2, "period_id": 1, "number_places": 3},
+            {"id": 4, "internship_offer_id": 2, "period_id": 2, "number_places": 0},
+        ]
+        self.index = PeriodPlacesIndex(self.period_places)
+
+    def test_lookups_match_list_helpers(self):
+        for offer_ids in [[1], [2], [1, 2]]:
+            self.assertEqual(
+                get_period_places_for_offer_ids(offer_ids, self.index),
+                get_period_places_for_offer_ids(offer_ids, self.period_places)
+            )
+        self.assertEqual(
+            get_period_places_for_period_ids([1], self.index),
+            get_period_places_for_period_ids([1], self.period_places)
+        )
+        self.assertEqual(
+            get_period_places_for_offer_id_and_period_id(2, 1, self.index),
+            get_period_places_for_offer_id_and_period_id(2, 1, self.period_places)
+        )
+
+    def test_most_available_first(self):
+        self.assertEqual(sort_period_places(self.index), sort_period_places(self.period_places))
+
+    def test_decrement_updates_most_available(self):
+        period_place = self.index.get(1, 2)
+        period_place["number_places"] -= 3
+        replace_period_place_in_dictionnary(period_place, self.index)
+        self.assertEqual([period_place["id"] for period_place in sort_period_places(self.index)], [3, 1])
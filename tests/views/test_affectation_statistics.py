@@ -25,11 +25,15 @@
 ##############################################################################
 from datetime import timedelta
 
+import mock
 import pendulum
 from django.contrib.auth.models import User, Permission
+from django.core.cache import cache
 from django.test import TestCase
 from django.urls import reverse
 
+from internship.business import affectation_generation
+from internship.business.assignment_multistart import MultiStartAssignment
 from internship.business.statistics import load_solution_sol
 from internship.tests.factories.cohort import CohortFactory
 from internship.tests.factories.organization import OrganizationFactory
@@ -49,6 +53,9 @@ class ViewAffectationStatisticsTestCase(TestCase):
     def setUp(self):
         self.client.force_login(self.user)
 
+    def tearDown(self):
+        cache.clear()
+
     def test_affectation_result(self):
         url = reverse('internship_affectation_hospitals', kwargs={
             'cohort_id': self.cohort.id
@@ -58,6 +65,35 @@ class ViewAffectationStatisticsTestCase(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertTemplateUsed(response, 'internship_affectation_hospitals.html')
 
+    @mock.patch('internship.views.affectation.run_affectation_generation.run.delay')
+    def test_run_affectation_enqueues_generation(self, mock_delay):
+        url = reverse('internship_affectation_generate', kwargs={'cohort_id': self.cohort.id})
+        response = self.client.post(url, data={'solver': 'optimal', 'runs': 4})
+        self.assertRedirects(
+            response, reverse('internship_affectation_hospitals', kwargs={'cohort_id': self.cohort.id})
+        )
+        mock_delay.assert_called_once_with(self.cohort.id, self.user.username, solver='optimal', runs=4)
+        self.assertTrue(affectation_generation.is_running(self.cohort))
+
+        self.client.post(url)
+        self.assertEqual(mock_delay.call_count, 1)
+
+    @mock.patch('internship.views.affectation.run_affectation_generation.run.delay')
+    def test_run_affectation_caps_runs(self, mock_delay):
+        url = reverse('internship_affectation_generate', kwargs={'cohort_id': self.cohort.id})
+        self.client.post(url, data={'runs': 1000})
+        mock_delay.assert_called_once_with(
+            self.cohort.id, self.user.username, solver='greedy', runs=MultiStartAssignment.MAX_RUNS
+        )
+
+    def test_affectation_generation_progress(self):
+        affectation_generation.set_progress(self.cohort, affectation_generation.RUNNING, count=2, total_count=5)
+        url = reverse('internship_affectation_generation_progress', kwargs={'cohort_id': self.cohort.id})
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['status'], affectation_generation.RUNNING)
+        self.assertEqual(response.json()['count'], 2)
+
     def test_affectation_result_sumup(self):
         specialty = SpecialtyFactory(cohort=self.cohort)
         organization = OrganizationFactory(cohort=self.cohort)
@@ -24,8 +24,12 @@
 #
 ##############################################################################
 import random
+from unittest import mock
 
 from django.contrib.auth.models import Permission, User
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
 from django.http import HttpResponse
 from django.test import TestCase
 from django.urls import reverse
@@ -76,6 +80,18 @@ class OfferViewTestCase(TestCase):
         })
         self.client.force_login(self.user)
 
+    @mock.patch('internship.views.offer.import_offers.import_xlsx')
+    def test_upload_offers_reports_offers_and_places_counts(self, mock_import):
+        mock_import.return_value = {
+            'offers': {'created': 1, 'updated': 2, 'unchanged': 3},
+            'places': {'created': 4, 'updated': 5, 'unchanged': 6},
+        }
+        url = reverse('upload_offers', kwargs={'cohort_id': self.cohort.id})
+        response = self.client.post(url, data={'file': SimpleUploadedFile('offers.xlsx', b'')})
+        message = str(list(get_messages(response.wsgi_request))[0])
+        for count in range(1, 7):
+            self.assertIn(str(count), message)
+
     def test_home(self):
         response = self.client.get(self.url)
         self.assertEqual(response.status_code, HttpResponse.status_code)
@@ -171,3 +187,43 @@ class OfferChoiceDistributionTestCase(TestCase):
         response = self.client.get(self.url)
         self.assertEqual(response.context['all_internships'][0].number_other_choice, 6)
         self.assertEqual(response.status_code, HttpResponse.status_code)
+
+
+class NonMandatoryOfferChoiceDistributionTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('demo', 'demo@demo.org', 'passtest')
+        permission = Permission.objects.get(codename='is_internship_manager')
+        self.user.user_permissions.add(permission)
+        self.cohort = CohortFactory()
+        mandatory_specialty = SpecialtyFactory(mandatory=True, cohort=self.cohort)
+        self.specialty = SpecialtyFactory(mandatory=False, cohort=self.cohort)
+        organization = OrganizationFactory(cohort=self.cohort)
+        OfferFactory(cohort=self.cohort, organization=organization, speciality=self.specialty)
+        internships = [
+            InternshipFactory(cohort=self.cohort, speciality=self.specialty, name='Stage de chirurgie'),
+            InternshipFactory(cohort=self.cohort, speciality=None, name='Stage au choix 1'),
+            InternshipFactory(cohort=self.cohort, speciality=None, name='Stage au choix 2'),
+        ]
+        for internship in internships:
+            create_internship_choice(
+                organization=organization,
+                student=StudentFactory(),
+                speciality=self.specialty,
+                choice=1,
+                internship=internship
+            )
+        self.url = reverse('internships', kwargs={
+            'cohort_id': self.cohort.id,
+            'specialty_id': mandatory_specialty.id
+        })
+        self.client.force_login(self.user)
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_count_only_first_elective_first_choices(self):
+        response = self.client.get(self.url, data={'speciality_sort': self.specialty.name})
+        self.assertEqual(response.status_code, HttpResponse.status_code)
+        offer = response.context['all_non_mandatory_internships'][0]
+        self.assertEqual(offer.number_first_choice, 1)
+        self.assertEqual(offer.number_other_choice, 2)
@@ -23,12 +23,19 @@
 #    see http://www.gnu.org/licenses/.
 #
 ##############################################################################
+from io import BytesIO
+from zipfile import ZipFile
+
 from django.contrib.auth.models import Permission, User
 from django.test import TestCase
 from django.urls import reverse
 
 from internship.tests.factories.cohort import CohortFactory
+from internship.tests.factories.internship_student_information import InternshipStudentInformationFactory
 from internship.tests.factories.organization import OrganizationFactory
+from internship.tests.factories.period import PeriodFactory
+from internship.tests.factories.student_affectation_stat import StudentAffectationStatFactory
+from internship.utils.exporting.organization_affectation_hospital import get_file_name
 
 
 class PlaceViewAndUrlTestCase(TestCase):
@@ -123,3 +130,34 @@ class PlaceViewAndUrlTestCase(TestCase):
 
         response = self.client.get(url, follow=True)
         self.assertEqual(response.status_code, 200)
+
+    def test_export_hospitals_affectations(self):
+        other_organization = OrganizationFactory(cohort=self.cohort)
+        affectation = StudentAffectationStatFactory(
+            organization=self.organization, period=PeriodFactory(cohort=self.cohort)
+        )
+        InternshipStudentInformationFactory(person=affectation.student.person, cohort=self.cohort)
+        url = reverse('export_hospitals_affectations', kwargs={'cohort_id': self.cohort.id})
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        archive = ZipFile(BytesIO(b''.join(response.streaming_content)))
+        self.assertEqual(archive.namelist(), [get_file_name(self.organization)])
+        self.assertNotIn(get_file_name(other_organization), archive.namelist())
+
+    def test_export_hospitals_affectations_of_several_organizations(self):
+        period = PeriodFactory(cohort=self.cohort)
+        organizations = [self.organization, OrganizationFactory(cohort=self.cohort)]
+        for organization in organizations:
+            affectation = StudentAffectationStatFactory(organization=organization, period=period)
+            InternshipStudentInformationFactory(person=affectation.student.person, cohort=self.cohort)
+        url = reverse('export_hospitals_affectations', kwargs={'cohort_id': self.cohort.id})
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        archive = ZipFile(BytesIO(b''.join(response.streaming_content)))
+        self.assertCountEqual(
+            archive.namelist(), [get_file_name(organization) for organization in organizations]
+        )
+        # the database stays usable after the export
+        self.assertEqual(self.client.get(url).status_code, 200)
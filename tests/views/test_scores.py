@@ -26,6 +26,7 @@
 import json
 from datetime import date
 from datetime import timedelta
+from io import BytesIO
 from types import SimpleNamespace
 from unittest import mock, skipUnless
 
@@ -37,6 +38,7 @@ from django.test import TestCase
 from django.urls import reverse
 from django.utils.translation import gettext as _
 from mock import Mock
+from openpyxl import load_workbook
 from rest_framework import status
 
 from backoffice.settings.base import INSTALLED_APPS
@@ -44,6 +46,7 @@ from base.models.student import Student
 from base.tests.factories.person import PersonFactory
 from base.tests.factories.student import StudentFactory
 from base.utils.cache import RequestCache
+from internship.business import score_table
 from internship.models.internship_score import InternshipScore, APD_NUMBER
 from internship.models.internship_score_mapping import InternshipScoreMapping
 from internship.models.internship_speciality import InternshipSpeciality
@@ -220,6 +223,16 @@ class ScoresEncodingTest(TestCase):
         self.assertEqual(len(response.context['students'].object_list), 10)
         self.assertEqual(response.context['students'].paginator.num_pages, 2)
 
+    def test_scores_encoding_prepares_only_paginated_students(self):
+        url = reverse('internship_scores_encoding', kwargs={'cohort_id': self.cohort.pk})
+        with mock.patch(
+            'internship.views.score.score_table.apply_cached_rows', wraps=score_table.apply_cached_rows
+        ) as mock_apply_cached_rows:
+            self.client.get(url, data={'all_apds_validated_filter': False})
+        mock_apply_cached_rows.assert_called_once()
+        _, _, prepared_students = mock_apply_cached_rows.call_args[0]
+        self.assertEqual(len(prepared_students), 10)
+
     def test_append_scores_to_student(self):
         url = reverse('internship_scores_encoding', kwargs={'cohort_id': self.cohort.pk})
         response = self.client.get(url)
@@ -328,6 +341,24 @@ class ScoresEncodingTest(TestCase):
         periods_scores = response.context['students'].object_list[0].periods_scores
         self.assertDictEqual(periods_scores, {self.period.name: [20]})
 
+    def test_affectations_linked_to_periods(self):
+        url = reverse('internship_scores_encoding', kwargs={'cohort_id': self.cohort.pk})
+        response = self.client.get(url)
+        student = response.context['students'].object_list[0]
+        affectation = InternshipStudentAffectationStat.objects.get(
+            student__person=student.person, period=self.period
+        )
+        self.assertEqual(student.specialties[self.period.name], [
+            {'acronym': affectation.speciality.acronym, 'name': affectation.speciality.name}
+        ])
+        self.assertEqual(student.organizations[self.period.name], [{
+            'reference': '{}{}'.format(affectation.speciality.acronym, affectation.organization.reference),
+            'name': affectation.organization.name
+        }])
+        self.assertEqual(len(student.evaluations), 3)
+        self.assertEqual(student.registration_id, affectation.student.registration_id)
+        self.assertEqual(student.remedial_periods_count, 0)
+
     def test_export_scores(self):
         url = reverse('internship_download_scores', kwargs={'cohort_id': self.cohort.pk})
         response = self.client.post(url, data={
@@ -606,8 +637,9 @@ class ScoresEncodingTest(TestCase):
         self.assertTrue(student_with_score_validated.scores[0][1])
         self.assertFalse(student_with_score_not_validated.scores[0][1])
 
-    @mock.patch('internship.utils.exporting.score_encoding_xls.export_xls_with_scores')
+    @mock.patch('internship.utils.exporting.score_encoding_xls.save_xls_with_scores')
     def test_export_only_validated_scores(self, mock_export: Mock):
+        mock_export.return_value = BytesIO()
         # create student with no validated score
         student_with_no_validated_score = StudentFactory(
             person=InternshipStudentInformationFactory(person__last_name='AAA', cohort=self.cohort).person
@@ -621,12 +653,19 @@ class ScoresEncodingTest(TestCase):
         url = reverse('internship_download_scores', kwargs={'cohort_id': self.cohort.pk})
         self.client.post(url, data={'period': self.period.name})
         args, kwargs = mock_export.call_args
-        exported_students = args[2]
+        exported_students = list(args[2])
         student_with_score_not_validated = exported_students[0]
         student_with_score_validated = exported_students[1]
         self.assertFalse(student_with_score_not_validated.scores[0][1])
         self.assertTrue(student_with_score_validated.scores)
 
+    def test_export_without_selected_period(self):
+        url = reverse('internship_download_scores', kwargs={'cohort_id': self.cohort.pk})
+        response = self.client.post(url)
+        self.assertEqual(response.status_code, 200)
+        workbook = load_workbook(BytesIO(b''.join(response.streaming_content)))
+        self.assertIn('Sheet', workbook.sheetnames)
+
     def test_form_edit_score_consultation(self):
         score = ScoreFactory(
             student_affectation__period=self.period,
@@ -25,6 +25,7 @@
 ##############################################################################
 from datetime import date
 from datetime import timedelta
+from io import BytesIO
 from unittest import skipUnless
 
 from django.contrib.auth.models import Permission, User
@@ -36,6 +37,7 @@ from django.utils.translation import gettext_lazy
 from openpyxl import Workbook
 
 from backoffice.settings.base import INSTALLED_APPS
+from base.models.student import Student
 from base.tests.factories.person import PersonFactory
 from base.tests.factories.person_address import PersonAddressFactory
 from base.tests.factories.student import StudentFactory
@@ -54,6 +56,7 @@ from internship.tests.factories.score import ScoreFactory
 from internship.tests.factories.student_affectation_stat import StudentAffectationStatFactory
 from internship.tests.models import test_organization, test_internship_speciality, test_internship_student_information
 from internship.tests.utils.test_student_loader import generate_record
+from internship.utils.importing.import_students import import_xlsx
 from internship.views import student
 from internship.views.student import import_students, internships_student_import_update, internships_student_resume
 from osis_common.document.xls_build import save_virtual_workbook
@@ -239,6 +242,16 @@ class StudentsListImport(TestCase):
         }))
         self.assertEqual(student.location, "Edited_Location")
 
+    def test_import_prefetches_students_and_informations(self):
+        registration_id = self.worksheet.cell(row=2, column=8).value
+        InternshipStudentInformationFactory(
+            cohort=self.cohort, person=Student.objects.get(registration_id=registration_id).person
+        )
+        with self.assertNumQueries(2):
+            differences = import_xlsx(self.cohort, BytesIO(self.edited_file_content))
+        self.assertEqual(len(differences), 10)
+        self.assertEqual(len([diff for diff in differences if diff['new_record']]), 9)
+
     def test_invalid_import(self):
         invalid_file = SimpleUploadedFile('invalid_file.txt', self.file_content)
         response = self.client.post(self.import_url, {
@@ -89,6 +89,8 @@ urlpatterns = [
 
             path('places/', include([
                 path('', place.internships_places, name='internships_places'),
+                path('exportxls/hospitals/', place.export_hospitals_affectations,
+                     name='export_hospitals_affectations'),
                 path('create/', place.organization_create, name='place_create'),
                 path('save/', place.organization_new, name='place_save_new'),
 
@@ -152,6 +154,8 @@ urlpatterns = [
                 path('statistics/', affectation.view_statistics, name='internship_affectation_statistics'),
                 path('errors/', affectation.view_errors, name='internship_affectation_errors'),
                 path('generate/', affectation.run_affectation, name='internship_affectation_generate'),
+                path('generate/progress/', affectation.affectation_generation_progress,
+                     name='internship_affectation_generation_progress'),
                 path('import/', affectation.import_affectations, name='internship_affectation_import'),
                 path('sumup/', affectation.internship_affectation_sumup, name='internship_affectation_sumup'),
             ])),
@@ -0,0 +1,124 @@
+##############################################################################
+#
+#    OSIS stands for Open Student Information System. It's an application
+#    designed to manage the core business of higher education institutions,
+#    such as universities, faculties, institutes and professional schools.
+#    The core business involves the administration of students, teachers,
+#    courses, programs and so on.
+#
+#    Copyright (C) 2015-2025 Université catholique de Louvain (http://www.uclouvain.be)
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    A copy of this license - GNU General Public License - is available
+#    at the root of the source code of this program.  If not,
+#    see http://www.gnu.org/licenses/.
+#
+##############################################################################
+from collections import defaultdict
+
+
+class AssignmentState:
+    """
+    Partial solution of the assignment algorithm.
+
+    Behaves like the list of affectations it replaces (iteration keeps insertion order) but keeps indexes by student,
+    by (organization, speciality, period) and by period up to date on every change, so that the solver never has to
+    scan the whole solution. Students are identified by their person id, which is shared by Student and
+    InternshipStudentInformation. Affectations of sibling cohorts are registered as "existing": they are taken into
+    account for costs and availabilities but are not part of the solution itself.
+    """
+
+    def __init__(self, affectations=None, existing_affectations=None):
+        self._affectations = []
+        self._by_student = defaultdict(list)
+        self._existing_by_student = defaultdict(list)
+        self._by_offer_period = defaultdict(list)
+        self._by_period = defaultdict(list)
+        self._costs = defaultdict(int)
+        self.add_existing(existing_affectations or [])
+        self.extend(affectations or [])
+
+    def __iter__(self):
+        return iter(self._affectations)
+
+    def __len__(self):
+        return len(self._affectations)
+
+    def __getitem__(self, index):
+        return self._affectations[index]
+
+    def append(self, affectation):
+        self._affectations.append(affectation)
+        self._by_student[_person_id(affectation)].append(affectation)
+        self._by_offer_period[_offer_period_key(affectation)].append(affectation)
+        self._by_period[affectation.period_id].append(affectation)
+        self._costs[_person_id(affectation)] += affectation.cost
+
+    def extend(self, affectations):
+        for affectation in affectations:
+            self.append(affectation)
+
+    def add_existing(self, affectations):
+        for affectation in affectations:
+            self._existing_by_student[_person_id(affectation)].append(affectation)
+            self._costs[_person_id(affectation)] += affectation.cost
+
+    def reassign(self, affectation, organization, choice, cost):
+        """ Move an affectation of the solution to another organization and keep the indexes consistent. """
+        self._by_offer_period[_offer_period_key(affectation)].remove(affectation)
+        self._costs[_person_id(affectation)] += cost - affectation.cost
+        affectation.organization = organization
+        affectation.choice = choice
+        affectation.cost = cost
+        self._by_offer_period[_offer_period_key(affectation)].append(affectation)
+
+    def for_student(self, student):
+        """ All the affectations of the solution related to the student, including duplicates on a same period. """
+        return self._by_student.get(student.person_id, [])
+
+    def existing_for_student(self, student):
+        """ Affectations of the student in sibling cohorts. """
+        return self._existing_by_student.get(student.person_id, [])
+
+    def student_affectations(self, student, include_existing=False):
+        """ Affectations of the student, keeping only the first affectation found for each period. """
+        affectations = self.for_student(student)
+        if include_existing:
+            affectations = affectations + self.existing_for_student(student)
+        unique_periods = set()
+        filtered_affectations = []
+        for affectation in affectations:
+            if affectation.period_id not in unique_periods:
+                filtered_affectations.append(affectation)
+                unique_periods.add(affectation.period_id)
+        return filtered_affectations
+
+    def student_period_ids(self, student, include_existing=False):
+        return {affectation.period_id for affectation in self.student_affectations(student, include_existing)}
+
+    def student_cost(self, student):
+        """ Sum of the costs of all the affectations of the student, including the ones of sibling cohorts. """
+        return self._costs.get(student.person_id, 0)
+
+    def for_offer_and_period(self, organization_id, speciality_id, period_id):
+        return self._by_offer_period.get((organization_id, speciality_id, period_id), [])
+
+    def for_period(self, period_id):
+        return self._by_period.get(period_id, [])
+
+
+def _person_id(affectation):
+    return affectation.student.person_id
+
+
+def _offer_period_key(affectation):
+    return affectation.organization_id, affectation.speciality_id, affectation.period_id
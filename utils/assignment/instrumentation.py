@@ -0,0 +1,87 @@
+##############################################################################
+#
+#    OSIS stands for Open Student Information System. It's an application
+#    designed to manage the core business of higher education institutions,
+#    such as universities, faculties, institutes and professional schools.
+#    The core business involves the administration of students, teachers,
+#    courses, programs and so on.
+#
+#    Copyright (C) 2015-2025 Université catholique de Louvain (http://www.uclouvain.be)
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    A copy of this license - GNU General Public License - is available
+#    at the root of the source code of this program.  If not,
+#    see http://www.gnu.org/licenses/.
+#
+##############################################################################
+import cProfile
+import timeit
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.db import connection
+
+
+class AssignmentInstrumentation:
+    """
+    Per-phase timers and SQL query counters of an assignment run, with counters of notable events (imposed
+    organizations, hospital error fallbacks). Phases with the same name are accumulated. When a profile path is
+    given, the run is also profiled with cProfile and the stats are dumped to that path.
+    """
+
+    def __init__(self, profile_path=None):
+        self.phases = {}
+        self.counters = defaultdict(int)
+        self.profile_path = profile_path
+
+    @contextmanager
+    def phase(self, name):
+        phase = self.phases.setdefault(name, {'duration': 0, 'queries': 0})
+        queries = []
+        start = timeit.default_timer()
+        with connection.execute_wrapper(_count_queries(queries)):
+            yield
+        phase['duration'] += timeit.default_timer() - start
+        phase['queries'] += len(queries)
+
+    @contextmanager
+    def profile(self):
+        if not self.profile_path:
+            yield
+            return
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            profile.dump_stats(self.profile_path)
+
+    def count(self, counter, value=1):
+        self.counters[counter] += value
+
+    def summary(self):
+        return {
+            'phases': {name: {'duration': round(phase['duration'], 3), 'queries': phase['queries']}
+                       for name, phase in self.phases.items()},
+            'duration': round(sum(phase['duration'] for phase in self.phases.values()), 3),
+            'queries': sum(phase['queries'] for phase in self.phases.values()),
+            'counters': dict(self.counters),
+            'profile': self.profile_path,
+        }
+
+
+def _count_queries(queries):
+    def wrapper(execute, sql, params, many, context):
+        queries.append(sql)
+        return execute(sql, params, many, context)
+    return wrapper
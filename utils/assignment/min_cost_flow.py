@@ -0,0 +1,102 @@
+##############################################################################
+#
+#    OSIS stands for Open Student Information System. It's an application
+#    designed to manage the core business of higher education institutions,
+#    such as universities, faculties, institutes and professional schools.
+#    The core business involves the administration of students, teachers,
+#    courses, programs and so on.
+#
+#    Copyright (C) 2015-2025 Université catholique de Louvain (http://www.uclouvain.be)
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    A copy of this license - GNU General Public License - is available
+#    at the root of the source code of this program.  If not,
+#    see http://www.gnu.org/licenses/.
+#
+##############################################################################
+import heapq
+
+INFINITY = float('inf')
+
+
+class MinCostFlow:
+    """
+    Minimum cost flow solver (successive shortest paths with Dijkstra and node potentials).
+
+    Costs must be non negative integers. Nodes are numbered from 0 to node_count - 1.
+    """
+
+    def __init__(self, node_count):
+        self.node_count = node_count
+        self._graph = [[] for _ in range(node_count)]
+        # each edge is [target, capacity, cost, index of the reverse edge in the target adjacency list]
+        self._edges = []
+
+    def add_edge(self, source, target, capacity, cost):
+        """ Add an edge and return its identifier, to be used with flow(). """
+        self._graph[source].append([target, capacity, cost, len(self._graph[target])])
+        self._graph[target].append([source, 0, -cost, len(self._graph[source]) - 1])
+        self._edges.append((source, len(self._graph[source]) - 1, capacity))
+        return len(self._edges) - 1
+
+    def flow(self, edge_id):
+        source, index, capacity = self._edges[edge_id]
+        return capacity - self._graph[source][index][1]
+
+    def solve(self, source, sink, max_flow=INFINITY):
+        """ Send as much flow as possible (up to max_flow) from source to sink at minimum cost. """
+        total_flow, total_cost = 0, 0
+        potentials = [0] * self.node_count
+        while total_flow < max_flow:
+            distances, previous = self._shortest_paths(source, potentials)
+            if distances[sink] == INFINITY:
+                break
+            for node in range(self.node_count):
+                if distances[node] < INFINITY:
+                    potentials[node] += distances[node]
+
+            augment = max_flow - total_flow
+            node = sink
+            while node != source:
+                previous_node, index = previous[node]
+                augment = min(augment, self._graph[previous_node][index][1])
+                node = previous_node
+
+            node = sink
+            while node != source:
+                previous_node, index = previous[node]
+                edge = self._graph[previous_node][index]
+                edge[1] -= augment
+                self._graph[node][edge[3]][1] += augment
+                total_cost += augment * edge[2]
+                node = previous_node
+            total_flow += augment
+        return total_flow, total_cost
+
+    def _shortest_paths(self, source, potentials):
+        distances = [INFINITY] * self.node_count
+        previous = [None] * self.node_count
+        distances[source] = 0
+        queue = [(0, source)]
+        while queue:
+            distance, node = heapq.heappop(queue)
+            if distance > distances[node]:
+                continue
+            for index, (target, capacity, cost, _) in enumerate(self._graph[node]):
+                if capacity <= 0:
+                    continue
+                new_distance = distance + cost + potentials[node] - potentials[target]
+                if new_distance < distances[target]:
+                    distances[target] = new_distance
+                    previous[target] = (node, index)
+                    heapq.heappush(queue, (new_distance, target))
+        return distances, previous
@@ -24,21 +24,89 @@
 #
 ##############################################################################
 
+from collections import defaultdict
+
+
+class PeriodPlacesIndex:
+    """
+    Remaining places of the offers by period, as the list of PeriodInternshipPlaces `.values()` dicts it wraps.
+
+    The dicts are indexed by id, by (offer, period), by offer and by period so that a lookup or an update does not
+    scan the whole table. Results keep the order of the wrapped list, like the list based helpers below.
+    """
+
+    def __init__(self, period_places):
+        self._period_places = list(period_places)
+        self._position = {}
+        self._by_offer_and_period = {}
+        self._by_offer = defaultdict(list)
+        self._by_period = defaultdict(list)
+        for position, period_place in enumerate(self._period_places):
+            self._position[period_place["id"]] = position
+            key = (period_place["internship_offer_id"], period_place["period_id"])
+            self._by_offer_and_period.setdefault(key, period_place)
+            self._by_offer[period_place["internship_offer_id"]].append(period_place)
+            self._by_period[period_place["period_id"]].append(period_place)
+
+    def __iter__(self):
+        return iter(self._period_places)
+
+    def __len__(self):
+        return len(self._period_places)
+
+    def get(self, offer_id, period_id):
+        return self._by_offer_and_period.get((offer_id, period_id))
+
+    def for_offers(self, offer_ids):
+        period_places = [period_place for offer_id in set(offer_ids) for period_place in self._by_offer[offer_id]]
+        return self._in_original_order(period_places)
+
+    def for_periods(self, period_ids):
+        period_places = [period_place for period_id in set(period_ids) for period_place in self._by_period[period_id]]
+        return self._in_original_order(period_places)
+
+    def for_offers_and_periods(self, offer_ids, period_ids):
+        period_places = [self.get(offer_id, period_id) for offer_id in set(offer_ids) for period_id in set(period_ids)]
+        return self._in_original_order([period_place for period_place in period_places if period_place])
+
+    def update(self, period_place):
+        """ Take into account the new number of places of a period place of the index. """
+        indexed_period_place = self._period_places[self._position[period_place["id"]]]
+        indexed_period_place["number_places"] = period_place["number_places"]
+
+    def _in_original_order(self, period_places):
+        return sorted(period_places, key=lambda period_place: self._position[period_place["id"]])
+
 
 def get_period_places_for_offer_ids(offer_ids, period_places):
+    if isinstance(period_places, PeriodPlacesIndex):
+        return period_places.for_offers(offer_ids)
     return list(filter(lambda period_place: period_place["internship_offer_id"] in offer_ids, period_places))
 
 
 def get_period_places_for_offer_id_and_period_id(offer_id, period_id, period_places):
+    if isinstance(period_places, PeriodPlacesIndex):
+        period_place = period_places.get(offer_id, period_id)
+        return [period_place] if period_place else []
     return list(filter(lambda period_place: period_place["period_id"] == period_id and
                                             period_place["internship_offer_id"] == offer_id, period_places))
 
 
 def get_period_places_for_period_ids(period_ids, period_places):
+    if isinstance(period_places, PeriodPlacesIndex):
+        return period_places.for_periods(period_ids)
     return list(filter(lambda period_place: period_place["period_id"] in period_ids, period_places))
 
 
+def get_period_places_for_offer_ids_and_period_ids(offer_ids, period_ids, period_places):
+    if isinstance(period_places, PeriodPlacesIndex):
+        return period_places.for_offers_and_periods(offer_ids, period_ids)
+    return get_period_places_for_period_ids(period_ids, get_period_places_for_offer_ids(offer_ids, period_places))
+
+
 def get_period_place_for_offer_and_period(offer, period, available_places):
+    if isinstance(available_places, PeriodPlacesIndex):
+        return available_places.get(offer.id, period.id)
     places = list(filter(lambda period_place: period_place["internship_offer_id"] == offer.id and
                                             period_place["period_id"] == period.id, available_places))
     if places:
@@ -57,7 +125,10 @@ def sort_period_places(period_places):
 
 
 def replace_period_place_in_dictionnary(period_place, available_places):
+    if isinstance(available_places, PeriodPlacesIndex):
+        available_places.update(period_place)
+        return available_places
     for period_place_dict in available_places:
         if period_place_dict["id"] == period_place["id"]:
             period_place_dict["number_places"] = period_place["number_places"]
-    return available_places
\ No newline at end of file
+    return available_places
@@ -0,0 +1,55 @@
+##############################################################################
+#
+#    OSIS stands for Open Student Information System. It's an application
+#    designed to manage the core business of higher education institutions,
+#    such as universities, faculties, institutes and professional schools.
+#    The core business involves the administration of students, teachers,
+#    courses, programs and so on.
+#
+#    Copyright (C) 2015-2025 Université catholique de Louvain (http://www.uclouvain.be)
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    A copy of this license - GNU General Public License - is available
+#    at the root of the source code of this program.  If not,
+#    see http://www.gnu.org/licenses/.
+#
+##############################################################################
+import uuid
+
+from django.core.cache import cache
+
+
+class CacheVersions:
+    """
+    Versions of the entries cached for some scopes (cohorts, persons...), stored without timeout. The keys of the
+    entries hold the version of their scopes, so that changing the version of a scope makes its entries unreachable,
+    the entries then expiring with their own timeout.
+    """
+
+    def __init__(self, prefix):
+        self.prefix = prefix
+
+    def get(self, scopes):
+        """ Current version by scope, a version being created for the scopes without any. """
+        keys = {scope: self._key(scope) for scope in scopes}
+        versions = cache.get_many(keys.values())
+        new_versions = {key: uuid.uuid4().hex for key in keys.values() if key not in versions}
+        if new_versions:
+            cache.set_many(new_versions, None)
+            versions.update(new_versions)
+        return {scope: versions[key] for scope, key in keys.items()}
+
+    def invalidate(self, scopes):
+        cache.set_many({self._key(scope): uuid.uuid4().hex for scope in scopes}, None)
+
+    def _key(self, scope):
+        return '{}_{}'.format(self.prefix, scope)
@@ -23,121 +23,144 @@
 #    see http://www.gnu.org/licenses/.
 #
 ##############################################################################
-from django.contrib.postgres.aggregates import StringAgg
-from django.db.models import OuterRef, Subquery, F, Value
-from django.db.models.functions import Concat, Upper
+from collections import defaultdict
+from tempfile import TemporaryFile
+from zipfile import ZipFile, ZIP_DEFLATED
+
+from django.db.models import Subquery
 from django.utils.translation import gettext_lazy as _
 from openpyxl import Workbook
 from openpyxl.styles import Font
 
-from internship import models
+from internship.business import affectation_roster
 from internship.models.enums import organization_report_fields
-from internship.models.enums.role import Role
-from internship.models.internship_student_information import InternshipStudentInformation
-from internship.models.master_allocation import MasterAllocation
+from internship.models.internship_student_affectation_stat import InternshipStudentAffectationStat
 from internship.utils.exporting.spreadsheet import columns_resizing, add_row
 from osis_common.document.xls_build import save_virtual_workbook
 
 
 def export_hospital_xls(cohort, organization):
+    rows = _get_rows_by_reference(cohort, [organization]).get(organization.reference, [])
+    return _render_workbook(_get_workbook_content(organization, rows))
+
+
+def export_hospitals_zip(cohort, organizations):
+    """
+    Temporary file, positioned at its start, holding a ZIP archive of the affectation workbook of every organization
+    having affectations. The affectations, masters and students of all the organizations are loaded with a fixed
+    number of queries. The archive is complete when returned, so that an error cannot truncate the response.
+    """
+    rows_by_reference = _get_rows_by_reference(cohort, organizations)
+    contents = [
+        _get_workbook_content(organization, rows_by_reference[organization.reference])
+        for organization in organizations if rows_by_reference.get(organization.reference)
+    ]
+    file = TemporaryFile()
+    try:
+        with ZipFile(file, 'w', ZIP_DEFLATED) as archive:
+            for content in contents:
+                archive.writestr(content['file_name'], _render_workbook(content))
+    except Exception:
+        file.close()
+        raise
+    file.seek(0)
+    return file
+
+
+def get_file_name(organization):
+    file_name_parts = organization.name.strip().replace(' ', '_')
+    return "affectation_{}_{}.xlsx".format(str(organization.reference), file_name_parts)
+
+
+def _render_workbook(content):
     workbook = Workbook()
     worksheet = workbook.active
-    _add_header(worksheet, organization)
-    _add_students(worksheet, cohort, organization)
-    _resize_columns(worksheet, organization)
-    return save_virtual_workbook(workbook)
-
-
-def _add_header(worksheet, organization):
-    report_sequence = organization.report_sequence()
-    column_titles = []
-    for item in report_sequence:
-        column_titles.append(str(_(item)))
-
-    add_row(worksheet, column_titles)
+    add_row(worksheet, content['titles'])
     cells = worksheet.iter_rows(min_row=1, max_row=1, min_col=1, max_col=13)
     for col in cells:
         for cell in col:
             cell.font = Font(bold=True)
+    for row in content['rows']:
+        add_row(worksheet, row)
+    columns_resizing(worksheet, content['columns_size'])
+    return save_virtual_workbook(workbook)
 
 
-def _add_students(worksheet, cohort, organization):
+def _get_workbook_content(organization, rows):
+    """ Everything needed to render the workbook of the organization. """
+    rep_seq = list(organization.report_sequence())
+    return {
+        'file_name': get_file_name(organization),
+        'titles': [str(_(item)) for item in rep_seq],
+        'rows': [[row[seq] for seq in rep_seq] for row in rows],
+        'columns_size': _get_columns_size(rep_seq),
+    }
+
 
+def _get_rows_by_reference(cohort, organizations):
+    cohorts = list(cohort.subcohorts.all()) if cohort.is_parent else [cohort]
+    references = {organization.reference for organization in organizations}
     if cohort.is_parent:
-        students_stat = models.internship_student_affectation_stat.InternshipStudentAffectationStat.objects.filter(
-            organization__cohort__in=cohort.subcohorts.all(), organization__reference=organization.reference
-        ).select_related('student__person')
+        students_stat = InternshipStudentAffectationStat.objects.filter(
+            organization__cohort__in=cohorts, organization__reference__in=references
+        )
     else:
-        students_stat = models.internship_student_affectation_stat.find_by_organization(
-            cohort, organization
-        ).select_related('student__person')
-
-    master_names = MasterAllocation.objects.filter(
-        organization_id=OuterRef('organization_id'),
-        specialty_id=OuterRef('speciality_id'),
-        role=Role.MASTER.name,
-    ).annotate(
-        full_name=Concat(
-            Upper(F('master__person__last_name')),
-            Value(' '),
-            F('master__person__first_name')
+        students_stat = InternshipStudentAffectationStat.objects.filter(
+            period__cohort=cohort, organization__in=organizations
         )
-    ).values('organization_id').annotate(
-        all_names=StringAgg('full_name', delimiter=', ')
-    ).values('all_names')
-
-    students_stat = students_stat.annotate(
-        masters=Subquery(master_names[:1])
+    students_stat = students_stat.select_related(
+        'student__person', 'period', 'speciality', 'organization'
+    ).annotate(
+        masters=Subquery(affectation_roster.master_names_subquery()[:1])
+    ).order_by(
+        'period__date_start', 'student__person__last_name', 'student__person__first_name'
     )
+    students_stat = list(students_stat)
 
-    rep_seq = list(organization.report_sequence())
-
-    cohorts = cohort.subcohorts.all() if cohort.is_parent else [cohort]
-
-    persons = students_stat.values('student__person')
-    students_info_list = InternshipStudentInformation.objects.filter(person__in=persons, cohort__in=cohorts).distinct(
-        'person'
-    )
-    students_info_dict = {stud_info.person_id: stud_info for stud_info in students_info_list}
+    person_ids = {student_stat.student.person_id for student_stat in students_stat}
+    students_info_dict = affectation_roster.get_students_information(person_ids, [subcohort.id for subcohort in cohorts])
+    addresses_dict = affectation_roster.get_addresses(person_ids)
 
+    rows_by_reference = defaultdict(list)
     for student_stat in students_stat:
-        student_info = students_info_dict[student_stat.student.person_id]
-        address = student_info.person.personaddress_set.first()
-        seq_dict = {organization_report_fields.PERIOD: student_stat.period.name,
-                    organization_report_fields.START_DATE: student_stat.period.date_start.strftime("%d-%m-%Y"),
-                    organization_report_fields.END_DATE: student_stat.period.date_end.strftime("%d-%m-%Y"),
-                    organization_report_fields.LAST_NAME: student_info.person.last_name,
-                    organization_report_fields.FIRST_NAME: student_info.person.first_name,
-                    organization_report_fields.SPECIALTY: student_stat.speciality.name,
-                    organization_report_fields.MASTER: student_stat.masters,
-                    organization_report_fields.BIRTHDATE: student_info.person.birth_date.strftime("%d-%m-%Y")
-                    if student_info.person.birth_date else None,
-                    organization_report_fields.EMAIL: student_info.person.email,
-                    organization_report_fields.NOMA: student_stat.student.registration_id,
-                    organization_report_fields.PHONE: student_info.phone_mobile,
-                    organization_report_fields.ADDRESS: address.location,
-                    organization_report_fields.POSTAL_CODE: address.postal_code,
-                    organization_report_fields.CITY: address.city}
-
-        columns = []
-        for seq in rep_seq:
-            columns.append(seq_dict[seq])
-
-        add_row(worksheet, columns)
-
-
-def _resize_columns(worksheet, organization):
+        rows_by_reference[student_stat.organization.reference].append(_get_row(
+            student_stat,
+            students_info_dict.get(student_stat.student.person_id),
+            addresses_dict.get(student_stat.student.person_id)
+        ))
+    return rows_by_reference
+
+
+def _get_row(student_stat, student_info, address):
+    person = student_stat.student.person
+    return {
+        organization_report_fields.PERIOD: student_stat.period.name,
+        organization_report_fields.START_DATE: student_stat.period.date_start.strftime("%d-%m-%Y"),
+        organization_report_fields.END_DATE: student_stat.period.date_end.strftime("%d-%m-%Y"),
+        organization_report_fields.LAST_NAME: person.last_name,
+        organization_report_fields.FIRST_NAME: person.first_name,
+        organization_report_fields.SPECIALTY: student_stat.speciality.name,
+        organization_report_fields.MASTER: student_stat.masters,
+        organization_report_fields.BIRTHDATE: person.birth_date.strftime("%d-%m-%Y") if person.birth_date else None,
+        organization_report_fields.EMAIL: person.email,
+        organization_report_fields.NOMA: student_stat.student.registration_id,
+        organization_report_fields.PHONE: student_info.phone_mobile if student_info else None,
+        organization_report_fields.ADDRESS: address.location if address else None,
+        organization_report_fields.POSTAL_CODE: address.postal_code if address else None,
+        organization_report_fields.CITY: address.city if address else None,
+    }
+
+
+def _get_columns_size(selected_fields):
     # Take all allowed fields and associate their spreadsheet sizes.
     report_fields = organization_report_fields.REPORT_FIELDS
     fields_size = dict(zip(report_fields, [8, 13, 11, 32, 16, 32, 16, 36, 11, 11, 11, 11, 11, 32]))
 
     # Take the sequence of fields selected by the user and generate a list of their sizes
-    selected_fields = list(organization.report_sequence())
     sizes_selected_fields = [fields_size[field] for field in selected_fields]
 
     # Associate columns' letters with their sizes, as required by the function columns_resizing.
-    columns_size = dict(zip(_char_range('A', 'N'), sizes_selected_fields))
-    columns_resizing(worksheet, columns_size)
+    return dict(zip(_char_range('A', 'N'), sizes_selected_fields))
 
 
 def _char_range(a, z):
@@ -23,8 +23,11 @@
 #    see http://www.gnu.org/licenses/.
 #
 ##############################################################################
+from tempfile import TemporaryFile
+
 from django.utils.translation import gettext as _
 from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.styles import Font
 from openpyxl.utils import get_column_letter
 
@@ -33,7 +36,6 @@ from internship.models.period import get_effective_periods
 from internship.templatetags.dictionary import is_edited
 from internship.templatetags.list import get_period_score_tuple
 from internship.utils.exporting.spreadsheet import columns_resizing, add_row
-from osis_common.document.xls_build import save_virtual_workbook
 
 LAST_COLUMN = 50
 PERIOD_COLUMN_WIDTH = 7
@@ -48,31 +50,57 @@ def _get_columns_width():
 
 
 def export_xls_with_scores(cohort, periods, students, internships):
-    workbook = Workbook()
-    worksheet = workbook.active
-    _add_header(cohort, periods, worksheet)
-    _make_complete_list(periods, students, worksheet)
-    _make_internship_sheets(internships, periods, students, workbook)
-    return save_virtual_workbook(workbook)
+    with save_xls_with_scores(cohort, periods, students, internships) as file:
+        return file.read()
+
+
+def save_xls_with_scores(cohort, periods, students, internships):
+    """
+    Temporary file, positioned at its start, holding the scores workbook. Rows are written in write-only mode while
+    iterating the students, which can be a generator, so that neither the students nor the workbook are held in
+    memory. The workbook is complete when returned, so that an error cannot truncate the response.
+    """
+    file = TemporaryFile()
+    try:
+        _save_workbook(cohort, periods, students, internships, file)
+    except Exception:
+        file.close()
+        raise
+    file.seek(0)
+    return file
+
+
+def _save_workbook(cohort, periods, students, internships, file):
+    workbook = Workbook(write_only=True)
+    worksheet = workbook.create_sheet()
+    columns_resizing(worksheet, _get_columns_width())
+    all_periods = periods.exists() and periods.count() == get_effective_periods(periods.first().cohort.pk).count()
+    _add_header(cohort, periods, worksheet, all_periods)
+    internship_sheets = _make_internship_sheets(internships, workbook)
+    for student in students:
+        if student.registration_id:
+            add_row(worksheet, _get_student_row(periods, student, all_periods))
+            for internship, internship_sheet in internship_sheets.items():
+                add_row(internship_sheet, _get_student_internship_row(internship, periods, student))
+    workbook.save(file)
 
 
-def _make_internship_sheets(internships, periods, students, workbook):
+def _make_internship_sheets(internships, workbook):
+    internship_sheets = {}
     for internship in sorted(internships):
-        workbook.create_sheet(internship)
-        worksheet = workbook[internship]
-        _add_sheet_header(worksheet)
-        _add_sheet_content(internship, periods, students, worksheet)
+        internship_sheets[internship] = workbook.create_sheet(internship)
+        _add_sheet_header(internship_sheets[internship])
+    return internship_sheets
 
 
-def _add_sheet_content(internship, periods, students, worksheet):
-    for student in students:
-        if student.registration_id:
-            columns = []
-            columns.append(student.person.last_name.upper())
-            columns.append(student.person.first_name)
-            columns.append(student.registration_id)
-            _complete_student_row_by_internship(columns, internship, periods, student)
-            add_row(worksheet, columns)
+def _get_student_columns(student):
+    return [student.person.last_name.upper(), student.person.first_name, student.registration_id]
+
+
+def _get_student_internship_row(internship, periods, student):
+    columns = _get_student_columns(student)
+    _complete_student_row_by_internship(columns, internship, periods, student)
+    return columns
 
 
 def _complete_student_row_by_internship(columns, internship, periods, student):
@@ -119,21 +147,14 @@ def _is_dict_with_key(obj, key):
     return isinstance(obj, dict) and key in obj
 
 
-def _make_complete_list(periods, students, worksheet):
-    columns_resizing(worksheet, _get_columns_width())
-    all_periods_count = get_effective_periods(periods.first().cohort.pk).count()
-    for student in students:
-        if student.registration_id:
-            columns = []
-            columns.append(student.person.last_name.upper())
-            columns.append(student.person.first_name)
-            columns.append(student.registration_id)
-            _complete_student_row_for_all_internships(columns, periods, student)
-            if periods.count() == all_periods_count:
-                _append_evolution_score(columns, student.evolution_score)
-                columns.append(student.evolution_score_reason)
-            columns.append(_("Yes") if student.fulfill_condition else _("No"))
-            add_row(worksheet, columns)
+def _get_student_row(periods, student, all_periods):
+    columns = _get_student_columns(student)
+    _complete_student_row_for_all_internships(columns, periods, student)
+    if all_periods:
+        _append_evolution_score(columns, student.evolution_score)
+        columns.append(student.evolution_score_reason)
+    columns.append(_("Yes") if student.fulfill_condition else _("No"))
+    return columns
 
 
 def _append_evolution_score(columns, score):
@@ -175,18 +196,21 @@ def _append_preconcours_data(columns, period, student):
         columns.extend(['', '', ''])
 
 
+def _add_bold_row(worksheet, column_titles):
+    cells = []
+    for title in column_titles:
+        cell = WriteOnlyCell(worksheet, value=title)
+        cell.font = Font(bold=True)
+        cells.append(cell)
+    add_row(worksheet, cells)
+
+
 def _add_sheet_header(worksheet):
-    column_titles = [_("Name"), _("First name"), _("NOMA"), _("Hospital"), _("Grade")]
-    add_row(worksheet, column_titles)
-    cells = worksheet.iter_rows(min_row=1, max_row=1, min_col=1, max_col=27)
-    for col in cells:
-        for cell in col:
-            cell.font = Font(bold=True)
+    _add_bold_row(worksheet, [_("Name"), _("First name"), _("NOMA"), _("Hospital"), _("Grade")])
 
 
-def _add_header(cohort, periods, worksheet):
+def _add_header(cohort, periods, worksheet, all_periods):
     column_titles = [_("Name"), _("First name"), _("NOMA")]
-    all_periods_count = get_effective_periods(periods.first().cohort.pk).count()
     for period in periods:
         if period.is_preconcours:
             column_titles.extend([
@@ -199,17 +223,13 @@ def _add_header(cohort, periods, worksheet):
             column_titles.append(period.name)
             column_titles.append("{}+".format(period.name))
             column_titles.append("{}-Score".format(period.name))
-    if periods.count() == all_periods_count:
+    if all_periods:
         column_titles.append(_("Evolution"))
         column_titles.append(_("Evolution computed"))
         column_titles.append(_("Evolution edited"))
         column_titles.append(_("Reason"))
     column_titles.append(_("EPA Validation"))
-    add_row(worksheet, column_titles)
-    cells = worksheet.iter_rows(min_row=1, max_row=1, min_col=1, max_col=40)
-    for col in cells:
-        for cell in col:
-            cell.font = Font(bold=True)
+    _add_bold_row(worksheet, column_titles)
 
 
 def _add_students(cohort, worksheet):
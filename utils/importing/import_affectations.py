@@ -26,14 +26,16 @@ import datetime
 
 import openpyxl
 from django.core.exceptions import ValidationError
-from django.db.transaction import TransactionManagementError
+from django.db import transaction
 from django.utils.translation import gettext_lazy as _
 
-from base.models import student
-from internship.models import internship_speciality, internship_student_affectation_stat, organization
+from base.models.student import Student
+from internship.business import choice_status, score_table
 from internship.models.enums.choice_type import ChoiceType
 from internship.models.internship import Internship
 from internship.models.internship_score import InternshipScore
+from internship.models.internship_speciality import InternshipSpeciality
+from internship.models.internship_student_affectation_stat import InternshipStudentAffectationStat
 from internship.models.organization import Organization
 
 INTERNSHIP_TYPE_MANDATORY = 'Stage obligatoire'
@@ -49,7 +51,7 @@ def import_xlsx(cohort, xlsxfile, period_instance):
     organization_mg = Organization.objects.get(cohort=cohort, reference=MEDECINE_GENERALE_ORG_REF)
 
     # Check if affectations already exist for the cohort's period
-    existing_affectations = internship_student_affectation_stat.InternshipStudentAffectationStat.objects.filter(
+    existing_affectations = InternshipStudentAffectationStat.objects.filter(
         period=period_instance,
     ).exists()
 
@@ -57,20 +59,23 @@ def import_xlsx(cohort, xlsxfile, period_instance):
         errors.append(_("Affectations already exist for this cohort and period. Import cancelled."))
         return errors, 0
 
-    for index, row in enumerate(worksheet.iter_rows(min_row=2, values_only=True), start=2):
+    rows = list(worksheet.iter_rows(min_row=2, values_only=True))
+    references = _CohortReferences(cohort, rows)
+
+    for index, row in enumerate(rows, start=2):
         # Start from the second row, index starts at 2
-        row_errors = _validate_row(cohort, row, index)
+        row_errors = _validate_row(references, row, index)
         if row_errors:
             errors.extend(row_errors)
             return errors, 0
 
-    for index, row in enumerate(worksheet.iter_rows(min_row=2, values_only=True), start=2):
+    affectations = []
+    for index, row in enumerate(rows, start=2):
         registration_id = row[2]
         affectation_str = row[7]
         internship_type = row[10]
         # Check if date columns exist and have values
         date_end_str, date_start_str = _get_dates_str(row)
-        print(date_start_str, date_end_str)
         if registration_id and affectation_str:
             affectation_strings = affectation_str.split('/')
 
@@ -87,20 +92,50 @@ def import_xlsx(cohort, xlsxfile, period_instance):
                 date_ends = [date_end_str] * len(affectation_strings)
             try:
                 for i, affectation_string in enumerate(affectation_strings):
-                    _create_affectation(
-                        cohort, period_instance, registration_id,
-                        affectation_string, internship_type, index, organization_mg,
+                    affectations.append(_build_affectation(
+                        references, period_instance, registration_id,
+                        affectation_string, internship_type, organization_mg,
                         date_starts[i], date_ends[i]
-                    )
+                    ))
             except ValidationError as e:
                 error_msg = f"Error creating affectations: {e}"
                 errors.append(error_msg)
-            except TransactionManagementError as e:
-                pass
             row_count += 1
+
+    _create_affectations(affectations)
     return errors, row_count
 
 
+class _CohortReferences:
+    """ Specialties by acronym, organizations by reference, internships and students of the rows, fetched once. """
+
+    def __init__(self, cohort, rows):
+        self.specialties = {}
+        for specialty in InternshipSpeciality.objects.filter(cohort=cohort).order_by('pk'):
+            self.specialties.setdefault(specialty.acronym, specialty)
+        self.organizations = {}
+        for organization in Organization.objects.filter(cohort=cohort).order_by('pk'):
+            self.organizations.setdefault(organization.reference, organization)
+        self.internships_by_specialty = {}
+        self.internships_by_name = {}
+        for internship in Internship.objects.filter(cohort=cohort).order_by('pk'):
+            self.internships_by_specialty.setdefault(internship.speciality_id, internship)
+            self.internships_by_name.setdefault(internship.name, internship)
+        registration_ids = {str(row[2]) for row in rows if row[2]}
+        self.students = {
+            student.registration_id: student
+            for student in Student.objects.filter(registration_id__in=registration_ids).order_by('-pk')
+        }
+
+    def get_student(self, registration_id):
+        return self.students.get(str(registration_id))
+
+    def get_internship(self, internship_type, specialty):
+        if internship_type == INTERNSHIP_TYPE_MANDATORY:
+            return self.internships_by_specialty.get(specialty.pk if specialty else None)
+        return self.internships_by_name.get(internship_type)
+
+
 def _get_dates_str(row):
     date_start_str, date_end_str = None, None
     if len(row) > 11 and row[11]:
@@ -110,7 +145,13 @@ def _get_dates_str(row):
     return date_end_str, date_start_str
 
 
-def _validate_row(cohort, row, row_index):
+def _split_affectation_string(affectation_string):
+    specialty_acronym = "".join([char for char in affectation_string if char.isalpha()])
+    org_reference = "".join([char for char in affectation_string if char.isdigit()])
+    return specialty_acronym, org_reference
+
+
+def _validate_row(references, row, row_index):
     errors = []
     registration_id = row[2]
     affectation_str = row[7]
@@ -147,18 +188,15 @@ def _validate_row(cohort, row, row_index):
         if date_start_str > date_end_str:
             errors.append(f"Row {row_index}: Start date must be earlier than end date.")
 
-    student_obj = student.find_by_registration_id(registration_id)
+    student_obj = references.get_student(registration_id)
     if not student_obj:
         errors.append(f"Row {row_index}: Student with registration_id {registration_id} not found")
 
     affectation_strings = affectation_str.split('/')
     for affectation_string in affectation_strings:
-        specialty_acronym = "".join([char for char in affectation_string if char.isalpha()])
-        org_reference = "".join([char for char in affectation_string if char.isdigit()])
+        specialty_acronym, org_reference = _split_affectation_string(affectation_string)
 
-        specialty = internship_speciality.InternshipSpeciality.objects.filter(
-            acronym=specialty_acronym, cohort=cohort
-        ).first()
+        specialty = references.specialties.get(specialty_acronym)
         if not specialty:
             errors.append(f"Row {row_index}: Specialty with acronym {specialty_acronym} not found")
 
@@ -166,57 +204,55 @@ def _validate_row(cohort, row, row_index):
             errors.append(f"Row {row_index}: Organization reference is required for specialty {specialty_acronym}")
 
         if org_reference:
-            organization_obj = organization.Organization.objects.filter(reference=org_reference, cohort=cohort).first()
+            organization_obj = references.organizations.get(org_reference)
             if not organization_obj:
                 errors.append(f"Row {row_index}: Organization with reference {org_reference} not found")
 
-    internship = None
-    if internship_type == INTERNSHIP_TYPE_MANDATORY:
-        internship = Internship.objects.filter(speciality=specialty, cohort=cohort).first()
-    else:
-        internship = Internship.objects.filter(name=internship_type, cohort=cohort).first()
+    internship = references.get_internship(internship_type, specialty)
     if not internship:
         errors.append(f"Row {row_index}: Internship {internship_type} not found")
 
     return errors
 
 
-def _create_affectation(
-        cohort, period_instance, registration_id, affectation_str, internship_type, row_index, organization_mg,
+def _build_affectation(
+        references, period_instance, registration_id, affectation_str, internship_type, organization_mg,
         date_start=None, date_end=None
 ):
-    student_obj = student.find_by_registration_id(registration_id)
     # Process a single affectation string (already split in the calling function)
-    specialty_acronym = "".join([char for char in affectation_str if char.isalpha()])
-    org_reference = "".join([char for char in affectation_str if char.isdigit()])
-    specialty = internship_speciality.InternshipSpeciality.objects.filter(
-        acronym=specialty_acronym, cohort=cohort
-    ).first()
-    organization_obj = organization.Organization.objects.filter(
-        reference=org_reference, cohort=cohort
-    ).first() if org_reference else None
+    specialty_acronym, org_reference = _split_affectation_string(affectation_str)
+    specialty = references.specialties.get(specialty_acronym)
+    organization_obj = references.organizations.get(org_reference) if org_reference else None
 
     if specialty_acronym == MEDECINE_GENERALE_ACRONYM:
         organization_obj = organization_mg
 
-    internship = None
-    if internship_type == INTERNSHIP_TYPE_MANDATORY:
-        internship = Internship.objects.filter(speciality=specialty, cohort=cohort).first()
-    else:
-        internship = Internship.objects.filter(name=internship_type, cohort=cohort).first()
-
-    student_affectation = internship_student_affectation_stat.InternshipStudentAffectationStat.objects.create(
-        student=student_obj,
+    student_affectation = InternshipStudentAffectationStat(
+        student=references.get_student(registration_id),
         period=period_instance,
         speciality=specialty,
         organization=organization_obj,
-        internship=internship,
+        internship=references.get_internship(internship_type, specialty),
         cost=0,
         choice=ChoiceType.IMPOSED.value,
         date_start=date_start,
         date_end=date_end,
     )
+    # dates are parsed before the bulk insert so that an invalid date only rejects its row
+    for field in ('date_start', 'date_end'):
+        setattr(student_affectation, field, student_affectation._meta.get_field(field).to_python(
+            getattr(student_affectation, field)
+        ))
+    return student_affectation
+
+
+@transaction.atomic
+def _create_affectations(affectations):
+    affectations = InternshipStudentAffectationStat.objects.bulk_create(affectations)
     # create empty score along with affectation
-    InternshipScore.objects.create(
-        student_affectation=student_affectation
+    InternshipScore.objects.bulk_create(
+        [InternshipScore(student_affectation=student_affectation) for student_affectation in affectations]
     )
+    person_ids = {student_affectation.student.person_id for student_affectation in affectations}
+    score_table.invalidate_persons(person_ids)
+    choice_status.invalidate_persons(person_ids)
@@ -24,110 +24,161 @@
 #
 ##############################################################################
 import logging
+from collections import defaultdict
 
 import openpyxl
 from django.conf import settings
+from django.db import transaction
 
-from internship.models import organization, internship_speciality, internship_offer, period, period_internship_places
+from internship.api import response_cache
+from internship.models.internship_offer import InternshipOffer
+from internship.models.internship_speciality import InternshipSpeciality
+from internship.models.organization import Organization
+from internship.models.period import Period
 from internship.models.period_internship_places import PeriodInternshipPlaces
 
 COL_REF_HOSPITAL = 0
 COL_SPECIALTY = 1
 COL_MASTER = 2
+COL_FIRST_PERIOD = 3
+
+OFFER_FIELDS = ['organization', 'speciality', 'title', 'maximum_enrollments', 'master', 'cohort', 'selectable']
 
 logger = logging.getLogger(settings.DEFAULT_LOGGER)
 
 
 def import_xlsx(file_name, cohort):
     """ This import can be performed multiple times for the same cohort and the logic must make sure it will not
-        produce duplicated data. """
+        produce duplicated data.
+        :return: the number of created, updated and unchanged offers and places """
     workbook = openpyxl.load_workbook(file_name, read_only=True)
     worksheet = workbook.active
 
-    for row in worksheet.rows:
-        _import_offer(row, cohort)
-
-
-def _import_offer(row, cohort):
-    if _is_invalid_id(row[COL_REF_HOSPITAL].value):
+    offers = _CohortOffers(cohort)
+    for row in worksheet.iter_rows(values_only=True):
+        _import_offer(row, offers)
+    offers.save()
+
+    logger.info("Imported offers of the cohort {}: {}".format(cohort, offers.counts))
+    return offers.counts
+
+
+class _CohortOffers:
+    """ Organizations, specialties, periods, offers and places of a cohort, loaded once and upserted in bulk. """
+
+    def __init__(self, cohort):
+        self.cohort = cohort
+        self.periods = list(Period.objects.filter(cohort=cohort).order_by('date_start'))
+        self.organizations = {}
+        for organization in Organization.objects.filter(cohort=cohort).order_by('pk'):
+            self.organizations.setdefault(organization.reference, organization)
+        self.specialties = defaultdict(list)
+        for specialty in InternshipSpeciality.objects.filter(cohort=cohort).order_by('acronym', 'name'):
+            self.specialties[specialty.acronym].append(specialty)
+        self.offers = {}
+        for offer in InternshipOffer.objects.filter(cohort=cohort).select_related('organization').order_by('pk'):
+            self.offers.setdefault((offer.speciality_id, offer.organization.reference), offer)
+        self.places = {}
+        for place in PeriodInternshipPlaces.objects.filter(internship_offer__cohort=cohort).order_by('pk'):
+            self.places.setdefault((place.internship_offer_id, place.period_id), place)
+
+        self.new_offers, self.changed_offers, self.seen_offers = {}, {}, set()
+        self.new_places, self.changed_places, self.seen_places = {}, {}, set()
+
+    def stage_offer(self, organization, specialty, master, maximum_enrollments):
+        key = (specialty.id, organization.reference)
+        values = {
+            'organization_id': organization.id,
+            'speciality_id': specialty.id,
+            'title': specialty.name,
+            'maximum_enrollments': maximum_enrollments,
+            'master': master,
+            'cohort_id': self.cohort.id,
+            'selectable': True,
+        }
+        offer = self.offers.get(key)
+        if offer is None:
+            offer = self.offers[key] = self.new_offers[key] = InternshipOffer(**values)
+        elif _assign(offer, values) and offer.pk:
+            self.changed_offers[key] = offer
+        if offer.pk:
+            self.seen_offers.add(key)
+        return key
+
+    def stage_places(self, offer_key, period, number_places):
+        offer = self.offers[offer_key]
+        key = (offer_key, period.id)
+        place = self.places.get((offer.pk, period.id)) if offer.pk else None
+        if place is None:
+            place = self.new_places.setdefault(key, PeriodInternshipPlaces(period=period))
+        if _assign(place, {'number_places': number_places}) and place.pk:
+            self.changed_places[place.pk] = place
+        if place.pk:
+            self.seen_places.add(place.pk)
+
+    @transaction.atomic
+    def save(self):
+        InternshipOffer.objects.bulk_create(self.new_offers.values())
+        InternshipOffer.objects.bulk_update(self.changed_offers.values(), OFFER_FIELDS)
+        for (offer_key, period_id), place in self.new_places.items():
+            place.internship_offer = self.offers[offer_key]
+        PeriodInternshipPlaces.objects.bulk_create(self.new_places.values())
+        PeriodInternshipPlaces.objects.bulk_update(self.changed_places.values(), ['number_places'])
+        if self.new_offers or self.changed_offers:
+            # bulk writes do not send the save signals
+            response_cache.invalidate_cohorts([self.cohort.id])
+
+    @property
+    def counts(self):
+        return {
+            'offers': {
+                'created': len(self.new_offers),
+                'updated': len(self.changed_offers),
+                'unchanged': len(self.seen_offers - set(self.changed_offers)),
+            },
+            'places': {
+                'created': len(self.new_places),
+                'updated': len(self.changed_places),
+                'unchanged': len(self.seen_places - set(self.changed_places)),
+            },
+        }
+
+
+def _import_offer(row, offers):
+    if _is_invalid_id(row[COL_REF_HOSPITAL]):
         return
 
-    if row[COL_SPECIALTY].value:
-        hospitals = organization.find_by_reference(cohort, row[COL_REF_HOSPITAL].value)
-        if hospitals:
-            _import_hospital_places(row, cohort, hospitals)
-
+    if row[COL_SPECIALTY]:
+        hospital = offers.organizations.get(str(row[COL_REF_HOSPITAL]).zfill(2))
+        if hospital:
+            _import_hospital_places(row, offers, hospital)
 
-def _import_hospital_places(row, cohort, hospitals):
-    periods = period.Period.objects.filter(cohort=cohort).order_by('date_start')
-    maximum_enrollments = _get_maximum_enrollments(row, periods)
 
-    logger.info("Importing places of the hospital {}".format(hospitals.first()))
-    specialities = internship_speciality.search(acronym__exact=row[COL_SPECIALTY].value, cohort=cohort)
-    for specialty in specialities:
-        logger.info("Importing places of the speciality {}".format(specialty))
-        offer = _create_offer(row, cohort, specialty, hospitals.first(), maximum_enrollments)
+def _import_hospital_places(row, offers, hospital):
+    maximum_enrollments = _get_maximum_enrollments(row, offers.periods)
 
-        number_period = 0
-        for x in range(3, len(periods) + 3):
-            period_name = periods[number_period].name
-            number_period += 1
-            _create_offer_places(cohort, period_name, offer, row[x].value)
+    for specialty in offers.specialties.get(row[COL_SPECIALTY], []):
+        offer_key = offers.stage_offer(hospital, specialty, row[COL_MASTER], maximum_enrollments)
+        for col_period, a_period in enumerate(offers.periods, start=COL_FIRST_PERIOD):
+            offers.stage_places(offer_key, a_period, int(row[col_period]) if row[col_period] else 0)
 
 
 def _get_maximum_enrollments(row, periods):
     maximum_enrollments = 0
-    for col_period in range(3, len(periods) + 3):
-        if row[col_period].value:
-            maximum_enrollments += int(row[col_period].value)
+    for col_period in range(COL_FIRST_PERIOD, len(periods) + COL_FIRST_PERIOD):
+        if row[col_period]:
+            maximum_enrollments += int(row[col_period])
     return maximum_enrollments
 
 
-def _create_offer(row, cohort, specialty, org, maximum_enrollments):
-    existing_internship_offer = internship_offer.InternshipOffer.objects.filter(speciality=specialty,
-                                                                                organization__reference=org.reference,
-                                                                                cohort=cohort)
-    if existing_internship_offer:
-        logger_message = "Updating offer {}"
-        offer = existing_internship_offer.first()
-    else:
-        logger_message = "Creating offer {}"
-        offer = internship_offer.InternshipOffer()
-    logger.info(logger_message.format(offer))
-
-    offer.organization = org
-    offer.speciality = specialty
-    offer.title = specialty.name
-    offer.maximum_enrollments = maximum_enrollments
-    offer.master = row[COL_MASTER].value
-    offer.cohort = cohort
-    offer.selectable = True
-    offer.save()
-    return offer
-
-
-def _create_offer_places(cohort, period_name, offer, value):
-    a_period = period.search(name__exact=period_name, cohort=cohort).first()
-    existing_places = PeriodInternshipPlaces.objects.filter(
-        period=a_period,
-        internship_offer=offer
-    )
-
-    if existing_places:
-        logger_message = "Updating places {}"
-        offer_places = existing_places.first()
-    else:
-        logger_message = "Creating places {}"
-        offer_places = period_internship_places.PeriodInternshipPlaces()
-
-    offer_places.period = a_period
-    offer_places.internship_offer = offer
-    if value:
-        offer_places.number_places = int(value)
-    else:
-        offer_places.number_places = 0
-    offer_places.save()
-    logger.info(logger_message.format(offer_places))
+def _assign(instance, values):
+    """ Set the values on the instance and tell whether any of them changed. """
+    changed = False
+    for field, value in values.items():
+        if getattr(instance, field) != value:
+            setattr(instance, field, value)
+            changed = True
+    return changed
 
 
 def _is_invalid_id(registration_id):
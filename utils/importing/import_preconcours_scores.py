@@ -24,120 +24,123 @@
 #
 ##############################################################################
 
+import logging
+import timeit
+from contextlib import contextmanager
+
+from django.conf import settings
 from django.db import transaction
+from django.db.models import F
 from openpyxl import load_workbook
 
-from base.models import student
+from base.models.student import Student
+from internship.business import score_table
 from internship.models.internship_score import InternshipScore
 from internship.models.internship_student_affectation_stat import InternshipStudentAffectationStat
-from internship.models.internship_student_information import find_by_person
-from osis_common.utils.models import get_object_or_none
+from internship.models.internship_student_information import find_by_cohort
+
+logger = logging.getLogger(settings.DEFAULT_LOGGER)
 
 NUMBER_REGEX = r'(\d+)'
 
 
 @transaction.atomic
 def import_xlsx(cohort, xlsxfile, period):
-    workbook = load_workbook(filename=xlsxfile, read_only=True)
-    worksheet = workbook.active
-    period = cohort.period_set.get(name=period)
-    worksheet_period = list(worksheet.rows)[0][0].value
-    errors = _search_worksheet_for_errors(cohort, period, worksheet, worksheet_period)
+    # rows are validated and staged against prefetched lookups, then written in bulk, each stage being timed
+    durations = {}
+    with _timed(durations, 'read'):
+        workbook = load_workbook(filename=xlsxfile, read_only=True)
+        worksheet = workbook.active
+        period = cohort.period_set.get(name=period)
+        rows = list(worksheet.iter_rows(min_row=2))
+    with _timed(durations, 'prefetch'):
+        lookups = _PreconcoursLookups(cohort, period, rows)
+    with _timed(durations, 'validate'):
+        errors = _search_worksheet_for_errors(rows, lookups)
+    if not errors:
+        with _timed(durations, 'stage'):
+            scores, new_scores = _stage_scores(rows, lookups)
+        with _timed(durations, 'write'):
+            InternshipScore.objects.bulk_update(scores, ['behavior_score', 'competency_score', 'validated'])
+            InternshipScore.objects.bulk_create(new_scores)
+            score_table.invalidate_persons({student.person_id for student in lookups.students.values()})
+    logger.info("Pre-concours scores import of period %s in seconds: %s", period, durations)
     if errors:
         return errors
-    else:
-        _process_rows_import(cohort, period, worksheet)
     xlsxfile.close()
 
 
-def _process_rows_import(cohort, period, worksheet):
-    for row in list(worksheet.rows)[1:worksheet.max_row]:
-        if not any(cell.value for cell in row):
-            continue
-        _import_score(row, cohort, period)
-
-
-def _search_worksheet_for_errors(cohort, period, worksheet, worksheet_period):
+@contextmanager
+def _timed(durations, name):
+    start = timeit.default_timer()
+    yield
+    durations[name] = round(timeit.default_timer() - start, 3)
+
+
+class _PreconcoursLookups:
+    """ Students, cohort members, specialities, affectations and scores needed by the rows, fetched in bulk. """
+
+    def __init__(self, cohort, period, rows):
+        registration_ids = {str(row[0].value) for row in rows if row[0].value is not None}
+        self.students = {
+            student.registration_id: student
+            for student in Student.objects.filter(registration_id__in=registration_ids).order_by('-pk')
+        }
+        self.persons_in_cohort = set(find_by_cohort(cohort).filter(
+            person__in=[student.person_id for student in self.students.values()]
+        ).values_list('person_id', flat=True))
+        self.speciality_acronyms = set(cohort.internshipspeciality_set.values_list('acronym', flat=True))
+        self.affectations = {}
+        for affectation in InternshipStudentAffectationStat.objects.filter(
+            student__in=self.students.values(), period=period
+        ).annotate(speciality_acronym=F('speciality__acronym')).order_by('-pk'):
+            self.affectations[(affectation.student_id, affectation.speciality_acronym)] = affectation
+        self.scores = {
+            score.student_affectation_id: score
+            for score in InternshipScore.objects.filter(student_affectation__in=self.affectations.values())
+        }
+
+    def get_student(self, registration_id):
+        return self.students.get(str(registration_id))
+
+    def get_affectation(self, registration_id, speciality_acronym):
+        student = self.get_student(registration_id)
+        return self.affectations.get((student.pk, speciality_acronym)) if student else None
+
+
+def _search_worksheet_for_errors(rows, lookups):
     errors = {}
+    registration_error, score_completeness_errors, speciality_errors = [], [], []
+    for row in rows:
+        registration_id = row[0].value
+        if registration_id is not None:
+            if _has_registration_id_error(registration_id, lookups):
+                registration_error.append(row)
+            error = _get_score_completeness_error(row[6].value, row[7].value, registration_id, row)
+            if error:
+                score_completeness_errors.append(error)
+        speciality_acronym = row[4].value
+        if speciality_acronym is not None and speciality_acronym not in lookups.speciality_acronyms:
+            speciality_errors.append(_get_speciality_acronym_error(row, speciality_acronym))
 
-    registration_error = _analyze_registration_ids(cohort, worksheet)
     if registration_error:
         errors.update({'registration_error': registration_error})
-
-    score_completeness_errors = _analyze_score_completeness(worksheet)
     if score_completeness_errors:
         errors.update({'score_completeness_errors': score_completeness_errors})
-
-    speciality_errors = _analyze_specialities(cohort, worksheet)
     if speciality_errors:
         errors.update({'speciality_errors': speciality_errors})
-
     return errors
 
 
-def _analyze_score_completeness(worksheet):
-    errors = []
-    for row in list(worksheet.rows)[1:worksheet.max_row]:
-        registration_id = row[0].value
-        if registration_id is None:
-            continue
-
-        behavior_score = row[6].value
-        competency_score = row[7].value
-
-        error = _get_score_completeness_error(
-            behavior_score,
-            competency_score,
-            errors,
-            registration_id,
-            row
-        )
-        if error:
-            errors.append(error)
-
-    return errors
-
-
-def _get_score_completeness_error(behavior_score, competency_score, errors, registration_id, row):
+def _get_score_completeness_error(behavior_score, competency_score, registration_id, row):
     if behavior_score is None or competency_score is None:
         return {'registration_id': registration_id, 'row': row}
     return None
 
 
-def _analyze_registration_ids(cohort, worksheet):
-    errors = []
-    for row in list(worksheet.rows)[1:worksheet.max_row]:
-        registration_id = row[0].value
-        if registration_id is None:
-            continue
-        else:
-            error = _get_registration_id_errors(cohort, errors, registration_id, row)
-            if error:
-                errors.append(error)
-    return errors
-
-
-def _get_registration_id_errors(cohort, errors, registration_id, row):
-    existing_student = student.find_by_registration_id(registration_id)
-    if existing_student is None or not _student_is_in_cohort(existing_student, cohort):
-        return row
-
-
-def _analyze_specialities(cohort, worksheet):
-    errors = []
-    specialities = cohort.internshipspeciality_set.all()
-    speciality_acronyms = [s.acronym for s in specialities]
-
-    for row in list(worksheet.rows)[1:worksheet.max_row]:
-        speciality_acronym = row[4].value
-        if speciality_acronym is None:
-            continue
-
-        if speciality_acronym not in speciality_acronyms:
-            error = _get_speciality_acronym_error(row, speciality_acronym)
-            errors.append(error)
-
-    return errors
+def _has_registration_id_error(registration_id, lookups):
+    existing_student = lookups.get_student(registration_id)
+    return existing_student is None or existing_student.person_id not in lookups.persons_in_cohort
 
 
 def _get_speciality_acronym_error(row, speciality_acronym):
@@ -148,41 +151,34 @@ def _get_speciality_acronym_error(row, speciality_acronym):
     }
 
 
-def _import_score(row, cohort, period):
-    registration_id = row[0].value
-
-    if registration_id is None:
-        return
-
-    speciality_acronym = row[4].value
-
-    existing_student = student.find_by_registration_id(registration_id)
-    student_affectation = get_object_or_none(
-        InternshipStudentAffectationStat,
-        student=existing_student,
-        period=period,
-        speciality__acronym=speciality_acronym,
-    )
-
-    if student_affectation:
-        internship_score, created = InternshipScore.objects.get_or_create(
-            student_affectation=student_affectation,
-            defaults={'validated': True}
-        )
-
-        try:
-            behavior_score = row[6].value
-            competency_score = row[7].value
-
-            if all(score is not None for score in [behavior_score, competency_score]):
-                internship_score.behavior_score = behavior_score
-                internship_score.competency_score = competency_score
-                internship_score.validated = True
-                internship_score.save()
-
-        except (ValueError, TypeError):
-            pass
+def _stage_scores(rows, lookups):
+    scores, new_scores = {}, {}
+    for row in rows:
+        registration_id = row[0].value
+        if registration_id is None:
+            continue
+        student_affectation = lookups.get_affectation(registration_id, row[4].value)
+        if student_affectation:
+            internship_score = lookups.scores.get(student_affectation.pk)
+            if internship_score:
+                scores[student_affectation.pk] = internship_score
+            else:
+                internship_score = new_scores.setdefault(
+                    student_affectation.pk, InternshipScore(student_affectation=student_affectation, validated=True)
+                )
+            _stage_score(internship_score, row)
+    return scores.values(), new_scores.values()
+
+
+def _stage_score(internship_score, row):
+    try:
+        behavior_score = row[6].value
+        competency_score = row[7].value
 
+        if all(score is not None for score in [behavior_score, competency_score]):
+            internship_score.behavior_score = float(behavior_score)
+            internship_score.competency_score = float(competency_score)
+            internship_score.validated = True
 
-def _student_is_in_cohort(student, cohort):
-    return find_by_person(student.person, cohort)
+    except (ValueError, TypeError):
+        pass
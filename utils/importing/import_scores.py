@@ -28,15 +28,17 @@ import re
 from django.db import transaction
 from openpyxl import load_workbook
 
-from base.models import student
+from base.models.student import Student
+from internship.business import score_table
 from internship.models.internship_score import InternshipScore
 from internship.models.internship_student_affectation_stat import InternshipStudentAffectationStat
-from internship.models.internship_student_information import find_by_person
-from osis_common.utils.models import get_object_or_none
+from internship.models.internship_student_information import find_by_cohort
 
 APDS_COUNT = 15
 LINE_INTERVAL = 2
 NUMBER_REGEX = r'(\d+)'
+FIRST_STUDENT_ROW = 5
+APD_FIELDS = ['APD_{}'.format(index + 1) for index in range(APDS_COUNT)]
 
 
 @transaction.atomic
@@ -44,72 +46,86 @@ def import_xlsx(cohort, xlsxfile, period):
     workbook = load_workbook(filename=xlsxfile, read_only=True)
     worksheet = workbook.active
     period = cohort.period_set.get(name=period)
-    worksheet_period = list(worksheet.rows)[0][0].value
-    errors = _search_worksheet_for_errors(cohort, period, worksheet, worksheet_period)
+    worksheet_period, rows = _read_worksheet(worksheet)
+    students = _get_students_by_registration_id(rows)
+    errors = _search_worksheet_for_errors(cohort, period, rows, students, worksheet_period)
     if errors:
         return errors
     else:
-        _process_rows_import(cohort, period, worksheet)
+        _process_rows_import(period, rows, students)
     xlsxfile.close()
 
 
-def _process_rows_import(cohort, period, worksheet):
-    for row in list(worksheet.rows)[5:worksheet.max_row]:
-        _import_score(row, cohort, period)
-
-
-def _search_worksheet_for_errors(cohort, period, worksheet, worksheet_period):
+def _read_worksheet(worksheet):
+    # the sheet is read once, keeping the period of its first cell and the rows of the students
+    worksheet_period = None
+    rows = []
+    for index, row in enumerate(worksheet.iter_rows()):
+        if index == 0:
+            worksheet_period = row[0].value
+        elif index >= FIRST_STUDENT_ROW and row[0].value is not None:
+            rows.append(row)
+    return worksheet_period, rows
+
+
+def _get_students_by_registration_id(rows):
+    registration_ids = {str(row[0].value) for row in rows}
+    students = Student.objects.filter(registration_id__in=registration_ids).order_by('-pk')
+    return {student.registration_id: student for student in students}
+
+
+def _process_rows_import(period, rows, students):
+    affectations = {}
+    for affectation in InternshipStudentAffectationStat.objects.filter(
+        student__in=students.values(), period=period
+    ).order_by('-pk'):
+        affectations[affectation.student_id] = affectation
+    scores = {
+        score.student_affectation_id: score
+        for score in InternshipScore.objects.filter(student_affectation__in=affectations.values())
+    }
+    new_scores = {}
+    for row in rows:
+        affectation = affectations.get(students[str(row[0].value)].pk)
+        if affectation:
+            score = scores.get(affectation.pk) or new_scores.setdefault(
+                affectation.pk, InternshipScore(student_affectation=affectation)
+            )
+            _set_scores(score, row)
+    InternshipScore.objects.bulk_update(scores.values(), APD_FIELDS + ['validated'])
+    InternshipScore.objects.bulk_create(new_scores.values())
+    score_table.invalidate_persons({student.person_id for student in students.values()})
+
+
+def _set_scores(internship_score, row):
+    for index, column in enumerate(range(1, APDS_COUNT * LINE_INTERVAL, LINE_INTERVAL)):
+        setattr(internship_score, APD_FIELDS[index], row[column + LINE_INTERVAL + 1].value)
+    internship_score.validated = True
+
+
+def _search_worksheet_for_errors(cohort, period, rows, students, worksheet_period):
     errors = {}
     if not _periods_match(period, worksheet_period):
         errors.update({'period_error': worksheet_period})
     else:
-        registration_error = _analyze_registration_ids(cohort, worksheet)
+        registration_error = _analyze_registration_ids(cohort, rows, students)
         if registration_error:
             errors.update({'registration_error': registration_error})
     return errors
 
 
-def _analyze_registration_ids(cohort, worksheet):
+def _analyze_registration_ids(cohort, rows, students):
+    persons_in_cohort = set(find_by_cohort(cohort).filter(
+        person__in=[student.person_id for student in students.values()]
+    ).values_list('person_id', flat=True))
     errors = []
-    for row in list(worksheet.rows)[5:worksheet.max_row]:
-        registration_id = row[0].value
-        if registration_id is None:
-            continue
-        else:
-            existing_student = student.find_by_registration_id(registration_id)
-            if existing_student is None or not _student_is_in_cohort(existing_student, cohort):
-                errors.append(row)
+    for row in rows:
+        existing_student = students.get(str(row[0].value))
+        if existing_student is None or existing_student.person_id not in persons_in_cohort:
+            errors.append(row)
     return errors
 
 
-def _import_score(row, cohort, period):
-    scores = []
-    registration_id = row[0].value
-    if registration_id is None:
-        return
-    for i in range(1, APDS_COUNT*LINE_INTERVAL, LINE_INTERVAL):
-        scores.append(row[i+LINE_INTERVAL+1].value)
-    existing_student = student.find_by_registration_id(registration_id)
-    student_affectation = get_object_or_none(
-        InternshipStudentAffectationStat,
-        student=existing_student,
-        period=period
-    )
-    if student_affectation:
-        internship_score, created = InternshipScore.objects.get_or_create(
-            student_affectation=student_affectation,
-            defaults={'validated': True}
-        )
-        for index, score in enumerate(scores):
-            internship_score.__setattr__('APD_{}'.format(index+1), score)
-        internship_score.validated = True
-        internship_score.save()
-
-
-def _student_is_in_cohort(student, cohort):
-    return find_by_person(student.person, cohort)
-
-
 def _periods_match(period, worksheet_period):
     period_numeric = re.findall(NUMBER_REGEX, period.name)
     worksheet_period_numeric = re.findall(NUMBER_REGEX, worksheet_period)
@@ -23,32 +23,55 @@
 #    see http://www.gnu.org/licenses/.
 #
 ##############################################################################
-from copy import copy
-
 from openpyxl import load_workbook
 
-from base.models import student
+from base.models.student import Student
 from internship.models import internship_student_information as mdl_isi
 
+COL_PHONE_MOBILE = 13
+COL_LOCATION = 14
+COL_POSTAL_CODE = 15
+COL_CITY = 16
+COL_COUNTRY = 17
+COL_EMAIL = 18
+COL_REGISTRATION_ID = 7
+
 
 def import_xlsx(cohort, xlsxfile):
-    diff = []
     workbook = load_workbook(filename=xlsxfile, read_only=True)
     worksheet = workbook.active
-    for row in list(worksheet.rows)[1:]:
-        _import_row(cohort, row, diff)
+    rows = list(worksheet.iter_rows(min_row=2, values_only=True))
     xlsxfile.close()
+
+    students, informations = _get_students_and_informations(cohort, rows)
+    diff = []
+    for row in rows:
+        _import_row(cohort, row, diff, students, informations)
     return diff
 
 
-def _import_row(cohort, row, diff):
-    matricule = row[7].value
-    existing_student = student.find_by_registration_id(matricule)
+def _get_students_and_informations(cohort, rows):
+    """ Students of the sheet by registration id and their current information in the cohort by person. """
+    registration_ids = {str(row[COL_REGISTRATION_ID]) for row in rows if row[COL_REGISTRATION_ID] is not None}
+    students = {}
+    for student in Student.objects.filter(registration_id__in=registration_ids).select_related('person').order_by('pk'):
+        students.setdefault(student.registration_id, student)
+    informations = {}
+    person_ids = [student.person_id for student in students.values()]
+    queryset = mdl_isi.find_by_cohort(cohort).filter(person_id__in=person_ids).select_related('person').order_by('pk')
+    for information in queryset:
+        informations.setdefault(information.person_id, information)
+    return students, informations
+
+
+def _import_row(cohort, row, diff, students, informations):
+    matricule = row[COL_REGISTRATION_ID]
+    existing_student = students.get(str(matricule)) if matricule is not None else None
     if existing_student:
-        internship_student_information = mdl_isi.find_by_person(existing_student.person, cohort).first()
+        internship_student_information = informations.get(existing_student.person_id)
         if internship_student_information:
             student_information_diff = _update_information(internship_student_information, cohort, row)
-            if(student_information_diff):
+            if student_information_diff:
                 diff.append(student_information_diff)
         else:
             student_information = mdl_isi.InternshipStudentInformation()
@@ -61,24 +84,26 @@ def _import_row(cohort, row, diff):
 
 
 def _update_information(information, cohort, row):
-    old_data = copy(information)
-    information.location = row[14].value
-    information.postal_code = str(row[15].value)
-    information.city = row[16].value
-    information.country = row[17].value
-    information.email = row[18].value
-    information.phone_mobile = str(row[13].value)
+    old_dict = _get_field_values(information)
+    old_dict['cohort_id'] = cohort.id
+    information.location = row[COL_LOCATION]
+    information.postal_code = str(row[COL_POSTAL_CODE])
+    information.city = row[COL_CITY]
+    information.country = row[COL_COUNTRY]
+    information.email = row[COL_EMAIL]
+    information.phone_mobile = str(row[COL_PHONE_MOBILE])
     information.cohort = cohort
-    return _get_data_differences(old_data, information)
+    return _get_data_differences(old_dict, information)
+
+
+def _get_field_values(information):
+    values = information.__dict__.copy()
+    values.pop('_state')
+    return values
 
 
-def _get_data_differences(old, new):
-    old.cohort = new.cohort
-    new_dict = new.__dict__.copy()
-    old_dict = old.__dict__.copy()
-    new_dict.pop('_state')
-    old_dict.pop('_state')
-    new_set = set(new_dict.items()) - set(old_dict.items())
+def _get_data_differences(old_dict, new):
+    new_set = set(_get_field_values(new).items()) - set(old_dict.items())
     data_diff = {
         "data": new,
         "diff_set": new_set,
@@ -30,48 +30,52 @@ from operator import itemgetter
 from django.contrib import messages
 from django.contrib.auth.decorators import permission_required
 from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse
 from django.shortcuts import get_object_or_404
 from django.shortcuts import render, redirect
 from django.urls import reverse
-from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
 from internship import models
-from internship.business import assignment, statistics
+from internship.business import affectation_generation, assignment_multistart, statistics
 from internship.models import internship_student_affectation_stat
 from internship.models.period import get_assignable_periods, get_subcohorts_periods
+from internship.tasks import run_affectation_generation
 
 
 @permission_required('internship.is_internship_manager', raise_exception=True)
 def run_affectation(request, cohort_id):
-    cohort = get_object_or_404(
-        models.cohort.Cohort.objects.prefetch_related(
-            'internshipstudentinformation_set',
-            'internship_set',
-            'internshipspeciality_set',
-            'organization_set',
-            'internshipoffer_set',
-            'period_set',
-        ),
-        pk=cohort_id
-    )
+    cohort = get_object_or_404(models.cohort.Cohort, pk=cohort_id)
     if request.method == 'POST':
-        start_date_time = timezone.now()  # To register the beginning of the algorithm.
-
-        slvr = assignment.Assignment(cohort)
-        slvr.solve()
-        slvr.persist_solution()
-        end_date_time = timezone.now()  # To register the end of the algorithm.
-
-        affectation_generation_time = models.affectation_generation_time.AffectationGenerationTime()
-        affectation_generation_time.cohort = cohort
-        affectation_generation_time.start_date_time = start_date_time
-        affectation_generation_time.end_date_time = end_date_time
-        affectation_generation_time.generated_by = request.user.username
-        affectation_generation_time.save()
+        if not affectation_generation.start_generation(cohort):
+            messages.warning(request, _("A generation is already running for this cohort"))
+        else:
+            try:
+                run_affectation_generation.run.delay(
+                    cohort.id,
+                    request.user.username,
+                    solver='optimal' if request.POST.get('solver') == 'optimal' else 'greedy',
+                    runs=_get_runs(request),
+                )
+            except Exception:
+                affectation_generation.release_generation(cohort)
+                raise
+            messages.info(request, _("The generation of the solution has started"))
     return redirect(reverse('internship_affectation_hospitals',  kwargs={'cohort_id': cohort.id}))
 
 
+@permission_required('internship.is_internship_manager', raise_exception=True)
+def affectation_generation_progress(request, cohort_id):
+    cohort = get_object_or_404(models.cohort.Cohort, pk=cohort_id)
+    return JsonResponse(affectation_generation.get_progress(cohort) or {'status': None})
+
+
+def _get_runs(request):
+    try:
+        return min(max(1, int(request.POST.get('runs', 1))), assignment_multistart.MultiStartAssignment.MAX_RUNS)
+    except ValueError:
+        return 1
+
 
 @permission_required('internship.is_internship_manager', raise_exception=True)
 def view_hospitals(request, cohort_id):
@@ -132,25 +136,15 @@ def view_students(request, cohort_id):
 @permission_required('internship.is_internship_manager', raise_exception=True)
 def view_statistics(request, cohort_id):
     cohort = get_object_or_404(models.cohort.Cohort, pk=cohort_id)
-    sol, table, stats = None, None, None
+    stats = None
     periods = get_subcohorts_periods(cohort) if cohort.is_parent else get_assignable_periods(cohort_id=cohort_id)
     period_ids = [period.id for period in periods]
 
     student_affectations = internship_student_affectation_stat.InternshipStudentAffectationStat.objects\
-        .filter(period_id__in=period_ids)\
-        .select_related(
-            "student",
-            "student__person",
-            "internship",
-            "internship__speciality",
-            "organization",
-            "speciality",
-            "period"
-        )
+        .filter(period_id__in=period_ids)
 
-    if student_affectations.count() > 0:
-        sol = statistics.load_solution_sol(cohort, student_affectations)
-        stats = statistics.compute_stats(cohort, sol)
+    if student_affectations.exists():
+        stats = statistics.compute_aggregated_stats(cohort, student_affectations)
 
     latest_generation = models.affectation_generation_time.get_latest(cohort)
 
@@ -33,6 +33,7 @@ from django.views.decorators.http import require_http_methods
 
 from base import models as mdl
 from internship import models as mdl_int
+from internship.business import choice_demand
 from internship.models.cohort import Cohort
 from internship.models.internship import Internship
 from internship.models.internship_choice import InternshipChoice
@@ -76,15 +77,11 @@ def list_internships(request, cohort_id, specialty_id=None):
     query = query.select_related("organization", "speciality") \
         .order_by('speciality__acronym', 'speciality__name', 'organization__reference')
 
-    # Sort the internships by the organization's reference
-    query = _sort_internships(query, specialty.id)
+    query = list(query)
 
     # Get The number of different choices for the internships
-    mandatory_choices = InternshipChoice.objects.filter(
-        speciality=specialty,
-    ).select_related("speciality")
-
-    _get_number_choices(query, mandatory_choices, mandatory=True)
+    demand = choice_demand.get_choice_demand(cohort)
+    _get_number_choices(query, demand, mandatory=True)
 
     internships = mdl_int.internship.Internship.objects.filter(cohort=cohort)
 
@@ -105,11 +102,7 @@ def list_internships(request, cohort_id, specialty_id=None):
                 speciality__name=speciality_sort_value
             )
         organizations = _get_all_organizations(all_non_mandatory_internships)
-        non_mandatory_choices = InternshipChoice.objects.filter(
-            speciality_id__in=all_non_mandatory_speciality,
-            organization_id__in=organizations,
-        ).select_related("speciality")
-        _get_number_choices(all_non_mandatory_internships, non_mandatory_choices, mandatory=False)
+        _get_number_choices(all_non_mandatory_internships, demand, mandatory=False)
     else:
         all_non_mandatory_internships = InternshipOffer.objects.none()
     context = {
@@ -421,7 +414,14 @@ def upload_offers(request, cohort_id):
             if ".xlsx" not in str(file_name):
                 messages.add_message(request, messages.ERROR, _('File extension must be .xlsx'))
             else:
-                import_offers.import_xlsx(file_name, cohort)
+                counts = import_offers.import_xlsx(file_name, cohort)
+                messages.add_message(
+                    request, messages.SUCCESS,
+                    _('Offers imported: {offers[created]} created, {offers[updated]} updated, '
+                      '{offers[unchanged]} unchanged. Places: {places[created]} created, {places[updated]} updated, '
+                      '{places[unchanged]} unchanged').format(**counts),
+                    "alert-success"
+                )
 
     return HttpResponseRedirect(reverse('internships', kwargs={'cohort_id': cohort.id}))
 
@@ -459,56 +459,25 @@ def _rebuild_the_lists(preference_list, speciality_list, organization_list, inte
         index += 1
 
 
-def _sort_internships(sort_internships, specialty_id):
-    """
-        Function to sort internships by the organization's reference.
-        Params :
-            sort_internships : the list of internships to be sorted
-        Extract the ref of the organization, sort based in integer (the ref are in string),
-        delete the dublons recreat the list of internship base of the organization reference
-    """
-    tab = []
-    number_ref = []
-    for sort_internship in sort_internships:
-        if sort_internship is not None:
-            number_ref.append(sort_internship.organization.reference)
-    number_ref = sorted(number_ref, key=int)
-    number_ref = _delete_dublons_keep_order(number_ref)
-    internships = mdl_int.internship_offer.search(organization__reference__in=number_ref, speciality_id=specialty_id)
-    for internship in internships:
-        tab.append(internship)
-    return tab
-
-
-def _get_number_choices(internships, choices, mandatory=True):
+def _get_number_choices(internships, demand, mandatory=True):
     """
         Set new variables for the param, the number of the first and other choice for one internship
         Params :
             internships : the internships we want to compute the number of choices
+            demand : the number of choices of the cohort, as computed by choice_demand.get_choice_demand
+        For the non mandatory internships, only the first choices of the first elective internship are first choices.
     """
     for internship in internships:
-
-        mandatory_internship_choices = choices.filter(
-            organization=internship.organization,
-            internship__speciality=internship.speciality
-        ).order_by('student')
-        total_choices = mandatory_internship_choices
-
-        if not mandatory:
-            non_mandatory_internship_choices = choices.filter(
-                organization=internship.organization,
-                internship__speciality=None,
-                speciality=internship.speciality
-            ).order_by('student')
-            total_choices = mandatory_internship_choices.union(non_mandatory_internship_choices)
-
-        internship.number_first_choice = 0
-        internship.number_other_choice = 0
-        for choice in total_choices:
-            if choice.choice == 1 and mandatory or choice.choice == 1 and "1" in choice.internship.name:
-                internship.number_first_choice += 1
-            else:
-                internship.number_other_choice += 1
+        if mandatory:
+            total_choices = choice_demand.get_offer_demand(demand, internship, kinds=(choice_demand.MANDATORY,))
+            first_choices = total_choices['first']
+        else:
+            total_choices = choice_demand.get_offer_demand(demand, internship)
+            first_choices = choice_demand.get_offer_demand(
+                demand, internship, kinds=(choice_demand.FIRST_ELECTIVE,)
+            )['first']
+        internship.number_first_choice = first_choices
+        internship.number_other_choice = total_choices['total'] - first_choices
 
 
 def _delete_dublons_keep_order(seq):
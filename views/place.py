@@ -25,12 +25,13 @@
 ##############################################################################
 from django.contrib import messages
 from django.contrib.auth.decorators import permission_required
-from django.http import HttpResponse, HttpResponseRedirect
+from django.http import FileResponse, HttpResponse, HttpResponseRedirect
 from django.shortcuts import get_object_or_404, render
 from django.urls import reverse
 from django.utils.translation import gettext_lazy as _
 
 from internship import models
+from internship.business import affectation_roster, choice_demand
 from internship.forms.organization_form import OrganizationForm
 from internship.models.organization import Organization
 from internship.utils.exporting import organization_affectation_hospital
@@ -44,16 +45,16 @@ from reference.models.country import Country
 @permission_required('internship.is_internship_manager', raise_exception=True)
 def internships_places(request, cohort_id):
     cohort = get_object_or_404(models.cohort.Cohort, pk=cohort_id)
+    context = {'all_organizations': _get_cohort_organizations(cohort), 'cohort': cohort}
+    return render(request, "places.html", context)
+
 
+def _get_cohort_organizations(cohort):
     if cohort.is_parent:
-        organizations = models.organization.Organization.objects.filter(
+        return models.organization.Organization.objects.filter(
             cohort__in=cohort.subcohorts.all()
         ).order_by('reference').distinct('reference')
-    else:
-        organizations = models.organization.Organization.objects.filter(cohort=cohort).order_by('reference')
-
-    context = {'all_organizations': organizations, 'cohort': cohort}
-    return render(request, "places.html", context)
+    return models.organization.Organization.objects.filter(cohort=cohort).order_by('reference')
 
 
 
@@ -127,14 +128,11 @@ def student_choice(request, cohort_id, organization_id):
     all_offers = models.internship_offer.search(organization=organization, cohort=cohort)
     all_speciality = models.internship_speciality.find_all(cohort)
     set_tabs_name(all_speciality)
+    demand = choice_demand.get_choice_demand(cohort)
     for al in all_offers:
-        number_first_choice = len(models.internship_choice.search(organization=al.organization,
-                                                                  speciality=al.speciality,
-                                                                  choice=1))
-        number_all_choice = len(models.internship_choice.search(organization=al.organization,
-                                                                speciality=al.speciality))
-        al.number_first_choice = number_first_choice
-        al.number_all_choice = number_all_choice
+        number_choices = choice_demand.get_offer_demand(demand, al)
+        al.number_first_choice = number_choices['first']
+        al.number_all_choice = number_choices['total']
 
     context = {
         'organization': organization,
@@ -159,18 +157,7 @@ def student_affectation(request, cohort_id, organization_id):
     else:
         organizations = [organization]
 
-    affectations = models.internship_student_affectation_stat.search(organization__in=organizations)\
-                                                             .order_by("student__person__last_name",
-                                                                       "student__person__first_name")
-    for a in affectations:
-        a.email = ""
-        a.adress = ""
-        a.phone_mobile = ""
-        internship_student_information = models.internship_student_information.search(
-            person=a.student.person,
-            cohort__in=[org.cohort for org in organizations]
-        )
-        _add_student_information(a, internship_student_information)
+    affectations = affectation_roster.load_roster(organizations)
     periods = models.period.search(cohort=cohort)
 
     if cohort.is_parent:
@@ -207,29 +194,13 @@ def _get_affec_by_specialties_for_cohorts(cohorts, organization_id):
     organizations = Organization.objects.filter(
         cohort__in=cohorts, reference=organization.reference
     )
-    internships = models.internship_offer.search(organization__in=organizations)
-    specialities = list({offer.speciality.name for offer in internships})
-    specialities = sorted(specialities, key=lambda spec_name: spec_name)
-    affec_by_specialties = [
-        (internship_speciality, list(models.internship_student_affectation_stat.search(
-            organization__in=organizations, speciality__name=internship_speciality)))
-        for internship_speciality in specialities
-    ]
-    for speciality, affectations in affec_by_specialties:
-        for affectation in affectations:
-            affectation.email = ""
-            affectation.adress = ""
-            affectation.phone_mobile = ""
-            affectation.master = ""
-            internship_student_info = models.internship_student_information.search(person=affectation.student.person)
-            master_allocation = models.master_allocation.search(
-                cohort=affectation.organization.cohort,
-                hospital=affectation.organization,
-                specialty=affectation.speciality
-            )
-            _add_student_information(affectation, internship_student_info)
-            if master_allocation:
-                affectation.master = ", ".join(master_allocation.values_list('master_display_name', flat=True))
+    internships = models.internship_offer.search(organization__in=organizations).select_related('speciality')
+    specialities = sorted({offer.speciality.name for offer in internships if offer.speciality})
+    affectations_by_specialty = {speciality: [] for speciality in specialities}
+    for affectation in affectation_roster.load_roster(organizations):
+        if affectation.speciality and affectation.speciality.name in affectations_by_specialty:
+            affectations_by_specialty[affectation.speciality.name].append(affectation)
+    affec_by_specialties = list(affectations_by_specialty.items())
     return affec_by_specialties, organization
 
 
@@ -241,6 +212,18 @@ def export_hospital_affectation(request, cohort_id, organization_id):
     return _export_xls_hospital(cohort, organization)
 
 
+@permission_required('internship.is_internship_manager', raise_exception=True)
+@set_download_cookie
+def export_hospitals_affectations(request, cohort_id):
+    cohort = get_object_or_404(models.cohort.Cohort, pk=cohort_id)
+    organizations = list(_get_cohort_organizations(cohort))
+    file = organization_affectation_hospital.export_hospitals_zip(cohort, organizations)
+    file_name = "affectations_{}.zip".format(cohort.name.strip().replace(' ', '_'))
+    response = FileResponse(file, content_type='application/zip')
+    response['Content-Disposition'] = 'attachment; filename={}'.format(file_name)
+    return response
+
+
 def _export_xls_master(cohort, organization, affections_by_specialities):
     if not affections_by_specialities:
         redirect_url = reverse('place_detail_student_affectation', kwargs={
@@ -263,25 +246,6 @@ def _export_xls_hospital(cohort, organization):
 def _export_xls(organization, virtual_workbook):
     response = HttpResponse(virtual_workbook,
                             content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-    file_name_parts = organization.name.strip().replace(' ', '_')
-    file_name = "affectation_{}_{}.xlsx".format(str(organization.reference), file_name_parts)
+    file_name = organization_affectation_hospital.get_file_name(organization)
     response['Content-Disposition'] = 'attachment; filename={}'.format(file_name)
     return response
-
-
-def _format_address(person_address):
-    return "{} - {} {} ({})".format(
-        person_address.location,
-        person_address.postal_code,
-        person_address.city,
-        person_address.country
-    )
-
-
-def _add_student_information(affectation, internship_student_information):
-    if internship_student_information:
-        informations = internship_student_information.first()
-        person_address = informations.person.personaddress_set.first()
-        affectation.email = informations.email
-        affectation.adress = _format_address(person_address)
-        affectation.phone_mobile = informations.phone_mobile
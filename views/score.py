@@ -27,18 +27,20 @@ import datetime
 import itertools
 import json
 import re
+from collections import defaultdict
 from datetime import date
+from functools import reduce
 from itertools import groupby
 from numbers import Real
-from operator import itemgetter
+from operator import itemgetter, or_
 
 from dateutil.utils import today
 from django.contrib import messages
 from django.contrib.auth.decorators import permission_required
 from django.db import transaction
-from django.db.models import OuterRef, Subquery, F, Window
-from django.db.models.functions import RowNumber
-from django.http import HttpResponseRedirect, HttpResponse, JsonResponse
+from django.db.models import OuterRef, Subquery, F, Window, Q, Count, Exists
+from django.db.models.functions import RowNumber, Coalesce
+from django.http import FileResponse, HttpResponseRedirect, HttpResponse, JsonResponse
 from django.shortcuts import render, get_object_or_404, redirect
 from django.urls import reverse
 from django.utils.html import escape
@@ -47,7 +49,8 @@ from django.utils.translation import gettext as _
 from base.models.student import Student
 from base.utils.cache import cache_filter
 from base.views.common import display_error_messages, display_success_messages
-from internship.business.scores import InternshipScoreRules
+from internship.business import score_table
+from internship.business.scores import InternshipScoreRules, attach_apd_validation_matrix
 from internship.forms.score import ScoresFilterForm
 from internship.models.cohort import Cohort
 from internship.models.enums.role import Role
@@ -60,7 +63,6 @@ from internship.models.internship_student_information import InternshipStudentIn
 from internship.models.master_allocation import MasterAllocation
 from internship.models.period import get_effective_periods, get_assignable_periods, get_subcohorts_periods, Period
 from internship.templatetags.dictionary import is_edited, is_excused
-from internship.templatetags.student import has_remedial
 from internship.utils.exporting import score_encoding_xls, score_summary_pdf
 from internship.utils.importing import import_scores, import_eval, import_preconcours_scores
 from internship.utils.mails import mails_management
@@ -68,6 +70,8 @@ from internship.views.common import get_object_list, round_half_up
 from osis_common.decorators.download import set_download_cookie
 
 CHOSEN_LENGTH = 7
+EXPORT_CHUNK_SIZE = 200
+GRADES = {grade for grade, _ in InternshipScore.SCORE_CHOICES}
 MINIMUM_SCORE = 0
 MAXIMUM_SCORE = 20
 
@@ -104,15 +108,22 @@ def scores_encoding(request, cohort_id):
         grades_filter = search_form.get_all_grades_submitted_filter()
         evals_filter = search_form.get_evaluations_submitted_filter()
         apds_filter = search_form.get_all_apds_validated_filter()
+        students_list = InternshipStudentInformation.objects.filter(
+            pk__in=students_list.values('pk')
+        ).select_related('person')
         students_list = _filter_students_with_specialty_organization(cohort, students_list, search_form)
         students_list = _filter_students_with_all_grades_submitted(students_list, periods, grades_filter)
         students_list = _filter_students_with_evaluations_submitted(students_list, periods, evals_filter)
         students_list = _filter_students_with_all_apds_validated(cohort, students_list, periods, apds_filter)
-        students_list = sorted(students_list, key=lambda s: f"{s.person.last_name}, {s.person.first_name}")
+        students_list = students_list.order_by('person__last_name', 'person__first_name', 'pk')
 
+    # only the students of the page are fetched and go through the score table preparation
     students = get_object_list(request, students_list)
+    students.object_list = list(students.object_list)
 
     mapping = _prepare_score_table(cohorts, periods, students.object_list)
+    if search_form.is_valid() and search_form.cleaned_data['show_apds_validation']:
+        attach_apd_validation_matrix(cohort, students.object_list)
     grades = [grade for grade, _ in InternshipScore.SCORE_CHOICES]
 
     assignable_periods = [p for p in assignable_periods if p in periods]
@@ -180,6 +191,7 @@ def score_detail_form(request, cohort_id, student_registration_id, period_id, sp
                 _cache_apd_form_values(apds_data, score)
 
         if update:
+            score_table.invalidate_persons([student.person_id])
             messages.add_message(
                 request,
                 messages.SUCCESS,
@@ -294,25 +306,6 @@ def generate_query_string(request):
     return query_string
 
 
-def _retrieve_blank_periods_by_student(persons, to_exclude, periods, scores, reverse=False):
-    # get students with blank periods, students without blank periods if reverse set to true
-    students = {person: [] for person in persons}
-    students_without_grades = {}
-    students_with_grades = {}
-    for student, period in scores:
-        students[student].append(period)
-    for student in students:
-        blank_periods = [
-            period for period in periods
-            if period not in students[student] and not(student in to_exclude and period in to_exclude[student])
-        ]
-        if blank_periods:
-            students_without_grades[student] = blank_periods
-        else:
-            students_with_grades[student] = blank_periods
-    return students_with_grades if reverse else students_without_grades
-
-
 def _show_reminder_sent_error_message(request):
     display_success_messages(
         request, _('An error occured while sending reminders')
@@ -353,6 +346,7 @@ def _update_evaluation_status(status, evaluations, cohort):
         )
         if not update:
             return False, {'period': period_name}
+        score_table.invalidate_cohorts([cohort.pk])
     return True, {'periods': evaluations_by_period.keys()}
 
 
@@ -419,6 +413,7 @@ def _update_evolution_score(cohort, edited_score, registration_id, reason):
     person = Student.objects.select_related('person').get(
         registration_id=registration_id,
     ).person
+    score_table.invalidate_persons([person.pk])
     return cohort.internshipstudentinformation_set.filter(
         person=person
     ).update(
@@ -442,6 +437,7 @@ def delete_evolution_score(request, cohort_id):
     person = Student.objects.select_related('person').get(
         registration_id=registration_id,
     ).person
+    score_table.invalidate_persons([person.pk])
     if cohort.internshipstudentinformation_set.filter(
             person=person
     ).update(evolution_score=None):
@@ -505,6 +501,9 @@ def delete_edited_score(request, cohort_id):
 
 
 def _delete_score(cohort, period_name, registration_id):
+    score_table.invalidate_persons(
+        Student.objects.filter(registration_id=registration_id).values_list('person_id', flat=True)
+    )
     return InternshipScore.objects.filter(
         student_affectation__period__name=period_name,
         student_affectation__student__registration_id=registration_id
@@ -556,32 +555,37 @@ def empty_score(request, cohort_id):
 
 
 def _prepare_score_table(cohorts, periods, students):
-    persons, scores = _get_persons_scores(students)
+    # rows of the students are served from the cache, only the students whose data changed are computed again
     mapping = InternshipScoreMapping.objects.filter(cohort__in=cohorts).select_related('period')
+    missing_students = score_table.apply_cached_rows(cohorts, periods, students)
+    if missing_students:
+        _build_score_table(mapping, periods, missing_students)
+        score_table.cache_rows(cohorts, periods, missing_students)
+    return mapping
+
+
+def _build_score_table(mapping, periods, students):
+    persons, scores = _get_persons_scores(students)
     students_affectations = InternshipStudentAffectationStat.objects.filter(
         student__person_id__in=list(persons),
         period__in=periods,
     ).select_related(
         'student', 'period', 'speciality'
     ).values(
-        'student__person', 'student__registration_id', 'period__name', 'organization__reference', 'organization__name',
-        'speciality__acronym', 'speciality__sequence', 'speciality__name', 'internship__speciality_id',
-        'internship__name', 'internship__length_in_periods', 'internship_evaluated'
+        'student__person', 'student__registration_id', 'period__name', 'period__remedial', 'organization__reference',
+        'organization__name', 'speciality__acronym', 'speciality__sequence', 'speciality__name',
+        'internship__speciality_id', 'internship__name', 'internship__length_in_periods', 'internship_evaluated'
      ).order_by('period__date_start', 'date_start')
 
     scores = _group_by_students_and_periods(scores)
+    affectations = _group_affectations_by_persons(students_affectations)
 
     _prepare_students_extra_data(students)
     _match_scores_with_students(periods, scores, students)
     _set_condition_fulfilled_status(students)
-    _map_numeric_score(mapping, students)
-    _link_periods_to_organizations(students, students_affectations)
-    _link_periods_to_specialties(students, students_affectations)
-    _link_periods_to_evaluations(students, students_affectations)
-    _append_registration_ids(students, students_affectations)
-    _append_remedials_count(students, students_affectations)
+    _map_numeric_score(_get_mapping_lookup(mapping), students)
+    _link_periods_to_affectations(students, affectations)
     _compute_evolution_score(students, periods)
-    return mapping
 
 
 def _get_persons_scores(students):
@@ -667,33 +671,27 @@ def _count_emptied_scores(scores):
     return len([key for key in scores.keys() if _get_period_score(scores[key]) is None])
 
 
-def _link_periods_to_evaluations(students, students_affectations):
-    for student in students:
-        _update_student_evaluations(student, students_affectations)
-
-
-def _update_student_evaluations(student, students_affectations):
-    for affectation in students_affectations:
-        if affectation['student__person'] == student.person.pk:
-            student.evaluations.update(
-                {
-                    affectation['period__name']: affectation['internship_evaluated']
-                }
-            )
+def _get_mapping_lookup(mapping):
+    # value of each grade by (period name, apd, grade), the first mapping of a period and an apd prevails
+    lookup = {}
+    for item in mapping:
+        for grade in GRADES:
+            lookup.setdefault((item.period.name, item.apd, grade), getattr(item, 'score_{}'.format(grade)))
+    return lookup
 
 
-def _map_numeric_score(mapping, students):
+def _map_numeric_score(mapping_lookup, students):
     # compute student grades in numerical value based on mapping for each period
     for student in students:
         periods_scores = {}
-        _map_student_score(mapping, periods_scores, student)
+        _map_student_score(mapping_lookup, periods_scores, student)
         student.periods_scores = periods_scores
 
 
-def _map_student_score(mapping, periods_scores, student):
+def _map_student_score(mapping_lookup, periods_scores, student):
     for item in student.scores:
         period, scores, period_aff_index = item
-        period_score = _process_evaluation_grades(mapping, period, scores)
+        period_score = _process_evaluation_grades(mapping_lookup, period, scores)
         existing_period_score = periods_scores.get(period, [])
         if period in student.numeric_scores.keys():
             new_score = {
@@ -707,24 +705,16 @@ def _map_student_score(mapping, periods_scores, student):
 
 
 
-def _process_evaluation_grades(mapping, period, scores):
+def _process_evaluation_grades(mapping_lookup, period, scores):
     period_score = 0
     effective_count = 0
     for index, note in enumerate(scores):
-        if note in [score[0] for score in InternshipScore.SCORE_CHOICES]:
+        if note in GRADES:
             effective_count += 1
-            period_score = _sum_mapped_note((index, note), mapping, period, period_score)
+            period_score += mapping_lookup.get((period, index + 1, note), 0)
     return round_half_up(period_score / effective_count) if effective_count else 0
 
 
-def _sum_mapped_note(indexed_note, mapping, period, period_score):
-    index, note = indexed_note
-    mapped_note = list(filter(_get_mapping_score(period, index + 1), list(mapping)))
-    if mapped_note:
-        period_score += vars(mapped_note[0])['score_{}'.format(note)]
-    return period_score
-
-
 def _match_scores_with_students(periods, scores, students):
     # append scores for each period to each student
     for student in students:
@@ -740,10 +730,6 @@ def _set_condition_fulfilled_status(students):
         student.fulfill_condition = InternshipScoreRules.student_has_fulfilled_requirements(student)
 
 
-def _get_mapping_score(period, apd):
-    return lambda x: x.period.name == period and x.apd == apd
-
-
 def _append_period_scores_and_comments_to_student(period, student, student_scores):
     if student_scores:
         score_obj = student_scores[0]
@@ -788,24 +774,30 @@ def _retrieve_scores_entered_manually(period, student, student_scores):
         })
 
 
-def _link_periods_to_specialties(students, students_affectations):
-    for student in students:
-        _update_student_specialties(student, students_affectations)
+def _group_affectations_by_persons(students_affectations):
+    affectations = defaultdict(list)
+    for affectation in students_affectations:
+        affectations[affectation['student__person']].append(affectation)
+    return affectations
 
 
-def _update_student_specialties(student, students_affectations):
-    for affectation in students_affectations:
-        if affectation['student__person'] == student.person.pk:
+def _link_periods_to_affectations(students, affectations):
+    # link organizations, specialties and evaluations of each period, registration id and remedials count
+    for student in students:
+        student.registration_id = None
+        for affectation in affectations.get(student.person.pk, []):
+            period_name = affectation['period__name']
+            student.organizations.setdefault(period_name, []).append({
+                "reference": "{}{}".format(affectation['speciality__acronym'], affectation['organization__reference']),
+                "name": affectation['organization__name']
+            })
             _annotate_non_mandatory_internship(affectation)
-            acronym = _get_acronym_with_sequence(affectation)
-            specialty_name = affectation['speciality__name']
-            existing_specialties = student.specialties.get(affectation['period__name'], [])
-            student.specialties.update({
-                affectation['period__name']: [
-                    *existing_specialties,
-                    {'acronym': acronym, 'name': specialty_name}
-                ]
+            student.specialties.setdefault(period_name, []).append({
+                'acronym': _get_acronym_with_sequence(affectation), 'name': affectation['speciality__name']
             })
+            student.evaluations[period_name] = affectation['internship_evaluated']
+            student.registration_id = affectation['student__registration_id']
+            student.remedial_periods_count += affectation['period__remedial']
 
 
 
@@ -819,132 +811,60 @@ def _get_acronym_with_sequence(affectation):
     return acronym
 
 
-def _link_periods_to_organizations(students, students_affectations):
-    for student in students:
-        update_student_organizations(student, students_affectations)
-
-
-def update_student_organizations(student, students_affectations):
-    for affectation in students_affectations:
-        if affectation['student__person'] == student.person.pk:
-            existing_organizations = student.organizations.get(affectation['period__name'], [])
-            student.organizations.update({
-                affectation['period__name']: [
-                    *existing_organizations,
-                    {
-                        "reference": "{}{}".format(
-                            affectation['speciality__acronym'],
-                            affectation['organization__reference']
-                        ),
-                        "name": affectation['organization__name']
-                    }
-                ]
-            })
-
 def _annotate_non_mandatory_internship(affectation):
     if affectation['internship__speciality_id'] is None and affectation['internship__name']:
         affectation['speciality__acronym'] = affectation['internship__name'][-CHOSEN_LENGTH:].replace(" ", "").upper()
 
 
-def _append_registration_ids(students, students_affectations):
-    for student in students:
-        student.registration_id = None
-        _append_student_registration_id(student, students_affectations)
-
-
-def _append_remedials_count(students, students_affectations):
-    for student in students:
-        if has_remedial(student):
-            student.remedial_periods_count = students_affectations.filter(
-                period__remedial=True,
-                student__person=student.person
-            ).count()
-
-
-def _append_student_registration_id(student, students_affectations):
-    for affectation in students_affectations:
-        if affectation['student__person'] == student.person.pk:
-            student.registration_id = affectation['student__registration_id']
-
-
 def _filter_students_with_all_grades_submitted(students, periods, filter):
+    # a completed period is blank unless the student has a validated score or a fake hospital in it
     if filter is not None:
-        persons = students.values_list('person', flat=True)
         completed_periods = [p.id for p in periods if p.date_end < date.today()]
-        students_with_affectations = InternshipStudentAffectationStat.objects.filter(
-            student__person__in=persons, period__in=completed_periods
-        ).values_list('student', flat=True)
-        scores = InternshipScore.objects.filter(
-            student_affectation__student__in=students_with_affectations,
-            student_affectation__period__pk__in=completed_periods,
-            validated=True,
-        ).annotate(
-            period_aff_index=Window(
-                expression=RowNumber(),
-                partition_by=[F('student_affectation__student'), F('student_affectation__period')],
-                order_by=F('student_affectation__id').asc(),
-            )
-        ).select_related(
-            'student_affectation__student', 'student_affectation__period'
-        ).values_list(
-            'student_affectation__student__person',
-            'student_affectation__period',
-        )
-
-        persons_with_affectations = students_with_affectations.values_list('student__person', flat=True)
-        affectations_to_exclude = students_with_affectations.filter(organization__fake=True).annotate(
-            person=F('student__person'),
-        ).values_list(
-            'person', 'period', named=True
-        )
-        # group affectations_to_exclude by person
-        to_exclude = {
-            person: [aff.period for aff in affectations]
-            for person, affectations in groupby(affectations_to_exclude, key=lambda x: x.person)
-        }
-
-        periods_persons = _retrieve_blank_periods_by_student(
-            persons_with_affectations,
-            to_exclude,
-            completed_periods,
-            scores,
-            filter,
+        affectations = InternshipStudentAffectationStat.objects.filter(
+            student__person=OuterRef('person'), period__in=completed_periods
         )
-        students = students.filter(person__pk__in=periods_persons.keys())
+        filled_periods = affectations.filter(
+            Q(score__validated=True) | Q(organization__fake=True)
+        ).order_by().values('student__person').annotate(count=Count('period', distinct=True)).values('count')
+        students = students.annotate(
+            has_affectations=Exists(affectations),
+            filled_periods_count=Coalesce(Subquery(filled_periods), 0),
+        ).filter(has_affectations=True)
+        if filter:
+            students = students.filter(filled_periods_count=len(completed_periods))
+        else:
+            students = students.filter(filled_periods_count__lt=len(completed_periods))
     return students
 
 
 def _filter_students_with_evaluations_submitted(students, periods, filter):
     if filter is not None:
-        persons = students.values_list('person', flat=True)
         completed_periods = [p.id for p in periods if p.date_end < date.today()]
-        students_with_affectations = InternshipStudentAffectationStat.objects.filter(
-            student__person__in=persons, period__in=completed_periods, internship_evaluated=filter
-        ).values_list('student', flat=True)
-        persons_with_affectations = students_with_affectations.values_list('student__person', flat=True)
-        students = students.filter(person__pk__in=persons_with_affectations)
+        students = students.filter(Exists(InternshipStudentAffectationStat.objects.filter(
+            student__person=OuterRef('person'), period__in=completed_periods, internship_evaluated=filter
+        )))
     return students
 
 
 def _filter_students_with_all_apds_validated(cohort, students, periods, filter):
+    # an apd is validated by a validated score with a valid grade in one of the periods
     if filter is not None:
-        persons = students.values_list('person', flat=True)
         scores = InternshipScore.objects.filter(
+            student_affectation__student__person=OuterRef('person'),
             student_affectation__period__in=periods,
-            student_affectation__student__person_id__in=list(persons)).select_related(
-            'student_affectation__student__person', 'student_affectation__period__cohort'
-        ).annotate(
-            period_aff_index=Window(
-                expression=RowNumber(),
-                partition_by=[F('student_affectation__student'), F('student_affectation__period')],
-                order_by=F('student_affectation__id').asc(),
-            )
-        ).order_by('student_affectation__student__person')
-        scores = _group_by_students_and_periods(scores)
-        _prepare_students_extra_data(students)
-        _match_scores_with_students(periods, scores, students)
-        _set_condition_fulfilled_status(students)
-        students = [s for s in students if s.fulfill_condition == filter]
+            validated=True,
+        )
+        students = students.annotate(**{
+            'apd_{}_validated'.format(apd): Exists(scores.filter(**{
+                'APD_{}__in'.format(apd): InternshipScoreRules.get_valid_grades(apd - 1)
+            })) for apd in range(1, APD_NUMBER + 1)
+        })
+        if filter:
+            students = students.filter(**{'apd_{}_validated'.format(apd): True for apd in range(1, APD_NUMBER + 1)})
+        else:
+            students = students.filter(reduce(or_, [
+                Q(**{'apd_{}_validated'.format(apd): False}) for apd in range(1, APD_NUMBER + 1)
+            ]))
     return students
 
 
@@ -953,14 +873,12 @@ def _filter_students_with_specialty_organization(cohort, students, search_form):
     specialty = search_form.get_specialties(cohort)
     periods = search_form.get_periods(cohort)
     if organization or specialty or periods:
-        persons = students.values_list('person', flat=True)
-        persons_with_affectations = InternshipStudentAffectationStat.objects.filter(
+        students = students.filter(Exists(InternshipStudentAffectationStat.objects.filter(
             organization__in=organization,
             speciality__in=specialty,
             period__in=periods,
-            student__person__in=persons,
-        ).values_list('student__person', flat=True)
-        students = students.filter(person__pk__in=persons_with_affectations)
+            student__person=OuterRef('person'),
+        )))
     return students
 
 
@@ -1114,9 +1032,10 @@ def download_scores(request, cohort_id):
     ).order_by('person__last_name')
     internships = cohort.internship_set.all().order_by('position')
     internships = _list_internships_acronyms(internships)
-    _prepare_score_table(cohorts, periods, students)
-    workbook = score_encoding_xls.export_xls_with_scores(cohort, periods, students, internships)
-    response = HttpResponse(workbook, content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+    file = score_encoding_xls.save_xls_with_scores(
+        cohort, periods, _iter_score_table(cohorts, periods, students), internships
+    )
+    response = FileResponse(file, content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
     file_name = "encodage_notes_{}.xlsx".format(cohort.name.strip().replace(' ', '_'))
     response['Content-Disposition'] = 'attachment; filename={}'.format(file_name)
     return response
@@ -1162,6 +1081,17 @@ def download_summary(request, cohort_id, student_id):
     return response
 
 
+def _iter_score_table(cohorts, periods, students):
+    # the score table is prepared by chunks of students while the workbook is written
+    students = students.iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    while True:
+        chunk = list(itertools.islice(students, EXPORT_CHUNK_SIZE))
+        if not chunk:
+            return
+        _prepare_score_table(cohorts, periods, chunk)
+        yield from chunk
+
+
 def _list_internships_acronyms(internships):
     internships_acronyms = []
     for internship in internships:
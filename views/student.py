@@ -32,11 +32,11 @@ from django.contrib import messages
 from django.contrib.auth.decorators import permission_required
 from django.core.exceptions import PermissionDenied
 from django.core.serializers.json import DjangoJSONEncoder
-from django.db import models
-from django.db.models import Prefetch, OuterRef, Subquery, Value, Q, Count, F, Sum
-from django.db.models.functions import Concat, Coalesce
+from django.db import transaction
+from django.db.models import Prefetch, OuterRef, Subquery, Value, Q
+from django.db.models.functions import Concat
 from django.forms import model_to_dict
-from django.http import HttpResponse, HttpResponseRedirect
+from django.http import HttpResponse, HttpResponseRedirect, Http404
 from django.shortcuts import render, get_object_or_404
 from django.urls import reverse
 from django.utils.translation import gettext_lazy as _
@@ -47,6 +47,7 @@ from base.models.enums.person_address_type import PersonAddressType
 from base.models.person_address import PersonAddress
 from base.models.student import Student
 from internship import models as mdl_int
+from internship.business import choice_status, score_table
 from internship.forms.form_student_information import StudentInformationForm
 from internship.forms.students_import_form import StudentsImportActionForm
 from internship.models import internship_student_affectation_stat
@@ -64,6 +65,8 @@ from internship.views.common import display_errors, get_object_list
 from osis_common.utils.models import get_object_or_none
 from reference.models.country import Country
 
+STUDENT_INFORMATION_KEY_FIELDS = {'id', 'person', 'cohort'}
+
 
 @permission_required('internship.is_internship_manager', raise_exception=True)
 def internships_student_resume(request, cohort_id):
@@ -438,24 +441,40 @@ def internships_student_import_update(request, cohort_id, differences=None):
     """Render a view to visualize and accept differences to be applied"""
     cohort = get_object_or_404(mdl_int.cohort.Cohort, pk=cohort_id)
     if request.POST.get('data'):
-        data = json.loads(request.POST.get('data'))
-        for student_information in data:
-            if student_information['id']:
-                existing_student = InternshipStudentInformation.objects.get(pk=student_information['id'], cohort=cohort)
-            else:
-                existing_student = InternshipStudentInformation(
-                    person_id=student_information['person'],
-                    cohort_id=cohort_id
-                )
-                student_information['id'] = existing_student.id
-            for field in student_information:
-                existing_student.__dict__[field] = student_information[field]
-            existing_student.save()
+        _apply_student_informations(cohort, json.loads(request.POST.get('data')))
         return HttpResponseRedirect(reverse('internships_student_resume', kwargs={"cohort_id": cohort_id}))
     data_json, new_records_count = _convert_differences_to_json(differences)
     return render(request, "students_update.html", locals())
 
 
+@transaction.atomic
+def _apply_student_informations(cohort, data):
+    """ Save the accepted differences, updating the existing informations of the cohort and creating the others """
+    existing_informations = InternshipStudentInformation.objects.filter(cohort=cohort).in_bulk(
+        [student_information['id'] for student_information in data if student_information['id']]
+    )
+    new_informations, updated_informations, updated_fields = [], [], set()
+    for student_information in data:
+        if student_information['id']:
+            information = existing_informations.get(student_information['id'])
+            if information is None:
+                raise Http404
+            updated_informations.append(information)
+        else:
+            information = InternshipStudentInformation(person_id=student_information['person'], cohort=cohort)
+            new_informations.append(information)
+        for field, value in student_information.items():
+            if field not in STUDENT_INFORMATION_KEY_FIELDS:
+                setattr(information, field, value)
+                updated_fields.add(field)
+    InternshipStudentInformation.objects.bulk_create(new_informations)
+    if updated_informations:
+        InternshipStudentInformation.objects.bulk_update(updated_informations, updated_fields)
+    score_table.invalidate_persons(
+        [information.person_id for information in itertools.chain(new_informations, updated_informations)]
+    )
+
+
 def _get_students_with_status(request, cohort, filters):
     active_period = Period.objects.filter(
         cohort=cohort,
@@ -463,42 +482,16 @@ def _get_students_with_status(request, cohort, filters):
         date_end__gte=date.today(),
     ).first()
 
-    internship_ids = Internship.objects.filter(cohort=cohort).values_list('pk', flat=True)
-
     current_internship_subquery = InternshipStudentAffectationStat.objects.filter(
         student__person=OuterRef('person'),
         period=active_period
     )
 
-    already_done_internships_in_parent_cohort_count = InternshipStudentAffectationStat.objects.filter(
-        speciality__cohort__parent_cohort=cohort.parent_cohort,
-        student__person=OuterRef('person')
-    ).values('student').annotate(count=Count('internship')).values('count')
-
-    all_non_mandatory = Internship.objects.filter(cohort=cohort, speciality__isnull=True).values_list('pk', flat=True)
-
-    all_non_mandatory_chosen_count = InternshipChoice.objects.filter(
-        internship__pk__in=internship_ids,
-        internship__speciality=None,
-        choice=1,
-        student__person=OuterRef('person'),
-    ).values('student').annotate(count=Count('internship')).values('count')
-
-    student_internships_count = InternshipChoice.objects.filter(
-        internship__pk__in=internship_ids,
-        choice=1,
-        student__person=OuterRef('person')
-    ).values('student').annotate(count=Count('internship')).values('count')
-
-    internship_abroad_count = InternshipChoice.objects.filter(
-        internship__name__contains='1',
-        internship__speciality__isnull=True,
-        organization__reference__in=['500', '510', '515', '520'],
-        choice=1,
-        student__person=OuterRef('person'),
-    ).values('student').annotate(count=Count('internship')).values('count')
+    students_info = InternshipStudentInformation.objects.filter(cohort=cohort)
+    statuses = choice_status.get_choice_statuses(cohort, students_info.values_list('person_id', flat=True))
+    status_stats = choice_status.get_status_stats(statuses)
 
-    students_info = InternshipStudentInformation.objects.filter(cohort=cohort).prefetch_related(
+    students_info = students_info.prefetch_related(
         Prefetch('person__student_set', to_attr='students')
     ).order_by(
         'person__last_name',
@@ -508,48 +501,8 @@ def _get_students_with_status(request, cohort, filters):
             Subquery(current_internship_subquery.values('speciality__acronym')[:1]),
             Subquery(current_internship_subquery.values('organization__reference')[:1])
         ),
-        already_done_internships_in_parent_cohort_count=Subquery(
-            already_done_internships_in_parent_cohort_count, output_field=models.IntegerField()
-        ),
-        chosen_internships_count=Subquery(student_internships_count, output_field=models.IntegerField()),
-        total_count=Value(internship_ids.count(), output_field=models.IntegerField()),
-        all_non_mandatory_chosen=Coalesce(
-            Sum(Subquery(all_non_mandatory_chosen_count, output_field=models.IntegerField())),  Value(0)
-        ),
-        all_non_mandatory_count=Value(all_non_mandatory.count(), output_field=models.IntegerField()),
-        internship_abroad_count=Coalesce(
-            Sum(Subquery(internship_abroad_count, output_field=models.IntegerField())), Value(0)
-        ),
-    ).annotate(
-        already_done_internships_in_parent_cohort_count=Coalesce(
-            Sum('already_done_internships_in_parent_cohort_count'), Value(0)
-        )
-    ).annotate(
-        status=F('chosen_internships_count') - F('total_count') + F('already_done_internships_in_parent_cohort_count')
     )
 
-    status_stats = {
-        'OK': students_info.filter(
-            Q(status__gte=0) & (
-                Q(all_non_mandatory_chosen__gte=all_non_mandatory.count())
-            ) |
-            Q(status__gte=1-all_non_mandatory.count()) & (
-                Q(internship_abroad_count__gt=0) & Q(all_non_mandatory_chosen__gte=1)
-            )
-        ).count(),
-        'NOK': students_info.filter(
-            Q(status__isnull=False) & ~Q(
-                    Q(status__gte=0) & (
-                        Q(all_non_mandatory_chosen__gte=all_non_mandatory.count())
-                    ) |
-                    Q(status__gte=1 - all_non_mandatory.count()) & (
-                        Q(internship_abroad_count__gt=0) & Q(all_non_mandatory_chosen__gte=1)
-                    )
-            )
-        ).count(),
-        'UNKNOWN': students_info.filter(Q(status__isnull=True) | Q(all_non_mandatory_chosen__isnull=True)).count(),
-    }
-
     if filters:
         filter_name, filter_current_internship = filters
         if filter_name:
@@ -561,6 +514,10 @@ def _get_students_with_status(request, cohort, filters):
             students_info = students_info.exclude(Q(current_internship__isnull=True) | Q(current_internship__exact=''))
 
     paginated_students_info = get_object_list(request, students_info)
+    paginated_students_info.object_list = list(paginated_students_info.object_list)
+    for student_info in paginated_students_info.object_list:
+        for attribute, value in statuses.get(student_info.person_id, {}).items():
+            setattr(student_info, attribute, value)
     return paginated_students_info, status_stats
 
 